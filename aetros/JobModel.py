@@ -61,6 +61,9 @@ class JobModel:
     def get_dataset_downloads_dir(self, dataset):
         return os.path.normpath(self.storage_dir + '/aetros/dataset/%s/datasets_downloads' % (dataset['id'],))
 
+    def get_dataset_cache_dir(self, dataset):
+        return os.path.normpath(self.storage_dir + '/aetros/dataset/%s/cache' % (dataset['id'],))
+
     def get_weights_filepath_latest(self):
         return os.path.normpath(os.getcwd() + '/aetros/weights/latest.hdf5')
 
@@ -140,6 +143,32 @@ class JobModel:
         if input_node is None:
             input_node = self.get_input_node(0)
 
+        image = self.open_image_file(file_path, input_node)
+        if image is None:
+            return []
+
+        return self.convert_image_to_node(image, input_node)
+
+    def convert_file_to_pixels(self, file_path, input_node=None, raise_errors=False):
+        """
+        Like convert_file_to_input_node, but returns the raw uint8 pixels (height, width, channels), without
+        scaling and channel order. Use convert_pixels_to_node() on a batch of them.
+
+        :param raise_errors: bool : raise when the file can not be opened instead of printing it and returning None
+        """
+        if input_node is None:
+            input_node = self.get_input_node(0)
+
+        image = self.open_image_file(file_path, input_node, raise_errors)
+        if image is None:
+            return None
+
+        if input_node['inputType'] == 'image':
+            return np.asarray(image.convert("L"), dtype='uint8')[:, :, np.newaxis]
+
+        return np.asarray(image.convert("RGB"), dtype='uint8')
+
+    def open_image_file(self, file_path, input_node, raise_errors=False):
         size = (int(input_node['width']), int(input_node['height']))
 
         if 'http://' in file_path or 'https://' in file_path:
@@ -157,16 +186,56 @@ class JobModel:
             try:
                 image = Image.open(local_path)
             except Exception:
+                if raise_errors:
+                    raise
+
                 print(("Could not open %s" % (local_path,)))
-                return []
+                return None
+
+            # ANTIALIAS is called LANCZOS since Pillow 2.7 and has been removed in Pillow 10
+            return image.resize(size, Image.LANCZOS if hasattr(Image, 'LANCZOS') else Image.ANTIALIAS)
+
+    def get_pixels_shape(self, input_node=None):
+        """
+        Shape of the arrays returned by convert_file_to_pixels().
+        """
+        if input_node is None:
+            input_node = self.get_input_node(0)
+
+        channels = 1 if input_node['inputType'] == 'image' else 3
+
+        return int(input_node['height']), int(input_node['width']), channels
 
-            image = image.resize(size, Image.ANTIALIAS)
+    def convert_pixels_to_node(self, pixels, input_node=None):
+        """
+        Converts a batch of uint8 pixels (n, height, width, channels) of convert_file_to_pixels() to the float32
+        input of the node, the same as convert_image_to_node() does per image.
+        """
+        from keras import backend as K
 
-            from keras.preprocessing.image import img_to_array
+        if input_node is None:
+            input_node = self.get_input_node(0)
 
-            image = self.convert_image_to_node(image, input_node)
+        if input_node['inputType'] == 'image_bgr':
+            pixels = pixels[..., ::-1]
+
+        if hasattr(K, 'image_data_format'):
+            channels_first = K.image_data_format() == 'channels_first'
+        else:
+            channels_first = K.image_dim_ordering() == 'th'
+
+        if channels_first:
+            pixels = pixels.transpose((0, 3, 1, 2))
+
+        batch = pixels.astype('float32')
+
+        if 'imageScale' not in input_node:
+            input_node['imageScale'] = 255
+
+        if float(input_node['imageScale']) > 0:
+            batch /= float(input_node['imageScale'])
 
-            return image
+        return batch
 
     def convert_image_to_node(self, image, input_node=None):
         from keras.preprocessing.image import img_to_array
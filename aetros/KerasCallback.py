@@ -2,6 +2,7 @@
 from __future__ import division
 from __future__ import absolute_import
 
+import functools
 import os
 import time
 
@@ -22,6 +23,9 @@ import keras.layers.convolutional
 
 import numpy as np
 
+from aetros.utils.stats import ReservoirSample, ConfusionMatrix, StreamStats
+from aetros.utils.pool import WorkerPool
+from aetros.utils.overhead import measure, meter as overhead_meter
 from aetros.utils.image import get_layer_vis_square, get_layer_vis_square_raw, get_image_tales
 from .keras_model_utils import ensure_dir, get_total_params
 import six
@@ -38,11 +42,42 @@ def image_data_format():
         return 'channel_last'
 
 
+def batch_committed(message):
+    """
+    Runs a callback hook in one batch commit, so all infos, channels and files it writes end up in one git commit.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            with self.job_backend.git.batch_commit(message):
+                return fn(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def slice_inputs(x, start, end):
+    if isinstance(x, list):
+        return [v[start:end] for v in x]
+    if isinstance(x, dict):
+        return dict((k, v[start:end]) for k, v in six.iteritems(x))
+
+    return x[start:end]
+
+
 class KerasCallback(Callback):
     def __init__(self, job_backend, logger, force_insights=False):
         self.params = {}
         super(KerasCallback, self).__init__()
-        self.validation_per_batch = []
+        # loss of the batches of the current epoch
+        self.batch_loss = StreamStats()
+        self.current_epoch = 0
+
+        # when set, the batch loss is sent as this many points per epoch (mean/min/max of a window of batches)
+        self.batch_loss_points = None
+        self.batch_loss_channel = None
+        self.batch_loss_window = StreamStats(sample_size=1)
         self.insight_layer = []
         self.ins = None
         self.insights_sample_path = None
@@ -54,6 +89,29 @@ class KerasCallback(Callback):
         self.log_epoch = False
         self.confusion_matrix = True
 
+        # limits of the prediction pass for the confusion matrix
+        self.confusion_matrix_samples = None
+        self.confusion_matrix_seconds = None
+        self.weight_histograms = False
+        self.histogram_channels = {}
+
+        # insights are built every n epochs (raised when the overhead budget is exceeded)
+        # and at most every n seconds
+        self.insights_epoch_interval = 1
+        self.insights_seconds_interval = None
+        self.last_insight_time = None
+
+        # rendering, JPEG encoding and committing of insights happens in the background
+        self.insight_pool = WorkerPool(workers=1, policy=WorkerPool.DROP, logger=logger)
+
+        # warn when the time waiting for the next batch is more than this share of the step time
+        self.pipeline_wait_warning = 0.3
+        self.pipeline_channel = None
+        self.pipeline_wait = ReservoirSample()
+        self.pipeline_compute = ReservoirSample()
+        self.last_batch_begin = None
+        self.last_batch_end = None
+
         self.job_backend = job_backend
         self.logger = logger
         self._test_with_acc = None
@@ -79,6 +137,7 @@ class KerasCallback(Callback):
         self.learning_rate_start = 0
 
         self.insights_x = None
+        self.insight_function = None
         self.best_total_accuracy = 0
 
     def add_insight_layer(self, layer):
@@ -127,10 +186,21 @@ class KerasCallback(Callback):
         if self.data_validation_size is None:
             raise Exception('data_validation_size could not be determined for given validation_data. Please specify it.')
 
+    @measure('keras')
     def on_train_end(self, logs={}):
+        overhead_meter.remove_listener(self.lower_insights_frequency)
+        self.insight_pool.wait()
         self.job_backend.sync_weights()
 
+    @measure('keras')
     def on_train_begin(self, logs={}):
+        self.send_training_started()
+
+        if self.force_insights or self.job_model.insights_enabled:
+            self.send_insights(0)
+
+    @batch_committed('TRAINING STARTED')
+    def send_training_started(self):
         self.start_time = time.time()
         self.last_batch_time = time.time()
         self.job_backend.set_status('TRAINING')
@@ -182,8 +252,19 @@ class KerasCallback(Callback):
         )
         self.loss_channel = self.job_backend.create_loss_channel('loss', xaxis=xaxis)
         self.learning_rate_channel = self.job_backend.create_channel('learning rate', traces=['start', 'end'], xaxis=xaxis)
+        self.pipeline_channel = self.job_backend.create_channel(
+            'pipeline',
+            traces=['wait p50', 'wait p90', 'wait p99', 'compute p50', 'compute p90', 'compute p99'],
+            xaxis=xaxis, yaxis={'title': u'ms ⇢'}
+        )
+
+        if self.batch_loss_points:
+            self.batch_loss_channel = self.job_backend.create_channel(
+                'batch loss', traces=['mean', 'min', 'max'], xaxis=xaxis, flush_interval=5
+            )
 
         self.job_backend.progress(0, self.params['epochs'])
+        overhead_meter.on_over_budget(self.lower_insights_frequency)
         if len(self.model.output_layers) > 1:
             loss_traces = []
             for output in self.model.output_layers:
@@ -192,10 +273,7 @@ class KerasCallback(Callback):
 
             self.all_losses = self.job_backend.create_channel('All loss', main=True, xaxis=xaxis, traces=loss_traces)
 
-        if self.force_insights or self.job_model.insights_enabled:
-            images = self.build_insight_images()
-            self.job_backend.job_add_insight(0, images, None)
-
+    @measure('keras')
     def on_batch_begin(self, batch, logs={}):
         if 'nb_batches' not in self.current:
             batch_size = logs['size']
@@ -208,20 +286,46 @@ class KerasCallback(Callback):
             self.current['batch_size'] = batch_size
             self.job_backend.set_info('Batch size', batch_size)
 
+        # time between the end of the last batch and this one, mostly waiting for the data generator
+        self.last_batch_begin = time.time()
+        if self.last_batch_end is not None:
+            self.pipeline_wait.add(self.last_batch_begin - self.last_batch_end)
+            overhead_meter.add_step(self.last_batch_begin - self.last_batch_end)
+
+    @measure('keras')
     def on_batch_end(self, batch, logs={}):
         self.filter_invalid_json_values(logs)
         loss = logs['loss']
 
-        self.validation_per_batch.append(loss)
+        self.batch_loss.add(loss)
+
+        if self.batch_loss_channel is not None:
+            self.send_batch_loss(batch, loss)
 
         self.job_backend.batch(batch, self.current['nb_batches'], logs['size'])
 
+        self.last_batch_end = time.time()
+        if self.last_batch_begin is not None:
+            self.pipeline_compute.add(self.last_batch_end - self.last_batch_begin)
+            overhead_meter.add_step(self.last_batch_end - self.last_batch_begin)
+
     def write(self, line):
         self.logger.info(line)
 
+    @measure('keras')
     def on_epoch_begin(self, epoch, logs={}):
         self.learning_rate_start = self.get_learning_rate()
+        self.current_epoch = epoch
+        self.batch_loss.reset()
+        self.batch_loss_window.reset()
+
+        # the gap between epochs (validation, other callbacks) is not input wait
+        self.last_batch_begin = None
+        self.last_batch_end = None
+        self.pipeline_wait.reset()
+        self.pipeline_compute.reset()
 
+    @measure('keras')
     def on_epoch_end(self, epoch, logs={}):
         log = logs.copy()
 
@@ -229,8 +333,8 @@ class KerasCallback(Callback):
 
         log['created'] = time.time()
         log['epoch'] = epoch + 1
-        if 'loss' not in log and len(self.validation_per_batch) > 0:
-            log['loss'] = sum(self.validation_per_batch) / float(len(self.validation_per_batch))
+        if 'loss' not in log and self.batch_loss.count > 0:
+            log['loss'] = self.batch_loss.mean
 
         accuracy_log_name = 'acc'
         val_accuracy_log_name = 'val_acc'
@@ -256,9 +360,29 @@ class KerasCallback(Callback):
             # without any obvious reason.
             pass
 
+        self.send_epoch(log, [total_accuracy_training*100, total_accuracy_validation*100])
+
+        if self.log_epoch:
+            # todo, multiple outputs
+            line = "Epoch %d: loss=%f, acc=%f, val_loss=%f, val_acc=%f\n" % (
+                log['epoch'], log['loss'], log.get('acc', 0), log.get('val_loss', 0), total_accuracy_validation, )
+            self.logger.write(line)
+
+        if (self.force_insights or self.job_model.insights_enabled) and self.is_insight_due(log['epoch']):
+            # todo, support multiple inputs
+            first_input_layer = self.model.input_layers[0]
+
+            if first_input_layer is not None:
+                self.send_insights(log['epoch'], self.confusion_matrix)
+
+    @batch_committed('EPOCH')
+    def send_epoch(self, log, accuracy):
+        """
+        Sends the channels, progress and infos of an epoch in one commit. Predictions for insights and the
+        confusion matrix happen outside of it, so they do not block other committers.
+        """
         self.loss_channel.send(log['epoch'], log.get('loss', 0), log.get('val_loss', 0))
 
-        accuracy = [total_accuracy_training*100, total_accuracy_validation*100]
         if len(self.model.output_layers) > 1:
             accuracy = []
             losses = []
@@ -275,24 +399,57 @@ class KerasCallback(Callback):
 
         self.job_backend.progress(log['epoch'], self.params['epochs'])
         self.send_optimizer_info(log['epoch'])
+        self.send_pipeline_info(log['epoch'])
 
-        if self.log_epoch:
-            # todo, multiple outputs
-            line = "Epoch %d: loss=%f, acc=%f, val_loss=%f, val_acc=%f\n" % (
-                log['epoch'], log['loss'], log.get('acc', 0), log.get('val_loss', 0), total_accuracy_validation, )
-            self.logger.write(line)
+        if self.weight_histograms:
+            self.send_weight_histograms(log['epoch'])
 
-        if self.force_insights or self.job_model.insights_enabled:
-            # todo, support multiple inputs
-            first_input_layer = self.model.input_layers[0]
+    def lower_insights_frequency(self):
+        self.insights_epoch_interval = min(16, self.insights_epoch_interval * 2)
 
-            if first_input_layer is not None:
+    def send_batch_loss(self, batch, loss):
+        """
+        Downsamples at the source: sends mean, min and max of the loss of every nb_batches / batch_loss_points
+        batches, with the fractional epoch as x.
+        """
+        self.batch_loss_window.add(loss)
+
+        nb_batches = self.current.get('nb_batches', 0)
+        window = max(1, int(nb_batches // self.batch_loss_points)) if nb_batches else 1
+
+        if self.batch_loss_window.count >= window or batch + 1 >= nb_batches:
+            x = self.current_epoch + (batch + 1) / float(nb_batches) if nb_batches else self.current_epoch
+            self.batch_loss_channel.send(
+                x, [self.batch_loss_window.mean, self.batch_loss_window.min, self.batch_loss_window.max]
+            )
+            self.batch_loss_window.reset()
+
+    def send_weight_histograms(self, epoch):
+        with self.job_backend.git.batch_commit('WEIGHT HISTOGRAMS'):
+            for layer in self.model.layers:
+                weights = layer.get_weights()
+                if not weights:
+                    continue
+
+                if layer.name not in self.histogram_channels:
+                    self.histogram_channels[layer.name] = self.job_backend.create_histogram_channel('weights ' + layer.name)
 
-                images = self.build_insight_images()
-                # build confusion matrix
-                confusion_matrix = self.build_confusion_matrix() if self.confusion_matrix else None
+                self.histogram_channels[layer.name].send(epoch, weights[0])
 
-                self.job_backend.job_add_insight(log['epoch'], images, confusion_matrix)
+    def send_pipeline_info(self, epoch):
+        if self.pipeline_compute.count == 0:
+            return
+
+        percentiles = [50, 90, 99]
+        wait = self.pipeline_wait.percentiles(percentiles)
+        compute = self.pipeline_compute.percentiles(percentiles)
+
+        self.pipeline_channel.send(epoch, [v * 1000 if v is not None else None for v in wait + compute])
+
+        step_time = self.pipeline_wait.total + self.pipeline_compute.total
+        if step_time > 0 and self.pipeline_wait.total / step_time > self.pipeline_wait_warning:
+            self.logger.warning("Epoch %d: %.0f%% of the step time was spent waiting for input data. "
+                                "The data pipeline is probably too slow." % (epoch, self.pipeline_wait.total / step_time * 100))
 
     def send_optimizer_info(self, epoch):
         self.learning_rate_channel.send(epoch, [self.learning_rate_start, self.get_learning_rate()])
@@ -330,10 +487,17 @@ class KerasCallback(Callback):
         return len(self.model.inputs) > 1
 
     def build_insight_images(self):
+        return self.render_insight_images(self.collect_insight_data())
+
+    def collect_insight_data(self):
+        """
+        Evaluates the insight layers and returns the raw arrays to visualize as list of (kind, id, data, label).
+        Needs to run on the training thread, everything else can happen in render_insight_images().
+        """
         if self.insights_x is None:
             print("Insights requested, but no 'insights_x' in create_keras_callback() given.")
 
-        images = []
+        entries = []
         input_data_x_sample = []
 
         if self.has_multiple_inputs():
@@ -353,9 +517,7 @@ class KerasCallback(Callback):
                 if K.image_dim_ordering() == 'tf':
                     x = np.transpose(x, (2, 0, 1))
 
-                image = self.make_image(x)
-                if image:
-                    images.append(JobImage(layer.name, image))
+                entries.append(('input', layer.name, x, None))
 
         uses_learning_phase = self.model.uses_learning_phase
         inputs = self.model.inputs[:]
@@ -366,22 +528,23 @@ class KerasCallback(Callback):
 
         layers = self.model.layers + self.insight_layer
 
-        pos = 0
+        fn, visualized_layers = self.get_insight_function(inputs, layers)
+
+        # one forward pass for the activations of all visualized layers
+        outputs = dict(zip([id(layer) for layer in visualized_layers], fn(input_data_x_sample))) if fn else {}
+
         for layer in layers:
-            if isinstance(layer, keras.layers.convolutional.Convolution2D) or isinstance(layer, keras.layers.convolutional.MaxPooling2D)\
-                    or isinstance(layer, keras.layers.convolutional.UpSampling2D):
-                fn = K.function(inputs, self.get_layout_output_tensors(layer))
-                Y = fn(input_data_x_sample)[0]
+            if self.is_conv_layer(layer):
+                if id(layer) in outputs:
+                    Y = outputs[id(layer)]
 
-                data = Y[0]
+                    data = Y[0]
 
-                if len(data.shape) == 3:
-                    if K.image_dim_ordering() == 'tf':
-                        data = np.transpose(data, (2, 0, 1))
+                    if len(data.shape) == 3:
+                        if K.image_dim_ordering() == 'tf':
+                            data = np.transpose(data, (2, 0, 1))
 
-                    image = PIL.Image.fromarray(get_image_tales(data))
-                    pos += 1
-                    images.append(JobImage(layer.name, image, pos=pos))
+                        entries.append(('tales', layer.name, data, None))
 
                 if layer.get_weights():
                     data = layer.get_weights()[0]
@@ -399,42 +562,113 @@ class KerasCallback(Callback):
 
                     data = data.reshape((data.shape[0] * data.shape[1], data.shape[2], data.shape[3]))
 
-                    image = PIL.Image.fromarray(get_image_tales(data))
-                    pos += 1
-                    images.append(JobImage(layer.name + '_weights', image, layer.name + ' weights', pos=pos))
+                    entries.append(('tales', layer.name + '_weights', data, layer.name + ' weights'))
 
-            elif isinstance(layer, keras.layers.ZeroPadding2D) or isinstance(layer, keras.layers.ZeroPadding1D) or isinstance(layer, keras.layers.ZeroPadding3D):
-                pass
-            elif isinstance(layer, keras.layers.noise.GaussianDropout) or isinstance(layer, keras.layers.noise.GaussianNoise):
-                pass
-            elif isinstance(layer, keras.layers.Dropout):
-                pass
-            else:
-                outputs = self.get_layout_output_tensors(layer)
+            elif id(layer) in outputs:
+                Y = outputs[id(layer)]
+                Y = np.squeeze(Y)
 
-                if len(outputs) > 0:
-                    fn = K.function(inputs, outputs)
-                    Y = fn(input_data_x_sample)[0]
-                    Y = np.squeeze(Y)
+                if Y.size == 1:
+                    Y = np.array([Y])
 
-                    if Y.size == 1:
-                        Y = np.array([Y])
+                if len(Y.shape) > 1:
+                    if len(Y.shape) == 3 and self.is_image_shape(Y) and K.image_dim_ordering() == 'tf':
+                        Y = np.transpose(Y, (2, 0, 1))
 
-                    image = None
-                    if len(Y.shape) > 1:
-                        if len(Y.shape) == 3 and self.is_image_shape(Y) and K.image_dim_ordering() == 'tf':
-                            Y = np.transpose(Y, (2, 0, 1))
+                    entries.append(('square', layer.name, Y, None))
+                elif len(Y.shape) == 1:
+                    entries.append(('dense', layer.name, Y, None))
+
+        return entries
+
+    def render_insight_images(self, entries):
+        """
+        Converts the result of collect_insight_data() to JobImages. Does not use the Keras backend.
+        """
+        images = []
+
+        pos = 0
+        for kind, id, data, label in entries:
+            if kind == 'input':
+                image = self.make_image(data)
+                if image:
+                    images.append(JobImage(id, image))
+                continue
 
-                        image = PIL.Image.fromarray(get_layer_vis_square(Y))
-                    elif len(Y.shape) == 1:
-                        image = self.make_image_from_dense(Y)
+            if kind == 'tales':
+                image = PIL.Image.fromarray(get_image_tales(data))
+            elif kind == 'square':
+                image = PIL.Image.fromarray(get_layer_vis_square(data))
+            else:
+                image = self.make_image_from_dense(data)
 
-                    if image:
-                        pos += 1
-                        images.append(JobImage(layer.name, image, pos=pos))
+            if image:
+                pos += 1
+                images.append(JobImage(id, image, label, pos=pos))
 
         return images
 
+    def is_insight_due(self, epoch):
+        if epoch % self.insights_epoch_interval != 0:
+            return False
+
+        if self.insights_seconds_interval and self.last_insight_time is not None:
+            if time.time() - self.last_insight_time < self.insights_seconds_interval:
+                return False
+
+        return True
+
+    def send_insights(self, epoch, confusion_matrix=False):
+        """
+        Collects the insight data on the training thread and renders, encodes and commits the images in the
+        insight pool. When the pool is still busy with earlier insights, these are dropped or deferred.
+        """
+        def prepare():
+            self.last_insight_time = time.time()
+            return self.collect_insight_data(), self.build_confusion_matrix() if confusion_matrix else None
+
+        def task(prepared):
+            entries, matrix = prepared
+            self.job_backend.job_add_insight(epoch, self.render_insight_images(entries), matrix)
+
+        if not self.insight_pool.submit(prepare, task):
+            self.logger.debug("Insights of epoch %d dropped, previous insights are still being processed." % (epoch,))
+
+    def is_conv_layer(self, layer):
+        return isinstance(layer, keras.layers.convolutional.Convolution2D) \
+            or isinstance(layer, keras.layers.convolutional.MaxPooling2D) \
+            or isinstance(layer, keras.layers.convolutional.UpSampling2D)
+
+    def is_skipped_insight_layer(self, layer):
+        return isinstance(layer, keras.layers.ZeroPadding2D) or isinstance(layer, keras.layers.ZeroPadding1D) \
+            or isinstance(layer, keras.layers.ZeroPadding3D) \
+            or isinstance(layer, keras.layers.noise.GaussianDropout) or isinstance(layer, keras.layers.noise.GaussianNoise) \
+            or isinstance(layer, keras.layers.Dropout)
+
+    def get_insight_function(self, inputs, layers):
+        """
+        Returns one backend function with the output of all visualized layers, compiled only once per set of
+        layers, and the list of layers in the order of its outputs.
+        """
+        key = tuple(id(layer) for layer in layers)
+
+        if self.insight_function is None or self.insight_function[0] != key:
+            visualized_layers = []
+            tensors = []
+            for layer in layers:
+                if self.is_skipped_insight_layer(layer):
+                    continue
+
+                outputs = self.get_layout_output_tensors(layer)
+                if outputs:
+                    visualized_layers.append(layer)
+                    tensors.append(outputs[0])
+
+            fn = K.function(inputs, tensors) if tensors else None
+            self.insight_function = (key, fn, visualized_layers)
+
+        return self.insight_function[1], self.insight_function[2]
+
     def get_layout_output_tensors(self, layer):
         outputs = []
 
@@ -444,21 +678,41 @@ class KerasCallback(Callback):
 
         return outputs
 
+    def get_confusion_matrix_output(self, model):
+        """
+        Returns the output layer the confusion matrix is built for, or None when the model has no single softmax output.
+        """
+        if len(model.output_layers) > 1:
+            return None
+
+        first_output_layer = model.output_layers[0]
+
+        if 'Softmax' not in str(first_output_layer.output) or len(first_output_layer.output_shape) != 2:
+            return None
+
+        return first_output_layer
+
     def build_confusion_matrix(self):
+        """
+        Predicts the callback's validation_data (at most confusion_matrix_samples) and counts the classes.
+
+        The predictions of Keras' own validation are not reused: that would need a replaced model.test_function,
+        which has to keep Keras' state and metric updates and function kwargs across Keras versions, and it sees
+        fit's validation set, not the callback's validation_data.
+        """
         confusion_matrix = {}
 
         if self.data_validation_size is None:
             return confusion_matrix
 
-        if len(self.model.output_layers) > 1:
-            return confusion_matrix
-
-        first_input_layer = self.model.input_layers[0]
-        first_output_layer = self.model.output_layers[0]
+        first_output_layer = self.get_confusion_matrix_output(self.model)
 
-        if 'Softmax' not in str(first_output_layer.output) or len(first_output_layer.output_shape) != 2:
+        if first_output_layer is None:
             return confusion_matrix
 
+        classes = first_output_layer.output_shape[1]
+
+        first_input_layer = self.model.input_layers[0]
         input_data_x = None
         input_data_y = []
 
@@ -494,54 +748,59 @@ class KerasCallback(Callback):
         if input_data_x is None:
             return confusion_matrix
 
-        matrix = np.zeros((first_output_layer.output_shape[1], first_output_layer.output_shape[1]))
+        matrix = ConfusionMatrix(classes)
 
-        if is_generator(input_data_x):
-            processed_samples = 0
+        limit = self.data_validation_size
+        if self.confusion_matrix_samples:
+            limit = min(limit, self.confusion_matrix_samples)
 
-            while processed_samples < self.data_validation_size:
+        if not is_generator(input_data_x):
+            # one predict over the (capped) validation arrays
+            batch_size = self.current['batch_size'] if 'batch_size' in self.current else 32
+            prediction = self.model.predict(slice_inputs(input_data_x, 0, limit), batch_size=batch_size)
+
+            try:
+                matrix.add(np.asarray(input_data_y)[:limit], prediction)
+            except Exception as e:
+                self.logger.warning('Could not build the confusion matrix: ' + str(e))
+
+            confusion_matrix[first_output_layer.name] = matrix.tolist()
+
+            return confusion_matrix
+
+        start = time.time()
+        seen = 0
+
+        while seen < limit:
+            try:
                 generator_output = next(input_data_x)
-                if len(generator_output) == 2:
-                    x, y = generator_output
-                    sample_weight = None
-                elif len(generator_output) == 3:
-                    x, y, sample_weight = generator_output
-                else:
-                    self.model._stop.set()
-                    raise Exception('output of generator should be a tuple '
-                                    '(x, y, sample_weight) '
-                                    'or (x, y). Found: ' + str(generator_output))
-
-                if type(x) is list:
-                    nb_samples = len(x[0])
-                elif type(x) is dict:
-                    nb_samples = len(list(x.values())[0])
-                else:
-                    nb_samples = len(x)
-
-                processed_samples += nb_samples
-
-                prediction = self.model.predict_on_batch(x)
-                predicted_classes = prediction.argmax(axis=-1)
-                expected_classes = y.argmax(axis=-1)
-
-                try:
-                    for sample_idx, predicted_class in enumerate(predicted_classes):
-                        expected_class = expected_classes[sample_idx]
-                        matrix[expected_class, predicted_class] += 1
-                except Exception: pass
+            except StopIteration:
+                break
 
-        else:
-            batch_size = self.current['batch_size'] if 'batch_size' in self.current else 16
-            prediction = self.model.predict(input_data_x, batch_size=batch_size)
-            predicted_classes = prediction.argmax(axis=-1)
-            expected_classes = np.array(input_data_y).argmax(axis=-1)
+            if len(generator_output) == 2:
+                x, y = generator_output
+            elif len(generator_output) == 3:
+                x, y, sample_weight = generator_output
+            else:
+                raise Exception('output of generator should be a tuple '
+                                '(x, y, sample_weight) '
+                                'or (x, y). Found: ' + str(generator_output))
+
+            if len(y) == 0:
+                break
+
+            seen += len(y)
+            prediction = self.model.predict_on_batch(x)
 
             try:
-                for sample_idx, predicted_class in enumerate(predicted_classes):
-                    expected_class = expected_classes[sample_idx]
-                    matrix[expected_class, predicted_class] += 1
-            except Exception: pass
+                matrix.add(y, prediction)
+            except Exception as e:
+                # the following batches have the same format
+                self.logger.warning('Could not build the confusion matrix: ' + str(e))
+                break
+
+            if self.confusion_matrix_seconds and time.time() - start > self.confusion_matrix_seconds:
+                break
 
         confusion_matrix[first_output_layer.name] = matrix.tolist()
 
@@ -3,18 +3,32 @@ from __future__ import absolute_import
 
 import json
 import time
+from collections import deque
+
 import psutil
-from threading import Thread
+from threading import Thread, Event, Lock
 import numpy as np
 import aetros.cuda_gpu
 
 
 class MonitoringThread(Thread):
-    def __init__(self, job_backend, start_time=None):
+    """
+    Samples cpu, memory and gpu memory every `sample_interval` seconds into an in-memory ring and writes the
+    collected samples every `upload_interval` seconds with one stream write. If uploads fall behind, the ring keeps
+    only the newest `ring_size` samples.
+
+    :param gpu_backend: object with get_ordered_devices() and get_memory(device), defaults to aetros.cuda_gpu.CudaDevices
+    """
+
+    def __init__(self, job_backend, start_time=None, sample_interval=1, upload_interval=5, ring_size=3600,
+                 gpu_backend=None):
         Thread.__init__(self)
 
         self.job_backend = job_backend
         self.max_minutes = 0
+        self.sample_interval = sample_interval
+        self.upload_interval = upload_interval
+        self.gpu_backend = gpu_backend or aetros.cuda_gpu.CudaDevices()
 
         job = self.job_backend.job
         if 'maxTime' in job['config'] and job['config']['maxTime'] > 0:
@@ -23,38 +37,57 @@ class MonitoringThread(Thread):
         self.stream = self.job_backend.git.stream_file('aetros/job/monitoring.csv')
 
         header = ["second", "cpu", "memory"]
-        try:
-            for gpu in aetros.cuda_gpu.get_ordered_devices():
-                header.append("memory_gpu" + str(gpu['id']))
-        except Exception: pass
+        self.gpus = self.gpu_backend.get_ordered_devices()
+        for gpu in self.gpus:
+            header.append("memory_gpu" + str(gpu['id']))
 
         self.stream.write(json.dumps(header)[1:-1] + "\n")
-        self.second = 0
+
+        # psutil returns the utilization since the last call, so the first real sample covers the time since now
+        psutil.cpu_percent(interval=None, percpu=True)
+
+        self.samples = deque(maxlen=ring_size)
+        self.process_accounting = None
+        self.process_stream = None
+        self.process_samples = deque(maxlen=ring_size)
+        self.lock = Lock()
+        self.stop_event = Event()
+
         self.started = start_time or time.time()
+        self.last_upload = time.time()
         self.running = True
         self.early_stopped = False
         self.handle_max_time = True
         self.handle_max_time_time = self.started
 
+    def watch_process_tree(self, accounting):
+        """
+        Records the resource usage of the job's processes additionally in monitoring_process.csv.
+
+        :type accounting: aetros.utils.process.ProcessTreeAccounting
+        """
+        with self.lock:
+            if self.process_stream is None:
+                self.process_stream = self.job_backend.git.stream_file('aetros/job/monitoring_process.csv')
+                self.process_stream.write(json.dumps(["second"] + accounting.columns)[1:-1] + "\n")
+
+            self.process_accounting = accounting
+
     def stop(self):
         self.running = False
+        self.stop_event.set()
+        self.flush()
 
     def run(self):
         while self.running:
+            next_sample = time.time() + self.sample_interval
             self.monitor()
-            time.sleep(0.01)
+            self.stop_event.wait(max(0, next_sample - time.time()))
 
     def monitor(self):
         if self.early_stopped:
             return
 
-        cpu_util = np.mean(psutil.cpu_percent(interval=1, percpu=True)) #blocks 1sec
-        mem = psutil.virtual_memory()
-
-
-        if not self.running:
-            return
-
         if self.handle_max_time and self.max_minutes > 0:
             minutes_run = (time.time() - self.handle_max_time_time) / 60
             if minutes_run > self.max_minutes:
@@ -62,22 +95,58 @@ class MonitoringThread(Thread):
                 self.job_backend.logger.warning("Max time of "+str(self.max_minutes)+" minutes reached.")
                 self.job_backend.early_stop()
 
-        row = [self.second, cpu_util, mem.percent]
+        self.sample()
+
+        if time.time() - self.last_upload >= self.upload_interval:
+            self.flush()
 
-        try:
-            for gpu in aetros.cuda_gpu.get_ordered_devices():
-                gpu_memory_use = None
-                info = aetros.cuda_gpu.get_memory(gpu['device'])
+    def sample(self):
+        cpu_util = np.mean(psutil.cpu_percent(interval=None, percpu=True))
+        mem = psutil.virtual_memory()
+
+        row = [round(time.time() - self.started, 2), cpu_util, mem.percent]
 
+        for gpu in self.gpus:
+            gpu_memory_use = None
+            try:
+                info = self.gpu_backend.get_memory(gpu['device'])
                 if info is not None:
                     free, total = info
                     gpu_memory_use = (total-free) / total*100
-
-                row.append(gpu_memory_use)
-        except Exception: pass
-
-        self.stream.write(json.dumps(row)[1:-1] + "\n")
-        self.job_backend.git.store_file('aetros/job/times/elapsed.json', json.dumps(time.time() - self.started))
-
-        self.second += 1
-        pass
\ No newline at end of file
+            except Exception: pass
+
+            row.append(gpu_memory_use)
+
+        process_row = None
+        if self.process_accounting is not None:
+            try:
+                values = self.process_accounting.sample()
+                if values is not None:
+                    process_row = [row[0]] + values
+            except Exception: pass
+
+        with self.lock:
+            self.samples.append(row)
+            if process_row is not None:
+                self.process_samples.append(process_row)
+
+    def flush(self):
+        """
+        Writes all samples of the ring to monitoring.csv and updates elapsed.json.
+        """
+        with self.lock:
+            self.last_upload = time.time()
+
+            if self.process_samples:
+                lines = [json.dumps(row)[1:-1] + "\n" for row in self.process_samples]
+                self.process_samples.clear()
+                self.process_stream.write(''.join(lines))
+
+            if not self.samples:
+                return
+
+            lines = [json.dumps(row)[1:-1] + "\n" for row in self.samples]
+            self.samples.clear()
+
+            self.stream.write(''.join(lines))
+            self.job_backend.git.store_file('aetros/job/times/elapsed.json', json.dumps(time.time() - self.started))
@@ -23,6 +23,7 @@ command_summaries = [
     ['init', 'Creates a new model and places a aetros.yml in current working directory pointing to this model.'],
     ['id', 'Shows under which account the machine is authenticated.'],
     ['gpu', 'Shows information about installed GPUs'],
+    ['log', 'Shows the log of a local job: tail, follow or a single section.'],
 ]
 
 def parseopts(args):
@@ -65,6 +66,7 @@ def main(args=None):
     from aetros.commands.InitCommand import InitCommand
     from aetros.commands.IdCommand import IdCommand
     from aetros.commands.GPUCommand import GPUCommand
+    from aetros.commands.LogCommand import LogCommand
     from aetros.commands.AuthenticateCommand import AuthenticateCommand
 
     commands_dict = {
@@ -82,6 +84,7 @@ def main(args=None):
         'add': AddCommand,
         'init': InitCommand,
         'gpu': GPUCommand,
+        'log': LogCommand,
     }
 
     if cmd_name not in commands_dict:
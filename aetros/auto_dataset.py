@@ -5,6 +5,7 @@ import hashlib
 import json
 import random
 import shutil
+import tempfile
 # import urllib
 import os
 from pprint import pprint
@@ -18,9 +19,13 @@ import requests
 from PIL import Image
 
 from aetros.utils import get_option
+from aetros.utils.stats import StreamStats
 from .keras_model_utils import ensure_dir
 from .backend import invalid_json_values
 
+import multiprocessing
+from collections import deque
+from multiprocessing.pool import ThreadPool
 from threading import Thread, Lock
 from six.moves.queue import Queue, Empty
 import six
@@ -125,6 +130,9 @@ class ImageDownloaderWorker(Thread):
 class ImageReadWorker(Thread):
 
     def __init__(self, q, job_model, input_node, path, images, controller):
+        """
+        :type images: ImageStore
+        """
         Thread.__init__(self)
         self.q = q
         self.job_model = job_model
@@ -135,68 +143,547 @@ class ImageReadWorker(Thread):
 
     def run(self):
         while self.controller['running']:
-            self.handle(self.q.get())
-            self.q.task_done()
+            message = self.q.get()
+            try:
+                self.handle(message)
+            finally:
+                # an unexpected error must not block q.join()
+                self.q.task_done()
 
     def handle(self, message):
-        path, validation, category_dir = message
+        path, validation, class_idx = message
 
         try:
             if os.path.isfile(path):
-                input = self.job_model.convert_file_to_input_node(path, self.input_node)
+                pixels = self.job_model.convert_file_to_pixels(path, self.input_node)
             else:
                 return
 
-            if input is not None and len(input) > 0:
-                self.images.append([input, validation, category_dir])
+            if pixels is not None:
+                self.images.add(pixels, class_idx, validation, path)
         except IOError as e:
             print(('Could not open %s due to %s' % (path, e.message)))
             return
 
 
+class ImageStore:
+    """
+    Images of a dataset in one contiguous uint8 array (n, height, width, channels) with parallel int32 class and
+    validation arrays. Filled by several threads, each add() takes the next free slot.
+    """
+
+    def __init__(self, capacity, shape, shared=False):
+        """
+        :param shared: bool : allocate the images in shared memory, so worker processes can write into it
+                              (see decode_images_in_processes)
+        """
+        self.buffer = None
+        if shared:
+            self.buffer = multiprocessing.RawArray('B', int(capacity * np.prod(shape)))
+            self.images = np.frombuffer(self.buffer, dtype='uint8').reshape((capacity,) + tuple(shape))
+        else:
+            self.images = np.empty((capacity,) + tuple(shape), dtype='uint8')
+        self.labels = np.empty((capacity,), dtype='int32')
+        self.validation = np.empty((capacity,), dtype='bool')
+        # file path of each image, used for the ImageCache manifest
+        self.keys = [None] * capacity
+        self.size = 0
+        self.lock = Lock()
+
+    @staticmethod
+    def from_arrays(images, labels, validation, keys):
+        """
+        Creates a full store of existing arrays, e.g. the memory-mapped images of an ImageCache.
+        """
+        store = ImageStore(0, images.shape[1:])
+        store.images = images
+        store.labels = labels
+        store.validation = validation
+        store.keys = keys
+        store.size = len(images)
+
+        return store
+
+    def add(self, pixels, class_idx, validation, key=None):
+        index = self.reserve(1)
+
+        self.images[index] = pixels
+        self.set(index, class_idx, validation, key)
+
+    def reserve(self, count):
+        """
+        Reserves the next `count` slots, returns the index of the first one.
+        """
+        with self.lock:
+            if self.size + count > len(self.images):
+                raise Exception('ImageStore is full.')
+
+            index = self.size
+            self.size += count
+
+        return index
+
+    def set(self, index, class_idx, validation, key=None):
+        self.labels[index] = class_idx
+        self.validation[index] = validation
+        self.keys[index] = key
+
+    def remove(self, indices):
+        """
+        Removes the given slots (e.g. images that could not be decoded), keeping the order of the others.
+        Images are moved down one by one in place, so no copy of the whole dataset is made.
+        """
+        if len(indices) == 0:
+            return
+
+        keep = np.setdiff1d(np.arange(self.size), indices)
+
+        target = int(np.min(indices))
+        for index in keep[keep > target]:
+            self.images[target] = self.images[index]
+            target += 1
+
+        self.labels[:len(keep)] = self.labels[keep]
+        self.validation[:len(keep)] = self.validation[keep]
+        self.keys[:len(keep)] = [self.keys[i] for i in keep]
+        self.size = len(keep)
+
+    @property
+    def x(self):
+        return self.images[:self.size]
+
+    @property
+    def classes(self):
+        return self.labels[:self.size]
+
+    def get_indices(self, validation):
+        """
+        :return: indices of the validation or training images
+        """
+        return np.flatnonzero(self.validation[:self.size] == validation)
+
+    def get_footprint(self):
+        """
+        :return: dict with the bytes used by the stored images and labels, and what float32 images would need
+        """
+        used = self.x.nbytes + self.classes.nbytes + self.validation[:self.size].nbytes
+
+        return {
+            'images': self.x.nbytes,
+            'labels': self.classes.nbytes + self.validation[:self.size].nbytes,
+            'total': used,
+            'allocated': self.images.nbytes + self.labels.nbytes + self.validation.nbytes,
+            'float32': self.x.size * 4,
+        }
+
+
+def get_process_context():
+    """
+    Returns the multiprocessing context of the worker pools: fork where available, so the workers share the memory
+    of this process (images, generators) instead of getting a pickled copy, and the platform default otherwise.
+    """
+    if hasattr(os, 'fork') and hasattr(multiprocessing, 'get_context'):
+        return multiprocessing.get_context('fork')
+
+    return multiprocessing
+
+
+decode_worker = {}
+
+
+def init_decode_worker(job_model, input_node, buffer, shape):
+    decode_worker['job_model'] = job_model
+    decode_worker['input_node'] = input_node
+    decode_worker['images'] = np.frombuffer(buffer, dtype='uint8').reshape(shape)
+
+
+def decode_image_into_slot(task):
+    """
+    Runs in a worker process of decode_images_in_processes and writes the pixels into the shared images.
+    Only the index and an error message (None on success) go back to the parent process.
+
+    Workers are forked while logger, git and monitoring threads of the parent are running, so they must not
+    write to sys.stdout/sys.stderr. The parent prints the errors.
+    """
+    index, path = task
+
+    try:
+        pixels = decode_worker['job_model'].convert_file_to_pixels(path, decode_worker['input_node'],
+                                                                   raise_errors=True)
+    except Exception as e:
+        return index, str(e)
+
+    decode_worker['images'][index] = pixels
+
+    return index, None
+
+
+def decode_images_in_processes(job_model, input_node, images, messages, processes=None):
+    """
+    Decodes the image files in a process pool. Each file gets the next free slot of images in order of messages,
+    so the order is deterministic. Files that could not be decoded are removed afterwards.
+
+    :type images: ImageStore : needs to be created with shared=True
+    :param messages: list of [path, validation, class_idx]
+    """
+    if images.buffer is None:
+        raise Exception('decode_images_in_processes needs an ImageStore in shared memory.')
+
+    start = images.reserve(len(messages))
+    tasks = [(start + i, message[0]) for i, message in enumerate(messages)]
+    failed = []
+
+    pool = get_process_context().Pool(processes, initializer=init_decode_worker,
+                                      initargs=(job_model, input_node, images.buffer, images.images.shape))
+
+    try:
+        for index, error in pool.imap_unordered(decode_image_into_slot, tasks, chunksize=16):
+            path, validation, class_idx = messages[index - start]
+            images.set(index, class_idx, validation, path)
+
+            if error is not None:
+                print(('Could not open %s due to %s' % (path, error)))
+                failed.append(index)
+    finally:
+        pool.close()
+        pool.join()
+
+    images.remove(failed)
+
+
+class ImageCache:
+    """
+    Decoded images of a dataset directory on disk: images-<random>.npy (uint8, memory-mapped when loaded) and
+    manifest.json with the name of that images file and the index, size and mtime of each file. The directory is per
+    dataset path and input node (width, height, inputType, imageScale).
+
+    Each save() writes a new images file and then replaces manifest.json with one rename, so jobs using the same
+    cache concurrently never see a manifest with the images of another save.
+
+    Labels are not cached, they come from the directory listing of the current run.
+    """
+
+    def __init__(self, cache_dir, path, input_node):
+        key = json.dumps([os.path.abspath(path), input_node['width'], input_node['height'],
+                          input_node['inputType'], input_node.get('imageScale', 255)])
+
+        self.dir = os.path.normpath(cache_dir + '/' + hashlib.md5(six.b(key)).hexdigest())
+        self.manifest_path = self.dir + '/manifest.json'
+
+        self.images = None
+        self.files = {}
+        self.listing = None
+
+    @staticmethod
+    def get_listing_hash(stats):
+        """
+        :param stats: dict path => [size, mtime]
+        """
+        return hashlib.md5(six.b(json.dumps(sorted(stats.items())))).hexdigest()
+
+    def load(self):
+        """
+        Memory-maps the cached images. Returns False if there is no (valid) cache.
+        """
+        if not os.path.exists(self.manifest_path):
+            return False
+
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+
+            if manifest.get('version') != 2:
+                return False
+
+            self.images = np.load(os.path.join(self.dir, manifest['images']), mmap_mode='r')
+        except Exception:
+            self.images = None
+            return False
+
+        if manifest['count'] != len(self.images):
+            self.images = None
+            return False
+
+        self.files = manifest['files']
+        self.listing = manifest['listing']
+
+        return True
+
+    def get(self, path, stat):
+        """
+        Returns the cached pixels of path when the file did not change, else None.
+        """
+        entry = self.files.get(path)
+        if entry is None or entry[1:] != list(stat):
+            return None
+
+        return self.images[entry[0]]
+
+    def save(self, store, stats):
+        """
+        Writes the images into a new file and publishes it by replacing manifest.json, then removes the images
+        file of the replaced manifest. Memory maps of it stay valid on POSIX, elsewhere it is left on disk.
+
+        :type store: ImageStore
+        :param stats: dict path => [size, mtime] of all listed files
+        """
+        ensure_dir(self.dir)
+
+        previous = None
+        try:
+            with open(self.manifest_path, 'r') as f:
+                previous = json.load(f).get('images')
+        except Exception:
+            pass
+
+        files = {}
+        for index, path in enumerate(store.keys[:store.size]):
+            files[path] = [index] + list(stats[path])
+
+        images_handle, images_path = tempfile.mkstemp(prefix='images-', suffix='.npy', dir=self.dir)
+        manifest_path = None
+
+        try:
+            with os.fdopen(images_handle, 'wb') as f:
+                np.save(f, store.x)
+
+            manifest = {'version': 2, 'images': os.path.basename(images_path), 'count': store.size,
+                        'listing': self.get_listing_hash(stats), 'files': files}
+
+            manifest_handle, manifest_path = tempfile.mkstemp(prefix='manifest-', suffix='.tmp', dir=self.dir)
+            with os.fdopen(manifest_handle, 'w') as f:
+                json.dump(manifest, f)
+
+            os.rename(manifest_path, self.manifest_path)
+        except Exception:
+            for path in [images_path, manifest_path]:
+                if path and os.path.exists(path):
+                    os.unlink(path)
+            raise
+
+        if previous and previous != manifest['images']:
+            try:
+                os.unlink(os.path.join(self.dir, previous))
+            except OSError:
+                pass
+
+
 class InMemoryDataGenerator():
+    """
+    Yields shuffled (x, y) batches of images held in memory, y as one-hot vectors. Every image is used once per pass.
+
+    The images are kept in one contiguous array. Without augmentation (datagen=None) a batch is taken with one
+    fancy-index of that array using a slice of a random permutation.
+
+    images: list of [image, class_idx] or an ImageStore. With an ImageStore, `indices` selects the images of this
+    generator and `convert` turns a batch of stored uint8 pixels into the model input (scaling, channel order).
 
-    def __init__(self, datagen, images, classes_count, batch_size):
-        self.index = -1
+    reuse_buffers: write batches into the same output arrays every time. Only safe when each batch is consumed
+    before the next is requested (i.e. not with Keras' queued fit_generator workers).
+    """
+
+    def __init__(self, datagen, images, classes_count, batch_size, reuse_buffers=False, indices=None, convert=None,
+                 seed=None):
         self.datagen = datagen
-        self.images = images
-        random.shuffle(self.images)
         self.lock = Lock()
 
         self.classes_count = classes_count
         self.batch_size = batch_size
+        self.reuse_buffers = reuse_buffers
+
+        self.convert = convert
+
+        if isinstance(images, ImageStore):
+            self.x = images.x
+            self.classes = images.classes
+        else:
+            self.x = np.stack([image for image, class_idx in images]) if images else None
+            self.classes = np.array([class_idx for image, class_idx in images], dtype='int64')
+
+        self.indices = indices
+        self.one_hot = np.eye(classes_count, dtype='float32')
+
+        # own random state, so the order of images is reproducible for a given seed
+        self.random = np.random.RandomState(seed)
+        self.permutation = self.random.permutation(len(self))
+        self.position = 0
+
+        self.batch_x = None
+        self.batch_y = None
 
     def __iter__(self):
         return self
 
+    def __len__(self):
+        return len(self.classes) if self.indices is None else len(self.indices)
+
+    def next_indices(self):
+        """
+        Returns the indices of the next batch, a new permutation is used once all images have been used.
+        """
+        size = len(self)
+        if size == 0:
+            raise Exception('InMemoryDataGenerator has no images.')
+
+        parts = []
+        missing = self.batch_size
+
+        with self.lock:
+            while missing > 0:
+                if self.position == size:
+                    self.position = 0
+                    self.permutation = self.random.permutation(size)
+
+                end = min(size, self.position + missing)
+                parts.append(self.permutation[self.position:end])
+                missing -= end - self.position
+                self.position = end
+
+        positions = parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+        return positions if self.indices is None else self.indices[positions]
+
     def next(self):
+        return self.build_batch(self.next_indices())
+
+    def build_batch(self, indices):
+        if self.reuse_buffers:
+            if self.batch_y is None:
+                self.batch_y = np.empty((self.batch_size, self.classes_count), dtype='float32')
+            batch_y = np.take(self.one_hot, self.classes[indices], axis=0, out=self.batch_y)
+        else:
+            batch_y = self.one_hot[self.classes[indices]]
+
+        if self.datagen is None:
+            if self.reuse_buffers:
+                if self.batch_x is None:
+                    self.batch_x = np.empty((self.batch_size,) + self.x.shape[1:], dtype=self.x.dtype)
+                batch_x = np.take(self.x, indices, axis=0, out=self.batch_x)
+            else:
+                batch_x = self.x[indices]
+
+            return self.convert(batch_x) if self.convert else batch_x, batch_y
+
         batch_x = []
-        batch_y = []
+        for index in indices:
+            if self.convert:
+                image = self.convert(self.x[index:index + 1])[0]
+            else:
+                # we need to copy it, otherwise we'd operate on the same object again and again
+                image = np.copy(self.x[index])
+            image = self.datagen.random_transform(image)
+            image = self.datagen.standardize(image)
+            batch_x.append(image)
 
-        for i in range(self.batch_size):
+        return np.array(batch_x), batch_y
 
-            with self.lock:
-                self.index += 1
-                # reset iterator if necessary
-                if self.index == len(self.images):
-                    self.index = 0
-                    random.shuffle(self.images)
+    def __next__(self):
+        return self.next()
 
-            image, class_idx = self.images[self.index]
-            # we need to copy it, otherwise we'd operate on the same object again and again
-            image = np.copy(image)
 
-            if self.datagen is not None:
-                image = self.datagen.random_transform(image)
-                image = self.datagen.standardize(image)
+augment_worker = {}
 
-            batch_x.append(image)
 
-            y = np.zeros((self.classes_count,), dtype='float32')
-            y[class_idx] = 1.
-            batch_y.append(y)
+def init_augment_worker(generator):
+    augment_worker['generator'] = generator
+
+
+def augment_batch(task):
+    """
+    Builds one batch in a worker of BatchPrefetcher.
+    """
+    seed, indices = task
+
+    # Keras' ImageDataGenerator.random_transform uses the global np.random
+    np.random.seed(seed % (2 ** 32))
+
+    return augment_worker['generator'].build_batch(indices)
+
+
+class BatchPrefetcher():
+    """
+    Builds the batches of an InMemoryDataGenerator ahead of time in `workers` worker processes (or threads), at most
+    `queue_size` batches in advance, and returns them in order. Used for augmented datasets, where
+    random_transform per image would otherwise run on the training thread.
 
-        return np.array(batch_x), np.array(batch_y)
+    Batch n is built with np.random seeded with seed + n, so with processes the augmentation is reproducible for a
+    given seed (and InMemoryDataGenerator seed). Threads share the global np.random and are not reproducible.
+
+    The share of batches that are ready when one is requested (queue occupancy) is sent per epoch to `channel`.
+    """
+
+    def __init__(self, generator, workers=2, queue_size=8, seed=None, processes=True, channel=None):
+        """
+        :type generator: InMemoryDataGenerator
+        :type channel: aetros.backend.JobChannel|None
+        """
+        self.generator = generator
+        self.workers = workers
+        self.queue_size = queue_size
+        self.seed = seed if seed is not None else random.randint(0, 2 ** 31)
+        self.channel = channel
+        self.lock = Lock()
+
+        self.batch = 0
+        self.served = 0
+        self.pending = deque()
+        self.occupancy = StreamStats()
+        self.steps = max(1, int(math.ceil(len(generator) / float(generator.batch_size))))
+
+        if processes and hasattr(os, 'fork'):
+            self.pool = get_process_context().Pool(workers, initializer=init_augment_worker, initargs=(generator,))
+        else:
+            self.pool = ThreadPool(workers, initializer=init_augment_worker, initargs=(generator,))
+
+        for i in range(queue_size):
+            self.submit()
+
+    def __iter__(self):
+        return self
+
+    def __len__(self):
+        return len(self.generator)
+
+    def submit(self):
+        task = (self.seed + self.batch, self.generator.next_indices())
+        self.batch += 1
+        self.pending.append(self.pool.apply_async(augment_batch, (task,)))
+
+    def next(self):
+        with self.lock:
+            ready = sum(1 for result in self.pending if result.ready())
+            self.occupancy.add(ready / float(self.queue_size))
+
+            result = self.pending.popleft()
+            self.submit()
+
+            self.served += 1
+            if self.served % self.steps == 0:
+                self.send_occupancy()
+
+        return result.get()
+
+    def send_occupancy(self):
+        if self.channel is not None and self.occupancy.count:
+            epoch = int(math.ceil(self.served / float(self.steps)))
+            self.channel.send(epoch, [self.occupancy.mean * 100, self.occupancy.min * 100])
+
+        self.occupancy.reset()
+
+    def close(self):
+        """
+        Sends the occupancy of a partial last epoch and stops the workers. Can be called several times.
+        """
+        with self.lock:
+            if self.pool is None:
+                return
+
+            self.send_occupancy()
+
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+            self.pending.clear()
 
     def __next__(self):
         return self.next()
@@ -219,7 +706,6 @@ def read_images_in_memory(job_model, dataset, node, trainer):
         'Y_test': []
     }
 
-    images = []
     max = 0
 
     path = job_model.get_dataset_downloads_dir(dataset)
@@ -229,15 +715,11 @@ def read_images_in_memory(job_model, dataset, node, trainer):
     classes_count = 0
     category_map = {}
     classes = []
+    files = []
 
     trainer.set_status('LOAD IMAGES INTO MEMORY')
 
     try:
-        for i in range(concurrent):
-            t = ImageReadWorker(q, job_model, node, path, images, controller)
-            t.daemon = True
-            t.start()
-
         for validation_or_training in ['validation', 'training']:
             if os.path.isdir(os.path.normpath(path + '/' + validation_or_training)):
                 for category_name in os.listdir(os.path.normpath(path + '/' + validation_or_training)):
@@ -257,30 +739,108 @@ def read_images_in_memory(job_model, dataset, node, trainer):
 
                         for id in os.listdir(os.path.normpath(path + '/' + validation_or_training + '/' + category_name)):
                             file_path = os.path.join(path, validation_or_training, category_name, id)
-                            q.put([file_path, validation_or_training == 'validation', category_name])
+                            files.append([file_path, validation_or_training == 'validation', category_map[category_name]])
                             max += 1
 
-        q.join()
+        stats = {}
+        for file_path, validation, class_idx in files:
+            stat = os.stat(file_path)
+            stats[file_path] = [stat.st_size, stat.st_mtime]
+
+        cache = None
+        if bool(get_option(dataset_config, 'imageCache', True)):
+            cache = ImageCache(job_model.get_dataset_cache_dir(dataset), path, node)
+            cache.load()
+
+        if cache is not None and cache.images is not None and cache.listing == ImageCache.get_listing_hash(stats):
+            # nothing changed, use the memory-mapped cache directly
+            labels = np.zeros((len(cache.images),), dtype='int32')
+            validations = np.zeros((len(cache.images),), dtype='bool')
+            keys = [None] * len(cache.images)
+
+            for file_path, validation, class_idx in files:
+                if file_path in cache.files:
+                    index = cache.files[file_path][0]
+                    labels[index] = class_idx
+                    validations[index] = validation
+                    keys[index] = file_path
+
+            images = ImageStore.from_arrays(cache.images, labels, validations, keys)
+            trainer.logger.info("Loaded %d decoded images from cache %s" % (images.size, cache.dir))
+        else:
+            # 'processes' decodes in a process pool straight into shared memory, 'threads' in ImageReadWorker threads
+            decoder = get_option(dataset_config, 'imageDecoder', 'processes' if os.name == 'posix' else 'threads')
+
+            # all images in one preallocated uint8 array, converted to the float input per batch
+            images = ImageStore(max, job_model.get_pixels_shape(node), shared=decoder == 'processes')
+
+            decode = []
+            for file_path, validation, class_idx in files:
+                pixels = cache.get(file_path, stats[file_path]) if cache is not None else None
+
+                if pixels is None:
+                    decode.append([file_path, validation, class_idx])
+                else:
+                    images.add(pixels, class_idx, validation, file_path)
+
+            if cache is not None and cache.images is not None:
+                trainer.logger.info("Reused %d decoded images from cache, decoding %d" % (images.size, len(decode)))
+
+            if decode and decoder == 'processes':
+                decode_images_in_processes(job_model, node, images, decode, concurrent)
+
+            elif decode:
+                for i in range(concurrent):
+                    t = ImageReadWorker(q, job_model, node, path, images, controller)
+                    t.daemon = True
+                    t.start()
+
+                for message in decode:
+                    q.put(message)
+
+                q.join()
+
+            if cache is not None:
+                try:
+                    cache.save(images, stats)
+                except Exception as e:
+                    trainer.logger.warning("Could not write image cache %s: %s" % (cache.dir, str(e)))
+
         controller['running'] = False
 
-        train_images = []
-        test_images = []
+        train_images = images.get_indices(False)
+        test_images = images.get_indices(True)
 
-        for v in images:
-            image, validation, category_dir = v
-            if validation is True:
-                test_images.append([image, category_map[category_dir]])
-            else:
-                train_images.append([image, category_map[category_dir]])
+        def convert(pixels):
+            return job_model.convert_pixels_to_node(pixels, node)
 
         train_datagen = None
         augmentation = bool(get_option(dataset_config, 'augmentation', False))
         if augmentation:
             train_datagen = get_image_data_augmentor_from_dataset(dataset)
 
-        train = InMemoryDataGenerator(train_datagen, train_images, classes_count, job_model.job['config']['batchSize'])
+        seed = get_option(dataset_config, 'augSeed', None)
+        if seed is not None:
+            seed = int(seed)
+        train = InMemoryDataGenerator(train_datagen, images, classes_count, job_model.job['config']['batchSize'],
+                                      indices=train_images, convert=convert, seed=seed)
 
-        test = InMemoryDataGenerator(None, test_images, classes_count, job_model.job['config']['batchSize'])
+        if augmentation:
+            # augment batches ahead of time in worker processes instead of on the training thread
+            workers = int(get_option(dataset_config, 'augWorkers', concurrent))
+            channel = trainer.job_backend.create_channel(
+                'augmentation queue', traces=['mean', 'min'], yaxis={'title': '% batches ready'}, flush_interval=5
+            )
+            train = BatchPrefetcher(train, workers=workers, seed=seed, channel=channel,
+                                    queue_size=int(get_option(dataset_config, 'augQueueSize', workers * 2)))
+
+        test = InMemoryDataGenerator(None, images, classes_count, job_model.job['config']['batchSize'],
+                                     indices=test_images, convert=convert)
+
+        footprint = images.get_footprint()
+        trainer.set_info('Dataset memory', footprint)
+        trainer.logger.info("Images use %.1f MB of memory (%.1f MB as float32)" %
+                            (footprint['total'] / 1024 / 1024, footprint['float32'] / 1024 / 1024))
 
         nb_sample = len(train_images)
         trainer.set_info('Dataset size', {'training': nb_sample, 'validation': len(test_images)})
@@ -532,6 +1092,7 @@ def get_images(job_model, dataset, node, trainer):
 
             q.join()
             controller['running'] = False
+            progress.flush()
 
             def move_image(image, category='training'):
                 if image['id'] in images and os.path.isfile(images[image['id']]):
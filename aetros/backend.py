@@ -4,7 +4,7 @@ from __future__ import print_function
 import atexit
 import os
 import socket
-from threading import Thread, Lock
+from threading import Thread, Lock, RLock, Timer
 
 import coloredlogs
 import logging
@@ -17,6 +17,7 @@ import six
 import PIL.Image
 import sys
 import msgpack
+import numpy as np
 
 from aetros.JobModel import JobModel
 from aetros.const import JOB_STATUS
@@ -24,6 +25,9 @@ from aetros.git import Git
 from aetros.logger import GeneralLogger
 from aetros.utils import git, invalid_json_values, read_config, is_ignored, prepend_signal_handler, raise_sigint, \
     read_parameter_by_path, stop_time, read_home_config, lose_parameters_to_full, extract_parameters, create_ssh_stream
+from aetros.utils.channel import get_binary_channel_header, rows_to_binary_columns, ChannelRollup
+from aetros.utils.overhead import measure, meter as overhead_meter
+from aetros.utils.pool import WorkerPool
 from aetros.MonitorThread import MonitoringThread
 
 if not isinstance(sys.stdout, GeneralLogger):
@@ -618,14 +622,70 @@ def start_job(name=None):
     return job
 
 
-class JobLossChannel:
+class BufferedChannel:
+    """
+    Buffers rows of a channel and writes them at most every flush_interval seconds, or directly when
+    flush_interval is not set. Subclasses call init_buffer() and implement write_rows(rows).
+
+    Buffered rows are flushed by a timer when their interval has passed, so a channel that stops receiving
+    points does not keep its last rows until the job stops.
+    """
+
+    def init_buffer(self, flush_interval):
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.time()
+        self.flush_timer = None
+        self.lock = Lock()
+
+    def add_rows(self, rows):
+        with self.lock:
+            self.buffer += rows
+
+            wait = self.flush_interval - (time.time() - self.last_flush) if self.flush_interval else 0
+            if wait > 0 and self.flush_timer is None:
+                self.flush_timer = Timer(wait, self.flush)
+                self.flush_timer.daemon = True
+                self.flush_timer.start()
+
+        if wait <= 0:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all buffered rows. The write happens while holding the lock, so rows of concurrent flushes
+        reach the stream in order.
+        """
+        with self.lock:
+            rows = self.buffer
+            self.buffer = []
+            self.last_flush = time.time()
+
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+
+            if rows:
+                self.write_rows(rows)
+
+    def write_rows(self, rows):
+        raise NotImplementedError()
+
+
+class JobLossChannel(BufferedChannel):
     """
     :type job_backend : JobBackend
     """
 
-    def __init__(self, job_backend, name, xaxis=None, yaxis=None, layout=None):
+    def __init__(self, job_backend, name, xaxis=None, yaxis=None, layout=None, flush_interval=None):
+        """
+        :param flush_interval: None|float : when set, rows are buffered and written at most every
+                                            flush_interval seconds. See JobChannel.
+        """
         self.name = name
         self.job_backend = job_backend
+        self.init_buffer(flush_interval)
+
         message = {
             'name': self.name,
             'traces': [{'name': 'training'}, {'name': 'validation'}],
@@ -640,9 +700,90 @@ class JobLossChannel:
         self.job_backend.git.commit_json_file('CREATE_CHANNEL', 'aetros/job/channel/' + name+ '/config', message)
         self.stream = self.job_backend.git.stream_file('aetros/job/channel/' + name+ '/data.csv')
         self.stream.write('"x","training","validation"\n')
+        self.job_backend.channels.append(self)
 
+    @measure('channel')
     def send(self, x, training_loss, validation_loss):
-        line = json.dumps([x, training_loss, validation_loss])[1:-1]
+        self.add_rows([[x, training_loss, validation_loss]])
+
+    @measure('channel')
+    def send_many(self, xs, training_losses, validation_losses):
+        """
+        Sends several points at once. All arguments are lists or numpy arrays of the same length.
+        """
+        xs = np.asarray(xs).tolist()
+        training_losses = np.asarray(training_losses).tolist()
+        validation_losses = np.asarray(validation_losses).tolist()
+
+        if not (len(xs) == len(training_losses) == len(validation_losses)):
+            raise Exception('send_many of channel %s requires xs, training_losses and validation_losses of same length.'
+                            % (self.name,))
+
+        self.add_rows([list(row) for row in zip(xs, training_losses, validation_losses)])
+
+    def write_rows(self, rows):
+        """
+        Writes rows into the stream and updates last.csv once.
+        """
+        lines = [json.dumps(row)[1:-1] for row in rows]
+        self.stream.write("\n".join(lines) + "\n")
+        self.job_backend.git.store_file('aetros/job/channel/' + self.name + '/last.csv', lines[-1])
+
+
+class JobHistogramChannel:
+    """
+    Channel that receives an array of values per step (e.g. weights or activations of a layer) and stores only the
+    counts of a fixed number of buckets.
+
+    Each row in data.csv is: x, min, max, count bucket 0, ..., count bucket n-1. The bucket range grows with all
+    values seen so far, so buckets of later steps are comparable to earlier ones as long as the range is stable.
+
+    :type job_backend : JobBackend
+    """
+
+    def __init__(self, job_backend, name, bins=30, xaxis=None, yaxis=None, layout=None):
+        self.name = name
+        self.job_backend = job_backend
+        self.bins = bins
+        self.range = None
+
+        message = {
+            'name': self.name,
+            'traces': [{'name': name}],
+            'type': JobChannel.HISTOGRAM,
+            'bins': bins,
+            'main': False,
+            'xaxis': xaxis,
+            'yaxis': yaxis,
+            'layout': layout,
+        }
+
+        self.job_backend.git.commit_json_file('CREATE_CHANNEL', 'aetros/job/channel/' + name + '/config', message)
+        self.stream = self.job_backend.git.stream_file('aetros/job/channel/' + name + '/data.csv')
+        self.stream.write(json.dumps(['x', 'min', 'max'] + [str(i) for i in range(bins)])[1:-1] + "\n")
+
+    @measure('channel')
+    def send(self, x, values):
+        """
+        :param x: int|float : step, e.g. epoch
+        :param values: list|np.ndarray : values of any shape. NaN and inf are ignored.
+        """
+        values = np.asarray(values, dtype='float64').ravel()
+        values = values[np.isfinite(values)]
+
+        if values.size:
+            if self.range is None:
+                self.range = [values.min(), values.max()]
+            else:
+                self.range = [min(self.range[0], values.min()), max(self.range[1], values.max())]
+
+        low, high = self.range if self.range is not None else (0., 1.)
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+
+        counts, _ = np.histogram(values, bins=self.bins, range=(low, high))
+
+        line = json.dumps([x, float(low), float(high)] + counts.tolist())[1:-1]
         self.stream.write(line + "\n")
         self.job_backend.git.store_file('aetros/job/channel/' + self.name + '/last.csv', line)
 
@@ -658,9 +799,10 @@ class JobImage:
         self.pos = pos
 
 
-class JobChannel:
+class JobChannel(BufferedChannel):
     NUMBER = 'number'
     TEXT = 'text'
+    HISTOGRAM = 'histogram'
 
     """
     :type job_backend: JobBackend
@@ -668,7 +810,8 @@ class JobChannel:
 
     def __init__(self, job_backend, name, traces=None,
                  main=False, kpi=False, kpiTrace=0, max_optimization=True,
-                 type=None, xaxis=None, yaxis=None, layout=None):
+                 type=None, xaxis=None, yaxis=None, layout=None, flush_interval=None, binary=False,
+                 rollups=None):
         """
         :param job_backend: JobBakend
         :param name: str
@@ -686,11 +829,21 @@ class JobChannel:
         :param xaxis: dict
         :param yaxis: dict
         :param layout: dict
+        :param flush_interval: None|float : when set, rows are buffered and written (including last.csv and the KPI)
+                                            at most every flush_interval seconds. Remaining rows are written on
+                                            flush() or when the job stops.
+        :param binary: bool : store values as little-endian float64 columns (one file per trace plus header.json)
+                              instead of data.csv. Use aetros.utils.channel.binary_channel_to_csv to get a CSV view.
+        :param rollups: None|str : 'minmax' or 'lttb'. Appends downsampled levels to rollup/<level>.csv next to the
+                                   raw data. Level i has one point per 10 ** (i + 1) raw points, so a plot can pick
+                                   the level that fits its resolution.
         """
         self.name = name
         self.job_backend = job_backend
         self.kpi = kpi
         self.kpiTrace = kpiTrace
+        self.binary = binary
+        self.init_buffer(flush_interval)
 
         if self.kpi:
             self.job_backend.kpi_channel = self
@@ -699,6 +852,12 @@ class JobChannel:
             raise Exception(
                 'traces can only be None or a list of dicts: [{name: "name", option1: ...}, {name: "name2"}, ...]')
 
+        if binary and type == JobChannel.TEXT:
+            raise Exception('Channel %s of type text can not be stored binary.' % (name,))
+
+        if rollups and type == JobChannel.TEXT:
+            raise Exception('Channel %s of type text can not have rollups.' % (name,))
+
         if not traces:
             traces = [{'name': name}]
 
@@ -716,17 +875,30 @@ class JobChannel:
             'xaxis': xaxis,
             'yaxis': yaxis,
             'layout': layout,
+            'storage': 'binary' if binary else 'csv',
         }
         self.traces = traces
+        self.rollup = ChannelRollup(len(traces), rollups) if rollups else None
+        self.rollup_streams = []
         self.job_backend.git.commit_json_file('CREATE_CHANNEL', 'aetros/job/channel/' + name+ '/config', message)
-        self.stream = self.job_backend.git.stream_file('aetros/job/channel/' + name+ '/data.csv')
+
+        columns = ['x'] + [str(x['name']) for x in traces]
+
+        if self.binary:
+            header = get_binary_channel_header(columns)
+            self.job_backend.git.commit_json_file('CREATE_CHANNEL', 'aetros/job/channel/' + name + '/header', header)
+            self.streams = [self.job_backend.git.stream_file('aetros/job/channel/' + name + '/' + file, binary=True)
+                            for file in header['files']]
+        else:
+            self.stream = self.job_backend.git.stream_file('aetros/job/channel/' + name+ '/data.csv')
+            self.stream.write(json.dumps(columns)[1:-1] + "\n")
 
         if self.kpi:
             self.job_backend.git.commit_file('KPI_CHANNEL', 'aetros/job/kpi/name', name)
 
-        line = json.dumps(['x'] + [str(x['name']) for x in traces])[1:-1]
-        self.stream.write(line + "\n")
+        self.job_backend.channels.append(self)
 
+    @measure('channel')
     def send(self, x, y):
         if not isinstance(y, list):
             y = [y]
@@ -736,12 +908,77 @@ class JobChannel:
                 'You tried to set more y values (%d items) then traces available in channel %s (%d traces).' % (
                     len(y), self.name, len(self.traces)))
 
-        line = json.dumps([x] + y)[1:-1]
-        self.stream.write(line + "\n")
-        self.job_backend.git.store_file('aetros/job/channel/' + self.name + '/last.csv', line)
+        self.add_rows([[x] + y])
+
+    @measure('channel')
+    def send_many(self, xs, ys):
+        """
+        Sends several points at once.
+
+        :param xs: list|np.ndarray : x values, shape (n,)
+        :param ys: list|np.ndarray : y values, shape (n,) for channels with one trace, otherwise (n, traces)
+        """
+        xs = np.asarray(xs).tolist()
+        ys = np.asarray(ys)
+
+        if ys.ndim == 1 and len(self.traces) == 1:
+            ys = ys.reshape((-1, 1))
+
+        if ys.shape != (len(xs), len(self.traces)):
+            raise Exception(
+                'send_many of channel %s requires ys of shape (%d, %d), got %s.' % (
+                    self.name, len(xs), len(self.traces), str(ys.shape)))
+
+        self.add_rows([[x] + y for x, y in zip(xs, ys.tolist())])
+
+    def write_rows(self, rows):
+        """
+        Writes rows into the stream and updates last.csv and the KPI once.
+        """
+        if self.binary:
+            for stream, data in zip(self.streams, rows_to_binary_columns(rows)):
+                stream.write(data)
+            last_line = json.dumps(rows[-1])[1:-1]
+        else:
+            lines = [json.dumps(row)[1:-1] for row in rows]
+            self.stream.write("\n".join(lines) + "\n")
+            last_line = lines[-1]
+
+        self.job_backend.git.store_file('aetros/job/channel/' + self.name + '/last.csv', last_line)
 
         if self.kpi:
-            self.job_backend.git.store_file('aetros/job/kpi/last.json', json.dumps(y[self.kpiTrace]))
+            self.job_backend.git.store_file('aetros/job/kpi/last.json', json.dumps(rows[-1][1 + self.kpiTrace]))
+
+        if self.rollup:
+            self.rollup.add_many(rows)
+            self.store_rollups()
+
+    def store_rollups(self):
+        """
+        Appends the rollup points finished since the last call to the stream of their level.
+        """
+        lines = {}
+        for index, row in self.rollup.pop_new_points():
+            lines.setdefault(index, []).append(json.dumps(row)[1:-1])
+
+        levels = len(self.rollup_streams)
+
+        for index in sorted(lines.keys()):
+            while len(self.rollup_streams) <= index:
+                path = 'aetros/job/channel/' + self.name + '/rollup/' + str(len(self.rollup_streams)) + '.csv'
+                stream = self.job_backend.git.stream_file(path)
+                stream.write(json.dumps(self.rollup.get_columns([str(x['name']) for x in self.traces]))[1:-1] + "\n")
+                self.rollup_streams.append(stream)
+
+            self.rollup_streams[index].write("\n".join(lines[index]) + "\n")
+
+        if levels != len(self.rollup_streams):
+            info = {
+                'mode': self.rollup.mode,
+                'factor': self.rollup.factor,
+                'levels': len(self.rollup_streams)
+            }
+            self.job_backend.git.store_file('aetros/job/channel/' + self.name + '/rollup/info.json', json.dumps(info))
 
 
 class JobBackend:
@@ -810,6 +1047,7 @@ class JobBackend:
         self.stop_requested_force = False
 
         self.kpi_channel = None
+        self.channels = []
         self.registered = None
         self.progresses = {}
 
@@ -962,6 +1200,7 @@ class JobBackend:
 
         raise_sigint()
 
+    @measure('batch')
     def batch(self, batch, total, size=None):
         time_diff = time.time() - self.last_batch_time
         self.made_batches += 1
@@ -1004,80 +1243,119 @@ class JobBackend:
             return self.job['config']['settings']
         return {}
 
-    def create_progress(self, id, total_steps=100):
+    def create_progress(self, id, total_steps=100, store_interval=1):
+        """
+        :param id: str
+        :param total_steps: int
+        :param store_interval: float : seconds between two stores of the progress. Changes in between are
+                                       combined. Start, stop and label changes are always stored immediately.
+        """
         if id in self.progresses:
             return self.progresses[id]
 
         class Controller():
-            def __init__(self, git, id, total_steps=100):
+            # weight of the newest interval in the moving average of the time per step
+            eta_smoothing = 0.1
+
+            def __init__(self, git, id, total_steps=100, store_interval=1):
                 self.started = False
                 self.stopped = False
-                self.lock = Lock()
+                self.lock = RLock()
                 self.id = id
                 self.step = 0
                 self.steps = total_steps
                 self.eta = 0
+                self.time_per_step = None
                 self.last_call = 0
+                self.store_interval = store_interval
+                self.last_store = 0
+                self.dirty = False
                 self.git = git
                 self._label = id
 
                 self.store()
 
             def store(self):
-                info = {
-                    'label': self._label,
-                    'started': self.started,
-                    'stopped': self.stopped,
-                    'step': self.step,
-                    'steps': self.steps,
-                    'eta': self.eta,
-                }
+                with self.lock:
+                    info = {
+                        'label': self._label,
+                        'started': self.started,
+                        'stopped': self.stopped,
+                        'step': self.step,
+                        'steps': self.steps,
+                        'eta': self.eta,
+                    }
+                    self.dirty = False
+                    self.last_store = time.time()
+
                 self.git.store_file('aetros/job/progress/' + self.id + '.json', json.dumps(info))
 
+            def flush(self):
+                """
+                Stores the progress if it changed since the last store.
+                """
+                if self.dirty:
+                    self.store()
+
             def label(self, label):
                 self._label = label
                 self.store()
 
             def start(self):
-                if self.started is not False:
-                    return
+                with self.lock:
+                    if self.started is not False:
+                        return
 
-                self.step = 0
-                self.started = time.time()
-                self.last_call = time.time()
-                self.store()
+                    self.step = 0
+                    self.started = time.time()
+                    self.last_call = time.time()
+                    self.store()
 
             def stop(self):
-                if self.stopped is not False:
-                    return
+                with self.lock:
+                    if self.stopped is not False:
+                        return
 
-                self.stopped = time.time()
-                self.store()
+                    self.stopped = time.time()
+                    self.store()
 
             def advance(self, steps=1):
                 if steps <= 0:
                     return
 
-                self.lock.acquire()
-                if self.started is False:
-                    self.start()
+                with self.lock:
+                    # the call that starts the controller has no interval to measure, the time per step is
+                    # seeded from the first real interval
+                    starting = self.started is False
+                    if starting:
+                        self.start()
 
-                took = (time.time() - self.last_call) / steps
+                    now = time.time()
 
-                self.last_call = time.time()
-                self.step += steps
-                self.eta = took * (self.steps - self.step)
+                    if not starting:
+                        took = (now - self.last_call) / steps
 
-                if self.step >= self.steps:
-                    self.stop()
+                        if self.time_per_step is None:
+                            self.time_per_step = took
+                        else:
+                            self.time_per_step += self.eta_smoothing * (took - self.time_per_step)
 
-                self.store()
-                self.lock.release()
+                    self.last_call = now
+                    self.step += steps
+                    if self.time_per_step is not None:
+                        self.eta = self.time_per_step * max(0, self.steps - self.step)
+                    self.dirty = True
+
+                    if self.step >= self.steps:
+                        self.stop()
+                    elif now - self.last_store >= self.store_interval:
+                        self.store()
 
-        self.progresses[id] = Controller(self.git, id, total_steps)
+        self.progresses[id] = Controller(self.git, id, total_steps, store_interval)
 
         return self.progresses[id]
 
+    @measure('progress')
     def progress(self, epoch, total):
         self.current_epoch = epoch
         self.total_epochs = total
@@ -1109,18 +1387,28 @@ class JobBackend:
                 self.early_stop()
                 return
 
-    def create_loss_channel(self, name, xaxis=None, yaxis=None, layout=None):
+    def create_loss_channel(self, name, xaxis=None, yaxis=None, layout=None, flush_interval=None):
         """
         :param name: string
+        :param flush_interval: None|float : buffer rows and write them at most every flush_interval seconds.
         :return: JobLossGraph
         """
 
-        return JobLossChannel(self, name, xaxis, yaxis, layout)
+        return JobLossChannel(self, name, xaxis, yaxis, layout, flush_interval)
+
+    def create_histogram_channel(self, name, bins=30, xaxis=None, yaxis=None, layout=None):
+        """
+        :param name: str
+        :param bins: int : number of buckets
+        :return: JobHistogramChannel
+        """
+
+        return JobHistogramChannel(self, name, bins, xaxis, yaxis, layout)
 
     def create_channel(self, name, traces=None,
                        main=False, kpi=False, kpiTrace=0, max_optimization=True,
                        type=JobChannel.NUMBER,
-                       xaxis=None, yaxis=None, layout=None):
+                       xaxis=None, yaxis=None, layout=None, flush_interval=None, binary=False, rollups=None):
         """
         :param name: str
         :param traces: None|list : per default create a trace based on "name".
@@ -1137,8 +1425,13 @@ class JobBackend:
         :param xaxis: dict
         :param yaxis: dict
         :param layout: dict
+        :param flush_interval: None|float : buffer rows and write them at most every flush_interval seconds.
+        :param binary: bool : store values in binary float64 columns instead of data.csv. Useful for
+                              high-frequency channels (e.g. per batch).
+        :param rollups: None|str : 'minmax' or 'lttb' to keep downsampled rollup levels next to the raw data.
         """
-        return JobChannel(self, name, traces, main, kpi, kpiTrace, max_optimization, type, xaxis, yaxis, layout)
+        return JobChannel(self, name, traces, main, kpi, kpiTrace, max_optimization, type, xaxis, yaxis, layout,
+                          flush_interval, binary, rollups)
 
     def start(self):
         if self.started:
@@ -1155,6 +1448,15 @@ class JobBackend:
 
         prepend_signal_handler(signal.SIGINT, self.on_sigint)
 
+        overhead_meter.start()
+        overhead_meter.on_over_budget(self.lower_telemetry_frequency)
+        if 'overheadBudget' in self.job['config'] and self.job['config']['overheadBudget']:
+            self.set_overhead_budget(self.job['config']['overheadBudget'])
+
+        if 'writeBehind' in self.job['config'] and self.job['config']['writeBehind']:
+            # seconds to collect set_info, job_add_status, commit_file, ... calls into one commit
+            self.git.enable_write_behind(float(self.job['config']['writeBehind']))
+
         self.started = True
         self.running = True
         self.ended = False
@@ -1186,14 +1488,16 @@ class JobBackend:
             self.start_monitoring()
 
             # log stdout to Git by using self.write_log -> git:stream_file
-            self.stream_log = self.git.stream_file('aetros/job/log.txt')
+            self.stream_log = self.git.stream_file('aetros/job/log.txt', index=True)
             if isinstance(sys.stdout, GeneralLogger):
                 sys.stdout.job_backend = self
+                sys.stdout.compact = bool(self.job['config'].get('compactLog'))
                 sys.stdout.flush()
 
             if isinstance(sys.stderr, GeneralLogger):
                 sys.stderr.job_backend = self
-                sys.stdout.flush()
+                sys.stderr.compact = bool(self.job['config'].get('compactLog'))
+                sys.stderr.flush()
         else:
             # if this process has been called within another process that is already using JobBackend.
             # we disable some stuff
@@ -1253,12 +1557,22 @@ class JobBackend:
     def create_keras_callback(self, model,
                               insights=False, insights_x=None,
                               additional_insights_layer=[],
-                              confusion_matrix=False, validation_data=None, validation_data_size=None):
+                              confusion_matrix=False, validation_data=None, validation_data_size=None,
+                              weight_histograms=False, insights_epochs=1, insights_seconds=None,
+                              insights_policy='drop', confusion_matrix_samples=None, confusion_matrix_seconds=None,
+                              batch_loss_points=None):
 
         """
 
         :type validation_data: int|None: (x, y) or generator
         :type validation_data_size: int|None: Defines the size of validation_data, if validation_data is a generator
+        :type weight_histograms: bool: Whether to log a histogram of each layer's weights every epoch.
+        :type insights_epochs: int: Build insights every n epochs.
+        :type insights_seconds: float|None: Build insights at most every n seconds.
+        :type insights_policy: str: 'drop' (default) or 'defer' new insights while earlier ones are still encoded.
+        :type confusion_matrix_samples: int|None: Use at most n samples of validation_data for the confusion matrix.
+        :type confusion_matrix_seconds: float|None: Stop predicting batches of a validation generator for the confusion matrix after n seconds.
+        :type batch_loss_points: int|None: Send the batch loss as n downsampled points per epoch to the 'batch loss' channel.
         """
 
         if insights and (insights_x is None or insights_x is False):
@@ -1267,11 +1581,22 @@ class JobBackend:
         if confusion_matrix and (validation_data is None or validation_data is False):
             raise Exception('Can not build Keras callback with active confusion_matrix but with invalid `validation_data` as input.')
 
+        if insights_policy not in WorkerPool.POLICIES:
+            raise Exception('Can not build Keras callback with insights_policy %s. Use %s.'
+                            % (str(insights_policy), ' or '.join(WorkerPool.POLICIES)))
+
         from aetros.KerasCallback import KerasCallback
         self.callback = KerasCallback(self, self.logger, force_insights=insights)
         self.callback.insights_x = insights_x
         self.callback.insight_layer = additional_insights_layer
         self.callback.confusion_matrix = confusion_matrix
+        self.callback.weight_histograms = weight_histograms
+        self.callback.insights_epoch_interval = insights_epochs
+        self.callback.insights_seconds_interval = insights_seconds
+        self.callback.insight_pool.set_policy(insights_policy)
+        self.callback.confusion_matrix_samples = confusion_matrix_samples
+        self.callback.confusion_matrix_seconds = confusion_matrix_seconds
+        self.callback.batch_loss_points = batch_loss_points
         self.callback.set_validation_data(validation_data, validation_data_size)
 
         return self.callback
@@ -1347,6 +1672,40 @@ class JobBackend:
         if isinstance(sys.stderr, GeneralLogger):
             sys.stderr.send_buffer()
 
+    def flush_channels(self):
+        """
+        Writes all buffered rows of channels created with flush_interval.
+        """
+        for channel in self.channels:
+            channel.flush()
+
+    def set_overhead_budget(self, percent):
+        """
+        Lowers the telemetry frequency automatically when the time spent in aetros code on the training thread
+        is more than `percent` of the step time (of the wall time when no training steps are reported).
+
+        :param percent: float|None
+        """
+        overhead_meter.set_budget(percent)
+
+    def lower_telemetry_frequency(self):
+        self.logger.warning("AETROS tracking overhead exceeded the budget of %s%%. Lowering telemetry frequency."
+                            % (str(overhead_meter.budget),))
+
+        for channel in self.channels:
+            channel.flush_interval = min(60, (channel.flush_interval or 0.5) * 2)
+
+        if self.monitoring_thread:
+            self.monitoring_thread.sample_interval = min(60, self.monitoring_thread.sample_interval * 2)
+            self.monitoring_thread.upload_interval = min(300, self.monitoring_thread.upload_interval * 2)
+
+    def flush_progresses(self):
+        """
+        Stores all progresses that got advanced since their last store.
+        """
+        for progress in six.itervalues(self.progresses):
+            progress.flush()
+
     def stop(self, progress=None, wait_for_client=False, force_exit=False):
         global last_exit_code
 
@@ -1365,6 +1724,13 @@ class JobBackend:
         self.logger.debug("stop: " + str(progress))
 
         self.send_std_buffer()
+        self.flush_channels()
+        self.flush_progresses()
+
+        if overhead_meter.step_total > 0:
+            # only the process that actually trained reports steps. Under `aetros start` the master process
+            # measured its log handling only, its report would overwrite the one of the training process.
+            self.set_system_info('overhead', overhead_meter.get_report(), True)
 
         self.stopped = True
         self.ended = True
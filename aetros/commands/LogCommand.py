@@ -0,0 +1,167 @@
+from __future__ import absolute_import
+from __future__ import print_function
+import argparse
+import json
+import mmap
+import subprocess
+
+import sys
+
+import os
+import time
+
+import six
+
+from aetros.utils import read_home_config
+from aetros.utils.log_index import LogIndex, get_tail_offset
+
+
+class LogCommand:
+    def __init__(self, logger):
+        self.logger = logger
+
+    def main(self, args):
+        import aetros.const
+
+        parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter, prog=aetros.const.__prog__ + ' log')
+        parser.add_argument('id', nargs='?', help="Job id like peter/mnist/ef8009d83a9892968097cec05b9467c685d45453")
+        parser.add_argument('-n', '--lines', type=int, default=20, help="Shows the last n lines. Default 20.")
+        parser.add_argument('-f', '--follow', action='store_true', help="Keeps printing new lines of a running job.")
+        parser.add_argument('--section', help="Shows the log of the given section only, e.g. --section TRAINING.")
+        parser.add_argument('--sections', action='store_true', help="Lists all sections.")
+
+        parsed_args = parser.parse_args(args)
+
+        if not parsed_args.id:
+            parser.print_help()
+            sys.exit(1)
+
+        config = read_home_config()
+        model = parsed_args.id[0:parsed_args.id.rindex('/')]
+        job_id = parsed_args.id[parsed_args.id.rindex('/')+1:]
+
+        git_dir = os.path.normpath(config['storage_dir'] + '/' + model + '.git')
+
+        if not os.path.isdir(git_dir):
+            self.logger.error("Git repository for model %s in %s not found." % (parsed_args.id, git_dir))
+            sys.exit(1)
+
+        # a running job writes its log here, see Git.stream_file
+        path = os.path.normpath(git_dir + '/temp/stream-blob/' + job_id + '/aetros/job/log.txt')
+        ref = 'refs/aetros/job/' + job_id
+        index = None
+        running = os.path.exists(path)
+
+        if not running:
+            path = os.path.normpath(git_dir + '/temp/log-cache/' + job_id + '/log.txt')
+
+            if not os.path.exists(path):
+                if not self.extract_blob(config, git_dir, ref + ':aetros/job/log.txt', path):
+                    self.logger.error("Job %s has no log." % (parsed_args.id,))
+                    sys.exit(1)
+
+            index = self.read_index(config, git_dir, ref + ':aetros/job/log.index.json')
+
+        with open(path, 'rb') as f:
+            if os.path.getsize(path) == 0:
+                buffer = six.b('')
+            else:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            if (parsed_args.sections or parsed_args.section) and (index is None or index.size != len(buffer)):
+                # running job or log without index, needs one full read
+                index = LogIndex()
+                index.feed(buffer[:])
+
+            if parsed_args.sections:
+                for line, offset, title in index.sections:
+                    print("%8d  %s" % (line + 1, title))
+                return
+
+            if parsed_args.section:
+                section = index.get_section_range(parsed_args.section)
+                if section is None:
+                    self.logger.error("Section %s not found." % (parsed_args.section,))
+                    sys.exit(1)
+
+                self.write(buffer[section[0]:section[1]])
+                return
+
+            self.write(buffer[get_tail_offset(buffer, parsed_args.lines):])
+            position = len(buffer)
+
+        # a finished job's log is read from the log cache, which does not change anymore.
+        # The live file of a running job is removed when the job ends, which stops following.
+        if parsed_args.follow and running:
+            last_status_check = time.time()
+            ended = False
+
+            try:
+                while os.path.exists(path):
+                    if os.path.getsize(path) > position:
+                        with open(path, 'rb') as f:
+                            f.seek(position)
+                            data = f.read()
+                            position += len(data)
+                            self.write(data)
+
+                    if ended:
+                        break
+
+                    if time.time() - last_status_check > 5:
+                        last_status_check = time.time()
+                        # read once more after the job reported its end
+                        ended = self.has_ended(config, git_dir, ref)
+                        continue
+
+                    time.sleep(0.5)
+            except KeyboardInterrupt:
+                pass
+
+    def write(self, data):
+        if hasattr(sys.stdout, 'buffer'):
+            sys.stdout.buffer.write(data)
+        else:
+            sys.stdout.write(data)
+        sys.stdout.flush()
+
+    def extract_blob(self, config, git_dir, object, path):
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        with open(path + '.tmp', 'wb') as f:
+            code = subprocess.call([config['git'], '--bare', '--git-dir', git_dir, 'cat-file', 'blob', object],
+                                   stdout=f, stderr=subprocess.PIPE)
+
+        if code != 0:
+            os.unlink(path + '.tmp')
+            return False
+
+        os.rename(path + '.tmp', path)
+        return True
+
+    def has_ended(self, config, git_dir, ref):
+        from aetros.const import JOB_STATUS
+
+        p = subprocess.Popen([config['git'], '--bare', '--git-dir', git_dir, 'cat-file', 'blob',
+                              ref + ':aetros/job/status/progress.json'],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = p.communicate()
+
+        if p.returncode != 0:
+            return False
+
+        try:
+            return int(json.loads(out.decode('utf-8'))) >= JOB_STATUS.PROGRESS_STATUS_DONE
+        except (ValueError, TypeError):
+            return False
+
+    def read_index(self, config, git_dir, object):
+        p = subprocess.Popen([config['git'], '--bare', '--git-dir', git_dir, 'cat-file', 'blob', object],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = p.communicate()
+
+        if p.returncode != 0:
+            return None
+
+        return LogIndex.from_dict(json.loads(out.decode('utf-8')))
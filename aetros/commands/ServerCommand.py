@@ -19,7 +19,7 @@ from requests.auth import HTTPBasicAuth
 
 import aetros.api
 from aetros.git import Git
-from aetros.logger import GeneralLogger
+from aetros.logger import GeneralLogger, get_multiplexer
 
 from aetros.backend import EventListener, BackendClient
 from aetros.utils import unpack_simple_job_id, read_home_config
@@ -376,9 +376,12 @@ class ServerCommand:
             process = subprocess.Popen(args, bufsize=1, env=my_env, stdin=DEVNULL,
                 stderr=subprocess.PIPE, stdout=subprocess.PIPE, **kwargs)
 
-            if self.show_stdout:
-                self.general_logger_stdout.attach(process.stdout, read_line=True)
-                self.general_logger_stderr.attach(process.stderr, read_line=True)
+            # all job pipes are read by one thread. Without --show-stdout the output is only drained,
+            # so the job does not block on a full pipe. All jobs share the same loggers, so only whole lines are sent.
+            get_multiplexer().attach(process.stdout, self.general_logger_stdout if self.show_stdout else None,
+                                     read_line=True)
+            get_multiplexer().attach(process.stderr, self.general_logger_stderr if self.show_stdout else None,
+                                     read_line=True)
 
             self.job_processes[full_id] = process
 
@@ -105,6 +105,52 @@ def get_memory(device):
         return None
 
 
+class NVMLMemory(ctypes.Structure):
+    # nvmlMemory_t of nvml.h
+    _fields_ = [
+        ("total", ctypes.c_ulonglong),
+        ("free", ctypes.c_ulonglong),
+        ("used", ctypes.c_ulonglong),
+    ]
+
+
+def get_nvml_handle(pci_bus_id):
+    """
+    :param pci_bus_id: str : e.g. 0000:01:00.0, see 'fullId' of get_ordered_devices()
+    :return: NVML device handle or None
+    """
+    try:
+        libnvml = get_libnvml()
+
+        handle = ctypes.c_void_p()
+        rc = libnvml.nvmlDeviceGetHandleByPciBusId_v2(ctypes.c_char_p(pci_bus_id.encode('utf-8')),
+                                                      ctypes.byref(handle))
+        if rc != 0:
+            return None
+
+        return handle
+    except Exception:
+        return None
+
+
+def get_nvml_memory(handle):
+    """
+    Unlike get_memory() this does not select the device, so it neither creates a CUDA context nor changes the
+    current device of the calling thread.
+
+    :return: (free, total) in bytes or None
+    """
+    try:
+        memory = NVMLMemory()
+        rc = get_libnvml().nvmlDeviceGetMemoryInfo(handle, ctypes.byref(memory))
+        if rc != 0:
+            return None
+
+        return memory.free, memory.total
+    except Exception:
+        return None
+
+
 def get_ordered_devices():
     """
     Default CUDA_DEVICE_ORDER is not compatible with nvidia-docker.
@@ -178,7 +224,107 @@ def get_version():
 
     return version.value
 
+class CudaDevices:
+    """
+    GPU query layer used by the MonitoringThread. The device list is read only once, since it does not change while
+    a job is running. Other implementations (e.g. a fake for tests) need the same two methods.
+    """
+
+    def __init__(self):
+        self.devices = None
+        self.handles = {}
+
+    def get_ordered_devices(self):
+        if self.devices is None:
+            try:
+                self.devices = get_ordered_devices()
+            except Exception:
+                self.devices = []
+
+        return self.devices
+
+    def get_memory(self, device):
+        """
+        Reads the memory through NVML with a handle cached per device. It does not call cudaSetDevice in the
+        job's process, which would create a CUDA context on devices the job does not use.
+
+        :return: (free, total) in bytes or None
+        """
+        if device not in self.handles:
+            self.handles[device] = None
+            for gpu in self.get_ordered_devices():
+                if gpu['device'] == device:
+                    self.handles[device] = get_nvml_handle(gpu['fullId'])
+
+        if self.handles[device] is None:
+            return None
+
+        return get_nvml_memory(self.handles[device])
+
+
+# libcudart is loaded only once per process. A failed load is remembered as well, so machines without CUDA
+# do not try to find the library again on each call.
+libcudart_handle = None
+libcudart_error = None
+
+
 def get_libcudart():
+    global libcudart_handle, libcudart_error
+
+    if libcudart_handle is not None:
+        return libcudart_handle
+
+    if libcudart_error is not None:
+        raise libcudart_error
+
+    try:
+        libcudart_handle = load_libcudart()
+    except Exception as e:
+        libcudart_error = e
+        raise
+
+    return libcudart_handle
+
+
+libnvml_handle = None
+libnvml_error = None
+
+
+def get_libnvml():
+    global libnvml_handle, libnvml_error
+
+    if libnvml_handle is not None:
+        return libnvml_handle
+
+    if libnvml_error is not None:
+        raise libnvml_error
+
+    try:
+        libnvml_handle = load_libnvml()
+    except Exception as e:
+        libnvml_error = e
+        raise
+
+    return libnvml_handle
+
+
+def load_libnvml():
+    system = platform.system()
+    if system == "Linux":
+        libnvml = ctypes.cdll.LoadLibrary("libnvidia-ml.so.1")
+    elif system == "Windows":
+        libnvml = ctypes.windll.LoadLibrary("nvml.dll")
+    else:
+        raise NotImplementedError("NVML is not available on this system.")
+
+    rc = libnvml.nvmlInit_v2()
+    if rc != 0:
+        raise ValueError("Could not initialize NVML")
+
+    return libnvml
+
+
+def load_libcudart():
     system = platform.system()
     if system == "Linux":
         libcudart = ctypes.cdll.LoadLibrary("libcudart.so")
@@ -1,15 +1,18 @@
 import json
 import os
+import shutil
 import subprocess
+import tempfile
 
 import six
-from threading import Thread, Lock
+from threading import Thread, Lock, RLock, Timer
 import time
 import sys
 from ruamel import yaml
 
 from aetros.api import ApiConnectionError
 from aetros.utils import invalid_json_values, setup_git_ssh
+from aetros.utils.log_index import LogIndex
 
 
 class GitCommandException(Exception):
@@ -45,6 +48,9 @@ class Git:
         self.git_path = os.path.normpath(self.storage_dir + '/' + model_name + '.git')
 
         self.command_lock = Lock()
+
+        # the index and the batch commit state are shared, so only one thread commits at a time
+        self.commit_lock = RLock()
         self.stream_files_lock = Lock()
         self.debug = False
         self.last_push_time = 0
@@ -60,13 +66,31 @@ class Git:
         self.thread_push_instance = None
 
         self.git_batch_commit = False
+        self.git_batch_commit_depth = 0
 
         self.git_batch_commit_messages = []
+
+        # index entries added during a batch commit, written with one update-index call
+        self.git_batch_index = []
+
+        # (path, local file) of files added during a batch commit, their blobs are written with one hash-object call
+        self.git_batch_files = []
+
+        # temp folder holding the content of files added during a batch commit
+        self.git_batch_blob_path = None
+
+        # write-behind: when set, commit_file calls outside of a batch commit are collected for this many seconds
+        # (or until write_behind_max_files) and committed together, see enable_write_behind()
+        self.write_behind = None
+        self.write_behind_max_files = 50
+        self.write_behind_pending = []
+        self.write_behind_timer = None
         self.git_last_commit = None
 
         self.keep_stream_files = False
 
         self.streamed_files = {}
+        self.stream_indexes = {}
         self.store_files = {}
 
         self.prepare_index_file()
@@ -421,9 +445,13 @@ class Git:
         if self.thread_push_instance and self.thread_push_instance.isAlive():
             self.thread_push_instance.join()
 
+        self.flush()
+        self.write_behind = None
+
+        stream_end_files = []
+
         with self.batch_commit('STREAM_END'):
             for path, handle in six.iteritems(self.streamed_files.copy()):
-                # open again and read full content
                 full_path = os.path.normpath(self.temp_path + '/stream-blob/' + self.job_id + '/' + path)
                 self.logger.debug('Git stream end for file: ' + full_path)
 
@@ -438,11 +466,18 @@ class Git:
                 finally:
                     self.stream_files_lock.release()
 
-                with open(full_path, 'r') as f:
-                    self.commit_file(path, path, f.read())
+                # hashed by its path when the batch ends, so the content is not read into memory
+                self.add_local_file_as(path, full_path)
+                self.git_batch_commit_messages.append(path)
+                stream_end_files.append(full_path)
 
-                if not self.keep_stream_files:
-                    os.unlink(full_path)
+                if path in self.stream_indexes:
+                    index = self.stream_indexes.pop(path)
+                    self.commit_json_file(path, os.path.splitext(path)[0] + '.index', index.to_dict())
+
+        if not self.keep_stream_files:
+            for full_path in stream_end_files:
+                os.unlink(full_path)
 
         with self.batch_commit('STORE_END'):
             for path, bar in six.iteritems(self.store_files.copy()):
@@ -485,6 +520,8 @@ class Git:
 
         Withing the `with` block you can use group the method calls of `commit_file` and `commit_json_file`, and every other
         method calling this two methods.
+
+        Batch commits can be nested, the outermost one creates the commit.
         
         :type message: str 
         :return: with controller to be used with Python's `with git.batch_commit():`
@@ -495,23 +532,47 @@ class Git:
                 self.message = message
 
             def __enter__(self):
+                self.git.commit_lock.acquire()
+                self.git.git_batch_commit_depth += 1
+
+                if self.git.git_batch_commit_depth > 1:
+                    # nested batch, everything is committed with the outermost one
+                    return
+
                 self.git.git_batch_commit = True
                 if self.git.job_id:
                     # make sure we're always on the tip tree
-                    self.git.read_tree(self.git.ref_head)
+                    try:
+                        self.git.read_tree(self.git.ref_head)
+                    except Exception:
+                        self.git.git_batch_commit = False
+                        self.git.git_batch_commit_depth -= 1
+                        self.git.commit_lock.release()
+                        raise
+
+                # files waiting for the write-behind commit go first, so newer content in this batch wins
+                self.git.add_write_behind_files()
 
             def __exit__(self, type, value, traceback):
-                self.git.git_batch_commit = False
+                try:
+                    self.git.git_batch_commit_depth -= 1
+                    if self.git.git_batch_commit_depth > 0:
+                        return
+
+                    self.git.git_batch_commit = False
+                    self.git.flush_index()
 
-                # if nothing committed, we return early
-                if not self.git.git_batch_commit_messages: return
+                    # if nothing committed, we return early
+                    if not self.git.git_batch_commit_messages: return
 
-                commit_message = self.message
-                if self.git.git_batch_commit_messages:
-                    commit_message = commit_message + "\n\n" + "\n".join(self.git.git_batch_commit_messages)
-                self.git.git_batch_commit_messages = []
+                    commit_message = self.message
+                    if self.git.git_batch_commit_messages:
+                        commit_message = commit_message + "\n\n" + "\n".join(self.git.git_batch_commit_messages)
+                    self.git.git_batch_commit_messages = []
 
-                self.git.commit_index(commit_message)
+                    self.git.commit_index(commit_message)
+                finally:
+                    self.git.commit_lock.release()
 
         return controlled_execution(self, message)
 
@@ -555,10 +616,15 @@ class Git:
         finally:
             self.stream_files_lock.release()
 
-    def stream_file(self, path):
+    def stream_file(self, path, binary=False, index=False):
         """
         Create a temp file, stream it to the server if online and append its content using the write() method. 
         This makes sure that we have all newest data of this file on the server directly.
+
+        With binary=True the stream accepts bytes instead of str, e.g. for raw numpy column data.
+
+        With index=True a LogIndex of line offsets and section markers is kept while writing and committed
+        as <path without extension>.index.json next to the file, e.g. aetros/job/log.index.json.
         
         At the end of the job, the content the server received is stored as git blob on the server. It is then committed 
         locally and pushed. Git detects that the server already has the version (through the continuous streaming)
@@ -572,6 +638,7 @@ class Git:
         self.log_stream.write("another line\n");
         
         :param path: 
+        :param binary: bool
         :rtype: Stream class
         :return Returns a instance with a `write(data)` method.
         """
@@ -596,9 +663,12 @@ class Git:
         if not os.path.exists(os.path.dirname(full_path)):
             os.makedirs(os.path.dirname(full_path))
 
-        handle = open(full_path, 'w+')
+        handle = open(full_path, 'wb+' if binary else 'w+')
         self.streamed_files[path] = handle
 
+        if index:
+            self.stream_indexes[path] = LogIndex()
+
         class Stream():
             def __init__(self, git):
                 self.git = git
@@ -613,6 +683,10 @@ class Git:
                     if not handle.closed:
                         handle.write(data)
                         handle.flush()
+
+                        if path in self.git.stream_indexes:
+                            self.git.stream_indexes[path].feed(
+                                data.encode('utf-8') if isinstance(data, six.text_type) else data)
                 finally:
                     self.git.stream_files_lock.release()
 
@@ -625,14 +699,65 @@ class Git:
     def write_blob(self, content):
         return self.command_exec(['hash-object', '-w', "--stdin"], content)[0].decode('utf-8').strip()
 
+    def write_blobs(self, local_paths):
+        """
+        Writes the content of several local files as blobs with one git process.
+
+        :param local_paths: list of str
+        :return: list of blob ids, in the order of local_paths
+        """
+        if not local_paths:
+            return []
+
+        out = self.command_exec(['hash-object', '-w', '--no-filters', '--stdin-paths'], "\n".join(local_paths) + "\n")[0]
+
+        return out.decode('utf-8').split()
+
     def add_index(self, mode, blob_id, path):
         """
-        Add new entry to the current index
+        Add new entry to the current index. Within a batch commit the entry is added with flush_index().
         :param tree: 
         :return: 
         """
+        if self.git_batch_commit:
+            self.git_batch_index.append(mode + ' ' + blob_id + '\t' + path + '\n')
+            return
+
         self.command_exec(['update-index', '--add', '--cacheinfo', mode, blob_id, path])
 
+    def flush_index(self):
+        """
+        Writes the blobs of all files and all index entries collected in a batch commit to the index.
+        """
+        if self.git_batch_files:
+            files = self.git_batch_files
+            self.git_batch_files = []
+
+            # only the latest content of a path needs a blob
+            paths = []
+            local_paths = {}
+            for path, local_path in files:
+                if path not in local_paths:
+                    paths.append(path)
+                local_paths[path] = local_path
+
+            try:
+                blob_ids = self.write_blobs([local_paths[path] for path in paths])
+            finally:
+                if self.git_batch_blob_path:
+                    shutil.rmtree(self.git_batch_blob_path)
+                    self.git_batch_blob_path = None
+
+            for path, blob_id in zip(paths, blob_ids):
+                self.git_batch_index.append('100644 ' + blob_id + '\t' + path + '\n')
+
+        if not self.git_batch_index:
+            return
+
+        entries = ''.join(self.git_batch_index)
+        self.git_batch_index = []
+        self.command_exec(['update-index', '--index-info'], entries)
+
     def write_tree(self):
         """
         Writes the current index into a new tree
@@ -646,13 +771,41 @@ class Git:
     def add_file(self, path, content):
         """
         Add a new file as blob in the storage and add its tree entry into the index.
+        Within a batch commit the content is written to a temp file and its blob is written with flush_index().
         
         :param path: str
         :param content: str
         """
+        if self.git_batch_commit:
+            if not self.git_batch_blob_path:
+                self.git_batch_blob_path = tempfile.mkdtemp(prefix='blobs-', dir=self.temp_path)
+
+            local_path = os.path.join(self.git_batch_blob_path, str(len(self.git_batch_files)))
+            with open(local_path, 'wb') as f:
+                f.write(six.b(content) if isinstance(content, six.string_types) else content)
+
+            self.git_batch_files.append((path, local_path))
+            return
+
         blob_id = self.write_blob(content)
         self.add_index('100644', blob_id, path)
 
+    def add_local_file_as(self, path, local_path):
+        """
+        Add the content of the local file `local_path` as blob under `path` and add its tree entry into the index,
+        without reading the file into memory. Within a batch commit the blob is written with flush_index(), so
+        the file has to exist until the batch ends.
+
+        :param path: str
+        :param local_path: str
+        """
+        if self.git_batch_commit:
+            self.git_batch_files.append((path, local_path))
+            return
+
+        blob_id = self.write_blobs([local_path])[0]
+        self.add_index('100644', blob_id, path)
+
     def add_local_file(self, path):
         with open(path, 'r') as f:
             self.add_file(path, f.read())
@@ -666,21 +819,81 @@ class Git:
         :param content: str
         :return: 
         """
-        if not self.git_batch_commit:
-            if self.job_id:
-                self.read_tree(self.ref_head)
+        with self.commit_lock:
+            if not self.git_batch_commit and self.write_behind:
+                self.write_behind_pending.append((message, path, content))
 
-            self.add_file(path, content)
+                if len(self.write_behind_pending) >= self.write_behind_max_files:
+                    self.flush()
+                elif self.write_behind_timer is None:
+                    self.write_behind_timer = Timer(self.write_behind, self.flush)
+                    self.write_behind_timer.daemon = True
+                    self.write_behind_timer.start()
+
+                return None
+
+            if not self.git_batch_commit:
+                if self.job_id:
+                    self.read_tree(self.ref_head)
+
+                self.add_file(path, content)
+
+                return self.commit_index(message)
+            else:
+                self.add_file(path, content)
+                self.git_batch_commit_messages.append(message)
+
+    def enable_write_behind(self, window=0.5, max_files=50):
+        """
+        Collects commit_file calls outside of a batch commit for `window` seconds or until `max_files` files
+        and commits them as one commit. Use flush() to commit them earlier. stop() and push() flush as well.
+
+        commit_file returns None instead of the commit sha in this mode.
+
+        :param window: float : seconds
+        :param max_files: int
+        """
+        self.write_behind = window
+        self.write_behind_max_files = max_files
+
+    def add_write_behind_files(self):
+        """
+        Adds the pending write-behind files to the current batch commit.
+        """
+        pending = self.write_behind_pending
+        self.write_behind_pending = []
+
+        if self.write_behind_timer is not None:
+            self.write_behind_timer.cancel()
+            self.write_behind_timer = None
+
+        # only the latest content of a path needs a blob
+        latest = dict((path, i) for i, (message, path, content) in enumerate(pending))
+
+        for i, (message, path, content) in enumerate(pending):
+            if latest[path] == i:
+                self.add_file(path, content)
 
-            return self.commit_index(message)
-        else:
-            self.add_file(path, content)
             self.git_batch_commit_messages.append(message)
 
+    def flush(self):
+        """
+        Commits all files collected by the write-behind mode.
+        """
+        with self.commit_lock:
+            if not self.write_behind_pending:
+                return
+
+            with self.batch_commit('WRITE_BEHIND'):
+                # batch_commit picks up the pending files
+                pass
+
     def push(self):
         """
         Push all changes to origin
         """
+        self.flush()
+
         try:
             self.command_exec(['push', 'origin', '-f', self.ref_head])
             return True
@@ -710,6 +923,8 @@ class Git:
         return self.git_last_commit
 
     def has_file(self, path):
+        self.flush()
+
         try:
             out, code, err = self.command_exec(['cat-file', '-p', self.ref_head+':'+path])
 
@@ -721,6 +936,8 @@ class Git:
         """
         Reads the given path of current ref_head and returns its content as utf-8
         """
+        self.flush()
+
         try:
             out, code, err = self.command_exec(['cat-file', '-p', self.ref_head+':'+path])
             if not code:
@@ -90,7 +90,24 @@ def job_start(job_backend, trainer, keras_callback):
     model.summary()
 
     trainer.callbacks.append(keras_callback)
-    model_provider.train(trainer, model, data_train, data_validation)
+
+    try:
+        model_provider.train(trainer, model, data_train, data_validation)
+    finally:
+        close_datasets(datasets)
+
+
+def close_datasets(datasets):
+    """
+    Stops the workers of datasets that prefetch batches in the background, e.g. BatchPrefetcher.
+    """
+    for dataset in six.itervalues(datasets):
+        if not isinstance(dataset, dict):
+            continue
+
+        for data in six.itervalues(dataset):
+            if hasattr(data, 'close'):
+                data.close()
 
 
 def job_prepare(job_backend):
@@ -1,47 +1,153 @@
 from __future__ import absolute_import
 
+import codecs
+import os
+import re
 import sys
+import time
 import six
-from threading import Timer, Thread, Lock
+from threading import Thread, Lock, Event
+
+from aetros.utils.overhead import measure
+
+try:
+    import selectors
+except ImportError:
+    # Python 2, StreamMultiplexer falls back to one thread per stream
+    selectors = None
+
+# runs of backspaces, e.g. written by Keras progress bars to rewrite the current line
+BACKSPACES = re.compile('(\b+)')
+
+
+def read_chunk(stream, size=4096):
+    """
+    Reads at most `size` bytes. Blocks only until at least one byte is available, so progress output
+    that is not terminated by a newline is returned immediately.
+    """
+    try:
+        fileno = stream.fileno()
+    except Exception:
+        return stream.read(1)
+
+    return os.read(fileno, size)
 
 
 def drain_stream(stream, decode='utf-8'):
-    content = six.b('')
+    chunks = []
 
     while True:
         try:
-            # read() needs to block
-            # buf = os.read(buffer.fileno(), 4096)
-            buf = stream.read(1)
+            buf = read_chunk(stream)
             if buf == six.b(''):
                 break
-            content += buf
+            chunks.append(buf)
         except Exception:
             break
 
+    content = six.b('').join(chunks)
+
     if decode:
         return content.decode(decode)
 
     return content
 
 
+def compact_carriage_returns(content, continues_line=False):
+    """
+    Collapses carriage-return overwrites like a terminal would, so each line only contains its final state.
+
+    If content ends in an unterminated line that ended with \r, the \r is kept. If continues_line is True, the
+    first line continues a line of an earlier content, so its text before the first \r is kept as well.
+
+    :param content: str
+    :param continues_line: bool
+    :return: str
+    """
+    if '\r' not in content:
+        return content
+
+    lines = content.split('\n')
+
+    for i, line in enumerate(lines):
+        if '\r' not in line:
+            continue
+
+        segments = line.split('\r')
+        prefix = ''
+        if i == 0 and continues_line:
+            prefix = segments.pop(0) + '\r'
+
+        result = ''
+        for segment in segments:
+            result = segment + result[len(segment):]
+
+        if i == len(lines) - 1 and line.endswith('\r'):
+            result += '\r'
+
+        lines[i] = prefix + result
+
+    return '\n'.join(lines)
+
+
+class TailBuffer(object):
+    """
+    Keeps the last `limit` characters (or bytes) of a stream of chunks. Appending is O(len(chunk)),
+    old chunks are dropped once the buffer holds twice the limit.
+    """
+
+    def __init__(self, limit=20 * 1024, empty=''):
+        self.limit = limit
+        self.empty = empty
+        self.chunks = []
+        self.size = 0
+
+    def append(self, chunk):
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+
+        if self.size > 2 * self.limit:
+            value = self.getvalue()
+            self.chunks = [value]
+            self.size = len(value)
+
+    def getvalue(self):
+        return self.empty.join(self.chunks)[-self.limit:]
+
+
 class GeneralLogger(object):
-    def __init__(self, redirect_to, job_backend=None):
+    # seconds between a write and sending the buffer to the job backend
+    flush_interval = 1.0
+
+    def __init__(self, redirect_to, job_backend=None, compact=False):
+        """
+        :param compact: bool : collapse carriage-return overwrites (e.g. progress bars) within one flush window
+                               before the log is sent to the job backend. The console gets the raw output.
+        """
         self.job_backend = job_backend
-        self.buffer = ''
-        self.last_timer = None
-        self.last_messages = ''
+        self.compact = compact
+        self.line_open = False
+        self.buffer = []
+        self.tail = TailBuffer()
         self.logger = redirect_to or sys.__stdout__
         self.lock = Lock()
         self.attach_last_messages = {}
         self.buffer_disabled = False
 
+        self.flusher = None
+        self.flush_pending = Event()
+
+    @property
+    def last_messages(self):
+        return self.tail.getvalue()
+
     def disable_buffer(self):
         self.buffer_disabled = True
-        self.buffer = ''
+        self.clear_buffer()
 
     def clear_buffer(self):
-        self.buffer = ''
+        with self.lock:
+            self.buffer = []
 
     def fileno(self):
         return self.logger.fileno()
@@ -54,12 +160,41 @@ class GeneralLogger(object):
         self.send_buffer()
 
     def send_buffer(self):
-        self.last_timer = None
+        if not self.job_backend:
+            return
+
+        with self.lock:
+            if not self.buffer:
+                return
+
+            content = ''.join(self.buffer)
+            self.buffer = []
 
-        if self.buffer:
-            if self.job_backend:
-                if self.job_backend.write_log(self.buffer):
-                    self.buffer = ''
+            if self.compact:
+                raw = content
+                content = compact_carriage_returns(content, self.line_open)
+                self.line_open = not raw.endswith('\n')
+
+        # not under the lock, write_log may log itself
+        if not self.job_backend.write_log(content):
+            with self.lock:
+                self.buffer.insert(0, content)
+
+    def start_flusher(self):
+        def flusher():
+            while True:
+                self.flush_pending.wait()
+                time.sleep(self.flush_interval)
+                self.flush_pending.clear()
+
+                try:
+                    self.send_buffer()
+                except Exception as e:
+                    sys.__stderr__.write(str(e))
+
+        self.flusher = Thread(target=flusher)
+        self.flusher.daemon = True
+        self.flusher.start()
 
     def attach(self, buffer, read_line=False):
         """
@@ -69,7 +204,10 @@ class GeneralLogger(object):
         """
 
         bid = id(buffer)
-        self.attach_last_messages[bid] = six.b('')
+        self.attach_last_messages[bid] = TailBuffer(empty=six.b(''))
+
+        # a chunk can end in the middle of a multi-byte character
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
 
         lock = Lock()
 
@@ -78,23 +216,20 @@ class GeneralLogger(object):
             while True:
 
                 try:
-                    # read() needs to block
-                    # buf = os.read(buffer.fileno(), 4096)
                     if read_line:
                         buf = buffer.readline()
                     else:
-                        buf = buffer.read(1)
+                        buf = read_chunk(buffer)
                     if buf == six.b(''):
                         break
 
-                    self.attach_last_messages[bid] += buf
+                    self.attach_last_messages[bid].append(buf)
 
-                    if len(self.attach_last_messages[bid]) > 21 * 1024:
-                        self.attach_last_messages[bid] = self.attach_last_messages[bid][-20 * 1024:]
-
-                    self.write(buf)
+                    message = decoder.decode(buf)
+                    if message:
+                        self.write(message)
                 except ValueError as e:
-                    if 'operation on closed' in e.message:
+                    if 'operation on closed' in str(e):
                         break
 
                 except Exception as e:
@@ -116,6 +251,17 @@ class GeneralLogger(object):
 
         return wait
 
+    def remove_from_buffer(self, count):
+        while count and self.buffer:
+            last = self.buffer[-1]
+            if len(last) <= count:
+                count -= len(last)
+                self.buffer.pop()
+            else:
+                self.buffer[-1] = last[:-count]
+                count = 0
+
+    @measure('logger')
     def write(self, message):
         try:
             self.lock.acquire()
@@ -128,21 +274,158 @@ class GeneralLogger(object):
             self.logger.write(message)
             self.logger.flush()
 
-            self.last_messages += message
-            if len(self.last_messages) > 20 * 1024:
-                self.last_messages = self.last_messages[-20 * 1024:]
+            self.tail.append(message)
 
             if not self.buffer_disabled:
-                for char in message:
-                    if '\b' == char and self.buffer:
-                        self.buffer = self.buffer[:-1]
-                    else:
-                        self.buffer += char
-
-                if not self.last_timer:
-                    self.last_timer = Timer(1.0, self.send_buffer)
-                    self.last_timer.start()
+                if '\b' in message:
+                    # split gives alternately text and runs of backspaces
+                    for i, part in enumerate(BACKSPACES.split(message)):
+                        if i % 2:
+                            self.remove_from_buffer(len(part))
+                        elif part:
+                            self.buffer.append(part)
+                else:
+                    self.buffer.append(message)
+
+                if self.flusher is None:
+                    self.start_flusher()
+
+                self.flush_pending.set()
         except Exception as e:
             sys.__stderr__.write(str(e))
         finally:
             self.lock.release()
+
+
+class StreamMultiplexer(object):
+    """
+    Reads any number of pipes (e.g. stdout and stderr of job processes) in one thread with a selector and sends
+    what it read to the GeneralLogger of each pipe. Pipes are read in chunks as soon as data is available.
+
+    On systems without selectable pipes (Windows, Python 2) each stream gets its own reader thread as with
+    GeneralLogger.attach().
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self):
+        self.supported = selectors is not None and os.name != 'nt'
+        self.lock = Lock()
+        self.pending = []
+        self.thread = None
+
+        if self.supported:
+            self.selector = selectors.DefaultSelector()
+
+            # a write to this pipe wakes up select() when new streams are attached
+            self.wakeup_read, self.wakeup_write = os.pipe()
+            self.selector.register(self.wakeup_read, selectors.EVENT_READ, None)
+
+    def attach(self, stream, logger=None, read_line=False):
+        """
+        Reads stream until its end. Without logger the content is discarded, which makes sure the writing
+        process never blocks on a full pipe.
+
+        :param stream: a pipe, e.g. Popen.stdout
+        :param logger: GeneralLogger|None
+        :param read_line: bool : send only whole lines to the logger, the rest is kept until the next newline or
+                                 the end of the stream. Use it when several streams share one logger, so their output
+                                 does not interleave in the middle of a line.
+        :return: function that blocks until the stream is closed and its content sent
+        """
+        if not self.supported:
+            if logger:
+                return logger.attach(stream, read_line=read_line)
+
+            thread = Thread(target=drain_stream, args=[stream, None])
+            thread.daemon = True
+            thread.start()
+
+            return thread.join
+
+        done = Event()
+        state = {
+            'logger': logger,
+            'done': done,
+            # a chunk can end in the middle of a multi-byte character
+            'decoder': codecs.getincrementaldecoder('utf-8')(errors='replace'),
+            'read_line': read_line,
+            'line': '',
+        }
+
+        with self.lock:
+            self.pending.append((stream.fileno(), state))
+
+            if self.thread is None:
+                self.thread = Thread(target=self.run)
+                self.thread.daemon = True
+                self.thread.start()
+
+        os.write(self.wakeup_write, six.b('x'))
+
+        def wait():
+            done.wait()
+            if logger:
+                logger.send_buffer()
+
+        return wait
+
+    def run(self):
+        while True:
+            for key, events in self.selector.select():
+                if key.data is None:
+                    os.read(self.wakeup_read, 4096)
+
+                    with self.lock:
+                        pending, self.pending = self.pending, []
+
+                    for fd, state in pending:
+                        self.selector.register(fd, selectors.EVENT_READ, state)
+
+                    continue
+
+                self.read(key)
+
+    def read(self, key):
+        state = key.data
+
+        try:
+            buf = os.read(key.fd, self.chunk_size)
+        except OSError:
+            buf = six.b('')
+
+        if buf == six.b(''):
+            self.selector.unregister(key.fd)
+            message = state['line'] + state['decoder'].decode(six.b(''), True)
+            if message and state['logger']:
+                state['logger'].write(message)
+
+            state['done'].set()
+            return
+
+        message = state['decoder'].decode(buf)
+        if state['read_line']:
+            message = state['line'] + message
+            end = message.rfind('\n') + 1
+            message, state['line'] = message[:end], message[end:]
+
+        if message and state['logger']:
+            try:
+                state['logger'].write(message)
+            except Exception as e:
+                sys.__stderr__.write(str(type(e)) + ': ' + str(e))
+
+
+multiplexer = None
+
+
+def get_multiplexer():
+    """
+    :return: StreamMultiplexer shared by the whole process
+    """
+    global multiplexer
+
+    if multiplexer is None:
+        multiplexer = StreamMultiplexer()
+
+    return multiplexer
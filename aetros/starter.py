@@ -8,9 +8,10 @@ import subprocess
 import sys
 import six
 
-from aetros.logger import GeneralLogger
+from aetros.logger import GeneralLogger, get_multiplexer
 from aetros.utils import unpack_full_job_id, read_home_config, flatten_parameters, get_ssh_key_for_host
 from aetros.const import JOB_STATUS
+from aetros.utils.process import ProcessTreeAccounting
 from .backend import JobBackend
 from .Trainer import Trainer
 
@@ -260,8 +261,23 @@ def start_command(logger, job_backend, env=None, volumes=None, gpu_devices=None)
         p = subprocess.Popen(args=command,
             bufsize=1, stderr=subprocess.PIPE, stdout=subprocess.PIPE,
             env=command_env, **kwargs)
-        wait_stdout = sys.stdout.attach(p.stdout)
-        wait_stderr = sys.stderr.attach(p.stderr)
+        wait_stdout = get_multiplexer().attach(p.stdout, sys.stdout)
+        wait_stderr = get_multiplexer().attach(p.stderr, sys.stderr)
+
+        if os.path.isdir('/proc'):
+            if docker_command:
+                def container_pid():
+                    try:
+                        return int(execute_command_stdout([home_config['docker'], 'inspect', '--format',
+                                                           '{{.State.Pid}}', job_backend.job_id]).strip())
+                    except Exception:
+                        return None
+
+                accounting = ProcessTreeAccounting(container_pid=container_pid)
+            else:
+                accounting = ProcessTreeAccounting(pgid=p.pid)
+
+            job_backend.monitoring_thread.watch_process_tree(accounting)
 
         p.wait()
         wait_stdout()
@@ -328,8 +344,8 @@ def execute_command_stdout(command, input=None):
 
 def execute_command(**kwargs):
     p = subprocess.Popen(**kwargs)
-    wait_stdout = sys.stdout.attach(p.stdout)
-    wait_stderr = sys.stderr.attach(p.stderr)
+    wait_stdout = get_multiplexer().attach(p.stdout, sys.stdout)
+    wait_stderr = get_multiplexer().attach(p.stderr, sys.stderr)
 
     p.wait()
     wait_stdout()
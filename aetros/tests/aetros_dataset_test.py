@@ -1,6 +1,13 @@
+import os
+import shutil
+import tempfile
 import unittest
 
+import numpy as np
+
 from aetros.Trainer import is_generator
+from aetros.auto_dataset import InMemoryDataGenerator, ImageStore, ImageCache, decode_images_in_processes, \
+    BatchPrefetcher
 
 class TestIterator():
 
@@ -24,4 +31,219 @@ class TestAetrosDataset(unittest.TestCase):
         def generator():
             yield ([1, 2], [1, 2])
 
-        self.assertTrue(is_generator(generator))
\ No newline at end of file
+        self.assertTrue(is_generator(generator))
+
+
+class TestInMemoryDataGenerator(unittest.TestCase):
+
+    def get_images(self):
+        # the image value is its class, so batches can be checked against the labels
+        return [[np.full((2, 2, 1), i % 3, dtype='float32'), i % 3] for i in range(10)]
+
+    def test_epoch(self):
+        generator = InMemoryDataGenerator(None, self.get_images(), 3, 4)
+
+        seen = []
+        for i in range(5):
+            x, y = next(generator)
+            self.assertEqual(x.shape, (4, 2, 2, 1))
+            self.assertEqual(y.shape, (4, 3))
+            self.assertEqual(x[:, 0, 0, 0].tolist(), y.argmax(axis=-1).tolist())
+            seen += x[:, 0, 0, 0].tolist()
+
+        # every image once per pass
+        self.assertEqual(sorted(seen[:10]), sorted([i % 3 for i in range(10)]))
+        self.assertEqual(sorted(seen[10:20]), sorted([i % 3 for i in range(10)]))
+
+    def test_reuse_buffers(self):
+        generator = InMemoryDataGenerator(None, self.get_images(), 3, 4, reuse_buffers=True)
+
+        x1, y1 = next(generator)
+        x2, y2 = next(generator)
+        self.assertIs(x1, x2)
+        self.assertIs(y1, y2)
+        self.assertEqual(x2[:, 0, 0, 0].tolist(), y2.argmax(axis=-1).tolist())
+
+    def test_augmentation(self):
+        class DataGenerator:
+            def random_transform(self, image):
+                return image + 10
+
+            def standardize(self, image):
+                return image
+
+        generator = InMemoryDataGenerator(DataGenerator(), self.get_images(), 3, 4)
+        x, y = next(generator)
+        self.assertEqual((x[:, 0, 0, 0] - 10).tolist(), y.argmax(axis=-1).tolist())
+
+    def test_image_store(self):
+        store = ImageStore(10, (2, 2, 1))
+        for i in range(8):
+            store.add(np.full((2, 2, 1), i, dtype='uint8'), i % 3, i % 4 == 0)
+
+        self.assertEqual(store.x.shape, (8, 2, 2, 1))
+        self.assertEqual(store.x.dtype, np.uint8)
+        self.assertEqual(store.get_indices(True).tolist(), [0, 4])
+
+        footprint = store.get_footprint()
+        self.assertEqual(footprint['images'], 8 * 4)
+        self.assertEqual(footprint['labels'], 8 * 4 + 8)
+        self.assertEqual(footprint['float32'], 8 * 4 * 4)
+
+        training = store.get_indices(False)
+        generator = InMemoryDataGenerator(None, store, 3, 6, indices=training, convert=lambda x: x / 255.)
+
+        x, y = next(generator)
+        self.assertEqual(x.dtype, np.float64)
+        values = np.round(x[:, 0, 0, 0] * 255).astype('int64')
+        self.assertEqual(sorted(values.tolist()), [1, 2, 3, 5, 6, 7])
+        self.assertEqual((values % 3).tolist(), y.argmax(axis=-1).tolist())
+
+    def test_image_store_remove(self):
+        store = ImageStore(10, (2, 2, 1))
+        for i in range(10):
+            store.add(np.full((2, 2, 1), i, dtype='uint8'), i % 3, i % 2 == 0, str(i))
+
+        store.remove([7, 2, 3])
+
+        self.assertEqual(store.size, 7)
+        self.assertEqual(store.x[:, 0, 0, 0].tolist(), [0, 1, 4, 5, 6, 8, 9])
+        self.assertEqual(store.classes.tolist(), [0, 1, 1, 2, 0, 2, 0])
+        self.assertEqual(store.get_indices(True).tolist(), [0, 2, 4, 5])
+        self.assertEqual(store.keys[:store.size], ['0', '1', '4', '5', '6', '8', '9'])
+
+
+class TestImageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp('aetros-image-cache-test')
+        self.node = {'width': 2, 'height': 2, 'inputType': 'image', 'imageScale': 255}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        store = ImageStore(3, (2, 2, 1))
+        stats = {}
+        for i in range(3):
+            store.add(np.full((2, 2, 1), i, dtype='uint8'), 0, False, 'image%d.jpg' % i)
+            stats['image%d.jpg' % i] = [100 + i, 1500000000.5]
+
+        ImageCache(self.dir, '/data', self.node).save(store, stats)
+
+        cache = ImageCache(self.dir, '/data', self.node)
+        self.assertTrue(cache.load())
+        self.assertIsInstance(cache.images, np.memmap)
+        self.assertEqual(cache.listing, ImageCache.get_listing_hash(stats))
+
+        self.assertEqual(cache.get('image2.jpg', [102, 1500000000.5])[0, 0, 0], 2)
+        # changed file
+        self.assertIsNone(cache.get('image2.jpg', [103, 1500000000.5]))
+        self.assertIsNone(cache.get('image3.jpg', [100, 1500000000.5]))
+
+        # other input node, other cache
+        self.node['width'] = 4
+        self.assertFalse(ImageCache(self.dir, '/data', self.node).load())
+
+    def test_save_replaces_images(self):
+        stats = {'image.jpg': [100, 1500000000.5]}
+
+        for value in [1, 2]:
+            store = ImageStore(1, (2, 2, 1))
+            store.add(np.full((2, 2, 1), value, dtype='uint8'), 0, False, 'image.jpg')
+            cache = ImageCache(self.dir, '/data', self.node)
+            cache.load()
+            cache.save(store, stats)
+
+        cache = ImageCache(self.dir, '/data', self.node)
+        self.assertTrue(cache.load())
+        self.assertEqual(cache.get('image.jpg', [100, 1500000000.5])[0, 0, 0], 2)
+
+        # only the published images file and the manifest are left
+        self.assertEqual(len(os.listdir(cache.dir)), 2)
+
+
+class TestDecodeImagesInProcesses(unittest.TestCase):
+
+    def test_decode(self):
+        from PIL import Image
+        from aetros.JobModel import JobModel
+
+        dir = tempfile.mkdtemp('aetros-decode-test')
+        try:
+            messages = []
+            for i in range(20):
+                path = dir + '/%d.png' % i
+                Image.fromarray(np.full((8, 8, 3), i, dtype='uint8')).save(path)
+                messages.append([path, i % 2 == 0, i % 3])
+
+            with open(dir + '/broken.png', 'w') as f:
+                f.write('no image')
+            messages.insert(5, [dir + '/broken.png', False, 0])
+
+            node = {'width': 4, 'height': 4, 'inputType': 'image_rgb'}
+            job_model = JobModel('test', {'config': {}}, dir)
+
+            store = ImageStore(len(messages), job_model.get_pixels_shape(node), shared=True)
+            decode_images_in_processes(job_model, node, store, messages, 2)
+
+            # in order of messages, without the broken image
+            self.assertEqual(store.size, 20)
+            self.assertEqual(store.x[:, 0, 0, 0].tolist(), list(range(20)))
+            self.assertEqual(store.classes.tolist(), [i % 3 for i in range(20)])
+            self.assertEqual(store.get_indices(True).tolist(), list(range(0, 20, 2)))
+            self.assertEqual(store.keys[:store.size], [dir + '/%d.png' % i for i in range(20)])
+        finally:
+            shutil.rmtree(dir)
+
+
+class RandomShift:
+    def random_transform(self, image):
+        return image + np.random.randint(0, 1000)
+
+    def standardize(self, image):
+        return image
+
+
+class TestBatchPrefetcher(unittest.TestCase):
+
+    def get_generator(self):
+        images = [[np.full((2, 2, 1), i, dtype='float32'), i % 3] for i in range(10)]
+        return InMemoryDataGenerator(RandomShift(), images, 3, 4, seed=1)
+
+    def test_reproducible(self):
+        runs = []
+        for i in range(2):
+            prefetcher = BatchPrefetcher(self.get_generator(), workers=2, queue_size=3, seed=5)
+            runs.append([next(prefetcher) for j in range(6)])
+            prefetcher.close()
+
+        for (x1, y1), (x2, y2) in zip(*runs):
+            self.assertEqual(x1.tolist(), x2.tolist())
+            self.assertEqual(y1.tolist(), y2.tolist())
+
+    def test_order_and_occupancy(self):
+        class Channel:
+            rows = []
+
+            def send(self, x, y):
+                self.rows.append((x, y))
+
+        generator = self.get_generator()
+        generator.datagen = None
+        prefetcher = BatchPrefetcher(generator, workers=2, queue_size=2, processes=False, channel=Channel())
+
+        expected = InMemoryDataGenerator(None, [[np.full((2, 2, 1), i, dtype='float32'), i % 3] for i in range(10)], 3, 4, seed=1)
+        for i in range(6):
+            x, y = next(prefetcher)
+            self.assertEqual(x.tolist(), next(expected)[0].tolist())
+
+        # 3 steps per epoch
+        self.assertEqual([x for x, y in Channel.rows], [1, 2])
+        self.assertTrue(0 <= Channel.rows[0][1][1] <= Channel.rows[0][1][0] <= 100)
+
+        # the partial last epoch is sent when closing, closing again does nothing
+        next(prefetcher)
+        prefetcher.close()
+        prefetcher.close()
+        self.assertEqual([x for x, y in Channel.rows], [1, 2, 3])
@@ -51,3 +51,30 @@ class TestAetrosCallback(unittest.TestCase):
 
         keras_callback.set_validation_data((generator, generator), 4)
         self.assertEqual(keras_callback.data_validation_size, 4)
+
+    def test_build_confusion_matrix(self):
+        import numpy as np
+        from keras.models import Sequential
+        from keras.layers import Dense
+
+        job_backend = JobBackend('test')
+        job_backend.job = {'id': 'test', 'index': 1, 'modelId': 'test/model'}
+
+        model = Sequential([Dense(3, activation='softmax', input_shape=(4,))])
+        model.compile('sgd', 'categorical_crossentropy', metrics=['accuracy'])
+        test_function = getattr(model, 'test_function', None)
+
+        keras_callback = KerasCallback(job_backend, sys.stdout)
+        keras_callback.set_model(model)
+        keras_callback.confusion_matrix_samples = 8
+
+        x = np.random.random((10, 4))
+        y = np.eye(3)[np.arange(10) % 3]
+        keras_callback.set_validation_data((x, y))
+
+        matrix = keras_callback.build_confusion_matrix()[model.output_layers[0].name]
+        self.assertEqual(np.sum(matrix), 8)
+
+        # Keras' own validation is left alone
+        self.assertIs(getattr(model, 'test_function', None), test_function)
+        self.assertEqual(len(model.evaluate(x, y, verbose=0)), 2)
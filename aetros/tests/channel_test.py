@@ -0,0 +1,225 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from aetros.backend import JobChannel, JobLossChannel, JobHistogramChannel
+from aetros.utils.channel import binary_channel_to_csv, get_binary_channel_header, read_binary_channel, \
+    ChannelRollup, lttb
+from aetros.tests.fakes import FakeJobBackend
+
+
+class TestJobChannel(unittest.TestCase):
+
+    def test_send(self):
+        job_backend = FakeJobBackend()
+        channel = JobChannel(job_backend, 'acc', traces=['training', 'validation'], kpi=True, kpiTrace=1)
+
+        channel.send(1, [0.5, 0.25])
+
+        stream = job_backend.git.streams['aetros/job/channel/acc/data.csv']
+        self.assertEqual(stream.content, '"x", "training", "validation"\n1, 0.5, 0.25\n')
+        self.assertEqual(job_backend.git.stored['aetros/job/channel/acc/last.csv'], '1, 0.5, 0.25')
+        self.assertEqual(job_backend.git.stored['aetros/job/kpi/last.json'], '0.25')
+
+        with self.assertRaises(Exception):
+            channel.send(2, [1, 2, 3])
+
+    def test_send_many(self):
+        job_backend = FakeJobBackend()
+        channel = JobChannel(job_backend, 'acc', traces=['training', 'validation'], kpi=True, kpiTrace=0)
+
+        channel.send_many(np.arange(3), np.array([[1., 2.], [3., 4.], [5., 6.]], dtype='float32'))
+
+        stream = job_backend.git.streams['aetros/job/channel/acc/data.csv']
+        self.assertEqual(stream.content.split("\n")[1:], ['0, 1.0, 2.0', '1, 3.0, 4.0', '2, 5.0, 6.0', ''])
+        self.assertEqual(stream.writes, 2)
+        self.assertEqual(job_backend.git.store_calls, 2)
+        self.assertEqual(job_backend.git.stored['aetros/job/kpi/last.json'], '5.0')
+
+        single = JobChannel(job_backend, 'lr')
+        single.send_many([1, 2], np.array([0.1, 0.2]))
+        self.assertEqual(job_backend.git.stored['aetros/job/channel/lr/last.csv'], '2, 0.2')
+
+        with self.assertRaises(Exception):
+            channel.send_many([1, 2], [1, 2])
+
+    def test_flush_interval(self):
+        job_backend = FakeJobBackend()
+        channel = JobChannel(job_backend, 'acc', flush_interval=3600)
+
+        for i in range(10):
+            channel.send(i, i * 2)
+
+        stream = job_backend.git.streams['aetros/job/channel/acc/data.csv']
+        self.assertEqual(stream.writes, 1)
+        self.assertEqual(job_backend.git.store_calls, 0)
+
+        channel.flush()
+        self.assertEqual(stream.writes, 2)
+        self.assertEqual(len(stream.content.strip().split("\n")), 11)
+        self.assertEqual(job_backend.git.stored['aetros/job/channel/acc/last.csv'], '9, 18')
+        self.assertEqual(job_backend.channels, [channel])
+
+    def test_loss_channel(self):
+        job_backend = FakeJobBackend()
+        channel = JobLossChannel(job_backend, 'loss')
+
+        channel.send_many([1, 2], np.array([0.5, 0.4]), [0.6, 0.5])
+
+        stream = job_backend.git.streams['aetros/job/channel/loss/data.csv']
+        self.assertEqual(stream.content, '"x","training","validation"\n1, 0.5, 0.6\n2, 0.4, 0.5\n')
+        self.assertEqual(json.loads('[' + job_backend.git.stored['aetros/job/channel/loss/last.csv'] + ']'), [2, 0.4, 0.5])
+
+    def test_binary(self):
+        job_backend = FakeJobBackend()
+        channel = JobChannel(job_backend, 'acc', traces=['training', 'validation'], binary=True)
+
+        channel.send(1, [0.5, 0.25])
+        channel.send_many([2, 3], [[0.75, 0.5], [1.0, 0.75]])
+
+        self.assertNotIn('aetros/job/channel/acc/data.csv', job_backend.git.streams)
+        self.assertEqual(job_backend.git.stored['aetros/job/channel/acc/last.csv'], '3, 1.0, 0.75')
+
+        x = job_backend.git.streams['aetros/job/channel/acc/0.bin'].content
+        validation = job_backend.git.streams['aetros/job/channel/acc/2.bin'].content
+        self.assertEqual(np.frombuffer(x, dtype='<f8').tolist(), [1, 2, 3])
+        self.assertEqual(np.frombuffer(validation, dtype='<f8').tolist(), [0.25, 0.5, 0.75])
+
+        with self.assertRaises(Exception):
+            JobChannel(job_backend, 'text', type=JobChannel.TEXT, binary=True)
+
+
+    def test_flush_timer(self):
+        job_backend = FakeJobBackend()
+        channel = JobChannel(job_backend, 'acc', flush_interval=0.1)
+        channel.last_flush = time.time()
+        channel.send(1, 0.5)
+
+        stream = job_backend.git.streams['aetros/job/channel/acc/data.csv']
+        self.assertEqual(stream.writes, 1)
+
+        timer = channel.flush_timer
+        timer.join(5)
+        self.assertEqual(stream.content.split("\n")[1:], ['1, 0.5', ''])
+        self.assertIsNone(channel.flush_timer)
+
+    def test_flush_writes_under_lock(self):
+        job_backend = FakeJobBackend()
+        channel = JobLossChannel(job_backend, 'loss', flush_interval=3600)
+        channel.send(1, 0.5, 0.75)
+
+        stream = job_backend.git.streams['aetros/job/channel/loss/data.csv']
+        locked = []
+        write = stream.write
+        stream.write = lambda data: locked.append(channel.lock.locked()) or write(data)
+
+        channel.flush()
+        self.assertEqual(locked, [True])
+        self.assertEqual(stream.content.split("\n")[1:], ['1, 0.5, 0.75', ''])
+
+    def test_rollups(self):
+        job_backend = FakeJobBackend()
+        channel = JobChannel(job_backend, 'loss', rollups='minmax')
+
+        channel.send_many(np.arange(100), np.arange(100) * 2.)
+
+        rollup = job_backend.git.streams['aetros/job/channel/loss/rollup/1.csv'].content.strip().split("\n")
+        self.assertEqual(rollup, ['"x", "loss min", "loss max", "loss mean"', '49.5, 0.0, 198.0, 99.0'])
+        self.assertEqual(json.loads(job_backend.git.stored['aetros/job/channel/loss/rollup/info.json'])['levels'], 2)
+
+        # further points are appended, finished levels are not stored again
+        calls = job_backend.git.store_calls
+        channel.send_many(np.arange(100, 110), np.arange(100, 110) * 2.)
+
+        stream = job_backend.git.streams['aetros/job/channel/loss/rollup/0.csv']
+        self.assertEqual(len(stream.content.strip().split("\n")), 1 + 11)
+        self.assertEqual(stream.writes, 3)
+        self.assertEqual(job_backend.git.store_calls, calls + 1)
+
+
+    def test_histogram(self):
+        job_backend = FakeJobBackend()
+        channel = JobHistogramChannel(job_backend, 'weights', bins=4)
+
+        channel.send(1, np.array([[0, 1], [2, 3]]))
+        channel.send(2, [2, 2, float('nan')])
+        channel.send(3, [-4, 4])
+
+        lines = job_backend.git.streams['aetros/job/channel/weights/data.csv'].content.strip().split("\n")
+        self.assertEqual(lines[0], '"x", "min", "max", "0", "1", "2", "3"')
+        self.assertEqual(lines[1], '1, 0.0, 3.0, 1, 1, 1, 1')
+        # range is kept from the previous step
+        self.assertEqual(lines[2], '2, 0.0, 3.0, 0, 0, 2, 0')
+        self.assertEqual(lines[3], '3, -4.0, 4.0, 1, 0, 0, 1')
+        self.assertEqual(job_backend.git.stored['aetros/job/channel/weights/last.csv'], lines[3])
+
+
+class TestChannelRollup(unittest.TestCase):
+
+    def test_minmax(self):
+        rollup = ChannelRollup(2, factor=4, max_points=3)
+        rollup.add_many([[i, i, -i] for i in range(64)])
+
+        self.assertEqual(rollup.get_level_count(), 3)
+        self.assertEqual(rollup.get_level(2), [[31.5, 0, 63, 31.5, -63, 0, -31.5]])
+
+        # only the newest max_points are kept
+        self.assertEqual([row[0] for row in rollup.get_level(0)], [53.5, 57.5, 61.5])
+
+        points = rollup.pop_new_points()
+        self.assertEqual([index for index, row in points].count(0), 16)
+        self.assertEqual(points[-1], (2, [31.5, 0, 63, 31.5, -63, 0, -31.5]))
+        self.assertEqual(rollup.pop_new_points(), [])
+
+    def test_minmax_nan(self):
+        rollup = ChannelRollup(1, factor=2)
+        rollup.add_many([[0, float('nan')], [1, 3], [2, None], [3, None]])
+
+        level = rollup.get_level(0)
+        self.assertEqual(level[0], [0.5, 3, 3, 3])
+        self.assertTrue(np.isnan(level[1][1:]).all())
+
+    def test_lttb(self):
+        rollup = ChannelRollup(1, mode='lttb', factor=3)
+        rollup.add_many([[0, 0], [1, 0], [2, 0], [3, 0], [4, 9], [5, 0], [6, 0], [7, 0], [8, 0]])
+
+        # first bucket starts with its first point, the peak is selected from the second
+        self.assertEqual(rollup.get_level(0), [[0, 0], [4, 9]])
+
+        with self.assertRaises(Exception):
+            ChannelRollup(1, mode='foo')
+
+    def test_lttb_function(self):
+        data = np.column_stack([np.arange(1000), np.sin(np.arange(1000) / 50.)])
+        data[500, 1] = 10
+
+        sampled = lttb(data, 50)
+        self.assertEqual(sampled.shape, (50, 2))
+        self.assertEqual(sampled[0].tolist(), data[0].tolist())
+        self.assertEqual(sampled[-1].tolist(), data[-1].tolist())
+        self.assertIn(10, sampled[:, 1])
+
+
+class TestBinaryChannel(unittest.TestCase):
+
+    def test_read_binary_channel(self):
+        path = tempfile.mkdtemp()
+        try:
+            header = get_binary_channel_header(['x', 'loss'])
+            with open(os.path.join(path, 'header.json'), 'w') as f:
+                f.write(json.dumps(header))
+
+            np.array([1, 2, 3], dtype='<f8').tofile(os.path.join(path, '0.bin'))
+            # partially written last row
+            np.array([0.5, 0.25], dtype='<f8').tofile(os.path.join(path, '1.bin'))
+
+            header, columns = read_binary_channel(path)
+            self.assertEqual([len(c) for c in columns], [2, 2])
+            self.assertEqual(binary_channel_to_csv(path), '"x", "loss"\n1.0, 0.5\n2.0, 0.25\n')
+        finally:
+            shutil.rmtree(path)
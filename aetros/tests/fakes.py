@@ -0,0 +1,52 @@
+import six
+
+from aetros.backend import JobBackend
+
+
+class FakeStream():
+    def __init__(self, binary=False):
+        self.content = six.b('') if binary else ''
+        self.writes = 0
+
+    def write(self, data):
+        self.content += data
+        self.writes += 1
+
+
+class FakeGit():
+    """
+    Records streamed and stored files in memory instead of writing them to a git repository.
+    """
+
+    def __init__(self):
+        self.streams = {}
+        self.stored = {}
+        self.store_calls = 0
+
+    def commit_json_file(self, message, path, content):
+        pass
+
+    def commit_file(self, message, path, content):
+        pass
+
+    def stream_file(self, path, binary=False):
+        self.streams[path] = FakeStream(binary)
+        return self.streams[path]
+
+    def store_file(self, path, data):
+        self.store_calls += 1
+        self.stored[path] = data
+
+
+class FakeJobBackend(JobBackend):
+    """
+    A JobBackend with FakeGit as git layer. It does not read a config, connect to a server or register
+    signal handlers, all other methods are the real ones.
+    """
+
+    def __init__(self):
+        self.git = FakeGit()
+        self.job = {'config': {}, 'parameters': {}}
+        self.kpi_channel = None
+        self.channels = []
+        self.progresses = {}
@@ -0,0 +1,128 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from aetros.git import Git
+
+
+class GitTestMixin(object):
+    """
+    Creates a Git of a fresh job in a temporary storage dir. Used together with unittest.TestCase.
+    """
+
+    def setUp(self):
+        self.storage_dir = tempfile.mkdtemp('aetros-git-test')
+        config = {'host': 'localhost', 'storage_dir': self.storage_dir, 'ssh': 'ssh', 'ssh_key_base64': None}
+        self.git = Git(logging.getLogger('aetros-git-test'), None, config, 'test/model')
+        self.git.create_job_id({'id': 'test'})
+
+    def tearDown(self):
+        self.git.delete_git_ssh()
+        shutil.rmtree(self.storage_dir)
+
+    def get_commit_count(self):
+        out = self.git.command_exec(['rev-list', '--count', self.git.ref_head])[0]
+        return int(out.decode('utf-8').strip())
+
+
+class TestGitBatchCommit(GitTestMixin, unittest.TestCase):
+
+    def test_nested(self):
+        commits = self.get_commit_count()
+
+        with self.git.batch_commit('OUTER'):
+            self.git.commit_json_file('INFO a', 'aetros/job/info/a', 1)
+
+            with self.git.batch_commit('INNER'):
+                self.git.commit_json_file('INFO b', 'aetros/job/info/b', 2)
+
+            self.git.commit_json_file('INFO c', 'aetros/job/info/c', 3)
+
+        self.assertEqual(self.get_commit_count(), commits + 1)
+        self.assertEqual(self.git.contents('aetros/job/info/b.json'), '2')
+        self.assertEqual(self.git.contents('aetros/job/info/c.json'), '3')
+
+        message = self.git.command_exec(['log', '-1', '--format=%B', self.git.ref_head])[0].decode('utf-8')
+        self.assertEqual(message.strip(), "OUTER\n\nINFO a\nINFO b\nINFO c")
+
+    def test_one_blob_process(self):
+        commands = []
+        command_exec = self.git.command_exec
+
+        def record(command, *args, **kwargs):
+            commands.append(command[0])
+            return command_exec(command, *args, **kwargs)
+
+        self.git.command_exec = record
+
+        with self.git.batch_commit('INFOS'):
+            for i in range(20):
+                self.git.commit_json_file('INFO ' + str(i), 'aetros/job/info/' + str(i), i)
+            self.git.commit_json_file('INFO 0', 'aetros/job/info/0', 'latest')
+
+        self.assertEqual(commands.count('hash-object'), 1)
+        self.assertEqual(commands.count('update-index'), 1)
+        self.assertEqual(self.git.contents('aetros/job/info/0.json'), '"latest"')
+        self.assertEqual(self.git.contents('aetros/job/info/19.json'), '19')
+        self.assertIsNone(self.git.git_batch_blob_path)
+
+    def test_stream_end_by_path(self):
+        self.git.online = False
+        stream = self.git.stream_file('aetros/job/log.txt')
+        stream.write('line 1\n')
+        stream.write('line 2\n')
+
+        self.git.stop()
+
+        self.assertEqual(self.git.contents('aetros/job/log.txt'), 'line 1\nline 2\n')
+        self.assertEqual(self.git.streamed_files, {})
+        self.assertFalse(os.path.exists(self.git.temp_path + '/stream-blob/' + self.git.job_id + '/aetros/job/log.txt'))
+
+
+class TestGitWriteBehind(GitTestMixin, unittest.TestCase):
+
+    def test_window(self):
+        commits = self.get_commit_count()
+        self.git.enable_write_behind(window=60)
+
+        self.assertIsNone(self.git.commit_json_file('INFO a', 'aetros/job/info/a', 1))
+        self.git.commit_json_file('INFO a', 'aetros/job/info/a', 2)
+        self.git.commit_json_file('INFO b', 'aetros/job/info/b', 3)
+        self.assertEqual(self.get_commit_count(), commits)
+
+        self.git.flush()
+        self.assertEqual(self.get_commit_count(), commits + 1)
+        self.assertEqual(self.git.contents('aetros/job/info/a.json'), '2')
+
+        message = self.git.command_exec(['log', '-1', '--format=%B', self.git.ref_head])[0].decode('utf-8')
+        self.assertEqual(message.strip(), "WRITE_BEHIND\n\nINFO a\nINFO a\nINFO b")
+
+    def test_max_files(self):
+        commits = self.get_commit_count()
+        self.git.enable_write_behind(window=60, max_files=2)
+
+        self.git.commit_json_file('INFO a', 'aetros/job/info/a', 1)
+        self.git.commit_json_file('INFO b', 'aetros/job/info/b', 2)
+        self.assertEqual(self.get_commit_count(), commits + 1)
+
+    def test_timer(self):
+        commits = self.get_commit_count()
+        self.git.enable_write_behind(window=0.2)
+
+        self.git.commit_json_file('INFO a', 'aetros/job/info/a', 1)
+        timer = self.git.write_behind_timer
+        self.assertEqual(self.get_commit_count(), commits)
+
+        timer.join()
+        self.assertEqual(self.get_commit_count(), commits + 1)
+
+    def test_batch_commit_flushes(self):
+        self.git.enable_write_behind(window=60)
+
+        self.git.commit_json_file('INFO a', 'aetros/job/info/a', 1)
+        with self.git.batch_commit('BATCH'):
+            self.git.commit_json_file('INFO a', 'aetros/job/info/a', 2)
+
+        self.assertEqual(self.git.contents('aetros/job/info/a.json'), '2')
@@ -0,0 +1,70 @@
+"""
+Benchmarks the insight visualization kernels over typical conv layer shapes against the previous per-pixel
+implementations. Not collected by pytest, run with `python -m aetros.tests.image_benchmark`.
+"""
+from __future__ import print_function
+from __future__ import division
+
+import math
+import timeit
+
+import numpy as np
+
+from aetros.utils.image import upscale, get_color_map, get_color_map_lut, normalize_to_uint8, get_layer_vis_square
+
+# (filters, height, width) of typical conv layer outputs and weights
+SHAPES = [(32, 4, 4), (64, 8, 8), (32, 28, 28), (64, 56, 56), (128, 3, 3)]
+
+
+def upscale_loop(image, ratio):
+    width = int(math.floor(image.shape[1] * ratio))
+    height = int(math.floor(image.shape[0] * ratio))
+    out = np.ndarray((height, width, image.shape[2]), dtype=np.uint8)
+    for x, y in np.ndindex((width, height)):
+        out[y, x] = image[int(math.floor(y / ratio)), int(math.floor(x / ratio))]
+    return out
+
+
+def color_map_interp(images, colormap='jet'):
+    images = images.astype('float32')
+    images -= images.min()
+    if images.max() > 0:
+        images /= images.max()
+        images *= 255
+
+    redmap, greenmap, bluemap = get_color_map(colormap)
+    red = np.interp(images * (len(redmap) - 1) / 255.0, range(len(redmap)), redmap)
+    green = np.interp(images * (len(greenmap) - 1) / 255.0, range(len(greenmap)), greenmap)
+    blue = np.interp(images * (len(bluemap) - 1) / 255.0, range(len(bluemap)), bluemap)
+    images = np.concatenate((red[..., np.newaxis], green[..., np.newaxis], blue[..., np.newaxis]), axis=3)
+
+    return np.maximum(np.minimum(images, 255), 0).astype('uint8')
+
+
+def measure(fn, number=3):
+    return min(timeit.repeat(fn, number=1, repeat=number)) * 1000
+
+
+def main():
+    random = np.random.RandomState(0)
+
+    print("%-16s %14s %14s %14s %14s %14s" % ('shape', 'upscale loop', 'upscale', 'interp cmap', 'lut cmap', 'vis square'))
+    for shape in SHAPES:
+        data = random.randn(*shape).astype(np.float32)
+        tile = random.randint(0, 255, shape[1:] + (3,)).astype(np.uint8)
+        ratio = 100 / float(min(shape[1:]))
+
+        assert (upscale_loop(tile, ratio) == upscale(tile, ratio)).all()
+
+        print("%-16s %12.2fms %12.2fms %12.2fms %12.2fms %12.2fms" % (
+            str(shape),
+            measure(lambda: upscale_loop(tile, ratio)),
+            measure(lambda: upscale(tile, ratio)),
+            measure(lambda: color_map_interp(data)),
+            measure(lambda: get_color_map_lut('jet')[normalize_to_uint8(data)]),
+            measure(lambda: get_layer_vis_square(data)),
+        ))
+
+
+if __name__ == '__main__':
+    main()
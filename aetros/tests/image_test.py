@@ -1,4 +1,4 @@
-from aetros.utils.image import upscale, resize_image
+from aetros.utils.image import upscale, resize_image, vis_square, get_image_tales, get_color_map, get_color_map_lut
 import numpy as np
 import pytest
 from PIL import Image
@@ -24,3 +24,36 @@ def test_resize_image():
     resized = resize_image(test_image, 42, 31)
     assert resized.shape[0] == 42
     assert resized.shape[1] == 31
+
+
+def test_upscale_nearest_neighbour():
+    test_image = np.arange(4 * 5 * 3, dtype=np.uint8).reshape((4, 5, 3))
+    ratio = 100 / 4.0
+    scaled_image = upscale(test_image, ratio)
+
+    assert scaled_image.shape == (100, 125, 3)
+    for y, x in [(0, 0), (24, 24), (25, 25), (99, 124), (57, 3)]:
+        assert (scaled_image[y, x] == test_image[int(y / ratio), int(x / ratio)]).all()
+
+
+def test_color_map_lut():
+    lut = get_color_map_lut('jet')
+    assert lut.shape == (256, 3)
+    assert lut.dtype == np.uint8
+    assert get_color_map_lut('jet') is lut
+
+    redmap, greenmap, bluemap = get_color_map('jet')
+    values = np.arange(256)
+    assert (lut[:, 2] == np.interp(values * (len(bluemap) - 1) / 255.0, range(len(bluemap)), bluemap).astype(np.uint8)).all()
+
+
+def test_vis_square():
+    data = np.random.RandomState(1).rand(6, 4, 4).astype(np.float32)
+    tiles = vis_square(data, padsize=1, normalize=True)
+
+    assert tiles.dtype == np.uint8
+    # 3x2 grid of 5x5 (4 pixels + padding) tiles, colored
+    assert tiles.shape == (15, 10, 3)
+
+    uint8_data = (np.arange(16, dtype=np.uint8) * 2).reshape((1, 4, 4))
+    assert (get_image_tales(uint8_data) == get_image_tales(uint8_data.astype(np.float32))).all()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+import six
+
+from aetros.utils.log_index import LogIndex, get_tail_offset
+
+
+class TestLogIndex(unittest.TestCase):
+
+    def build_log(self):
+        lines = []
+        for i in range(25):
+            if i % 10 == 0:
+                lines.append(u'\fSECTION %d\t1.5' % (i // 10,))
+            lines.append(u'line %d ä' % (i,))
+
+        return (u'\n'.join(lines) + u'\n').encode('utf-8')
+
+    def test_chunked_feed(self):
+        log = self.build_log()
+
+        index = LogIndex(every=4)
+        # chunks ending in the middle of lines and section markers
+        for i in range(0, len(log), 3):
+            index.feed(log[i:i + 3])
+
+        whole = LogIndex(every=4)
+        whole.feed(log)
+
+        self.assertEqual(index.to_dict(), whole.to_dict())
+        self.assertEqual(index.lines, 28)
+        self.assertEqual(index.size, len(log))
+        self.assertEqual([s[2] for s in index.sections], ['SECTION 0', 'SECTION 1', 'SECTION 2'])
+
+        lines = log.split(six.b('\n'))
+        for line, offset, title in index.sections:
+            self.assertEqual(log[offset:offset + 9], six.b('\fSECTION '))
+            self.assertTrue(lines[line].startswith(six.b('\f')))
+
+        for line in [0, 3, 4, 9, 27]:
+            offset = index.get_line_offset(log, line)
+            self.assertEqual(log[offset:].split(six.b('\n'))[0], lines[line])
+
+        # json round trip
+        loaded = LogIndex.from_dict(json.loads(json.dumps(index.to_dict())))
+        start, end = loaded.get_section_range('SECTION 1')
+        self.assertEqual(log[start:end].decode('utf-8').split('\n')[1:-1],
+                         [u'line %d ä' % (i,) for i in range(10, 20)])
+        self.assertIsNone(loaded.get_section_range('FOO'))
+
+    def test_tail(self):
+        log = six.b('a\nb\nc\n')
+        self.assertEqual(log[get_tail_offset(log, 2):], six.b('b\nc\n'))
+        self.assertEqual(log[get_tail_offset(log, 10):], log)
+        self.assertEqual(six.b('a\nb')[get_tail_offset(six.b('a\nb'), 1):], six.b('b'))
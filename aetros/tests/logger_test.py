@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+from aetros.logger import GeneralLogger, TailBuffer, StreamMultiplexer, drain_stream, compact_carriage_returns
+
+
+class FakeOutput():
+    def __init__(self):
+        self.content = ''
+
+    def write(self, message):
+        self.content += message
+
+    def flush(self):
+        pass
+
+
+class FakeJobBackend():
+    def __init__(self):
+        self.log = ''
+
+    def write_log(self, message):
+        self.log += message
+        return True
+
+
+class TestGeneralLogger(unittest.TestCase):
+
+    def test_backspaces(self):
+        job_backend = FakeJobBackend()
+        logger = GeneralLogger(FakeOutput(), job_backend)
+
+        logger.write('1/10 [==')
+        logger.write('\b\b\b\b\b\b\b\b2/10 [====')
+        logger.write(']\b\b\b\b\b\b\b\b\b\b\b\b\b\b\b\b\b\b\b\b')
+        logger.write('done\n')
+        logger.send_buffer()
+
+        self.assertEqual(job_backend.log, 'done\n')
+        self.assertEqual(logger.logger.content, '1/10 [==\b\b\b\b\b\b\b\b2/10 [====]' + '\b' * 20 + 'done\n')
+
+    def test_flusher(self):
+        job_backend = FakeJobBackend()
+        logger = GeneralLogger(FakeOutput(), job_backend)
+        logger.flush_interval = 0.01
+
+        logger.write('a')
+        logger.write('b')
+        flusher = logger.flusher
+
+        end = time.time() + 2
+        while job_backend.log != 'ab' and time.time() < end:
+            time.sleep(0.01)
+
+        self.assertEqual(job_backend.log, 'ab')
+        logger.write('c')
+        self.assertIs(logger.flusher, flusher)
+
+    def test_tail(self):
+        tail = TailBuffer(limit=10)
+        for i in range(100):
+            tail.append('%03d' % i)
+
+        self.assertEqual(tail.getvalue(), '6097098099')
+        self.assertLessEqual(tail.size, 2 * 10 + 3)
+
+        logger = GeneralLogger(FakeOutput())
+        logger.write('x' * 30000)
+        self.assertEqual(len(logger.last_messages), 20 * 1024)
+
+    def test_attach(self):
+        job_backend = FakeJobBackend()
+        logger = GeneralLogger(FakeOutput(), job_backend)
+
+        code = "import sys; sys.stdout.write(u'\\u00e4' * 5000 + '\\n')"
+        p = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE)
+        wait = logger.attach(p.stdout)
+        p.wait()
+        wait()
+
+        self.assertEqual(job_backend.log, u'ä' * 5000 + '\n')
+
+    def test_drain_stream(self):
+        p = subprocess.Popen([sys.executable, '-c', "print('a' * 10000)"], stdout=subprocess.PIPE)
+        self.assertEqual(drain_stream(p.stdout), 'a' * 10000 + '\n')
+        p.wait()
+
+    def test_compact(self):
+        job_backend = FakeJobBackend()
+        logger = GeneralLogger(FakeOutput(), job_backend, compact=True)
+
+        logger.write('Epoch 1/2\n')
+        for i in range(100):
+            logger.write('\r%d/100 [' % (i + 1,) + '=' * (i // 10) + ']')
+        logger.send_buffer()
+
+        logger.write('\r100/100 [==========] - loss: 0.1\n')
+        logger.write('Epoch 2/2\n')
+        logger.send_buffer()
+
+        self.assertEqual(job_backend.log, 'Epoch 1/2\n100/100 [=========]\r100/100 [==========] - loss: 0.1\nEpoch 2/2\n')
+        self.assertEqual(logger.logger.content.count('\r'), 101)
+
+
+class TestCompactCarriageReturns(unittest.TestCase):
+
+    def test_overwrite(self):
+        self.assertEqual(compact_carriage_returns('abc'), 'abc')
+        self.assertEqual(compact_carriage_returns('long line\rshort\n'), 'shortline\n')
+        self.assertEqual(compact_carriage_returns('a\r\nb\r\n'), 'a\nb\n')
+        self.assertEqual(compact_carriage_returns('1%\r2%\r'), '2%\r')
+        self.assertEqual(compact_carriage_returns('5%\r6%\n', continues_line=True), '5%\r6%\n')
+
+
+class TestStreamMultiplexer(unittest.TestCase):
+
+    def test_many_processes(self):
+        multiplexer = StreamMultiplexer()
+        code = "import sys; sys.stdout.write(('%s' * 100000) + '\\n'); sys.stderr.write('err\\n')"
+
+        backends = [FakeJobBackend() for i in range(5)]
+        loggers = [GeneralLogger(FakeOutput(), job_backend) for job_backend in backends]
+        for logger in loggers:
+            # starts the flusher thread of each logger
+            logger.write('')
+
+        threads = threading.active_count()
+
+        processes = []
+        waits = []
+        for i in range(5):
+            p = subprocess.Popen([sys.executable, '-c', code % (i,)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            waits.append(multiplexer.attach(p.stdout, loggers[i]))
+            # stderr is drained only
+            waits.append(multiplexer.attach(p.stderr))
+            processes.append(p)
+
+        # only the one thread of the multiplexer
+        self.assertEqual(threading.active_count(), threads + 1)
+
+        for p in processes:
+            p.wait()
+        for wait in waits:
+            wait()
+
+        for i, job_backend in enumerate(backends):
+            self.assertEqual(job_backend.log, str(i) * 100000 + '\n')
+
+
+    def test_shared_logger_gets_whole_lines(self):
+        multiplexer = StreamMultiplexer()
+        code = "import sys, time\n" \
+               "for i in range(5):\n" \
+               "    sys.stdout.write('%s' * 10); sys.stdout.flush(); time.sleep(0.01)\n" \
+               "    sys.stdout.write('%s' * 10 + '\\n'); sys.stdout.flush()\n" \
+               "sys.stdout.write('end')\n"
+
+        job_backend = FakeJobBackend()
+        logger = GeneralLogger(FakeOutput(), job_backend)
+
+        processes = []
+        waits = []
+        for i in range(3):
+            p = subprocess.Popen([sys.executable, '-c', code % (i, i)], stdout=subprocess.PIPE)
+            waits.append(multiplexer.attach(p.stdout, logger, read_line=True))
+            processes.append(p)
+
+        for p in processes:
+            p.wait()
+        for wait in waits:
+            wait()
+
+        log = job_backend.log.replace('end', '')
+        lines = log.strip().split('\n')
+        self.assertEqual(len(lines), 15)
+        for line in lines:
+            self.assertEqual(line, line[0] * 20)
+
+        # the rest without newline is sent when the stream ends
+        self.assertEqual(job_backend.log.count('end'), 3)
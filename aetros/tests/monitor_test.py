@@ -0,0 +1,85 @@
+import json
+import unittest
+
+import aetros.cuda_gpu
+from aetros.MonitorThread import MonitoringThread
+from aetros.tests.fakes import FakeJobBackend
+
+
+class FakeDevices():
+    def get_ordered_devices(self):
+        return [{'id': 0, 'device': 1}]
+
+    def get_memory(self, device):
+        return 25, 100
+
+
+class TestMonitoringThread(unittest.TestCase):
+
+    def test_batched_upload(self):
+        job_backend = FakeJobBackend()
+        thread = MonitoringThread(job_backend, upload_interval=3600, gpu_backend=FakeDevices())
+
+        for i in range(3):
+            thread.monitor()
+
+        stream = job_backend.git.streams['aetros/job/monitoring.csv']
+        self.assertEqual(stream.content, '"second", "cpu", "memory", "memory_gpu0"\n')
+        self.assertEqual(stream.writes, 1)
+
+        thread.stop()
+        rows = [json.loads('[' + line + ']') for line in stream.content.strip().split("\n")[1:]]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual([row[3] for row in rows], [75, 75, 75])
+        self.assertEqual(stream.writes, 2)
+        self.assertIn('aetros/job/times/elapsed.json', job_backend.git.stored)
+
+    def test_ring(self):
+        job_backend = FakeJobBackend()
+        thread = MonitoringThread(job_backend, upload_interval=3600, ring_size=2, gpu_backend=FakeDevices())
+
+        for i in range(5):
+            thread.monitor()
+        thread.flush()
+
+        stream = job_backend.git.streams['aetros/job/monitoring.csv']
+        self.assertEqual(len(stream.content.strip().split("\n")), 3)
+
+    def test_process_tree(self):
+        class FakeAccounting():
+            columns = ['cpu', 'rss']
+
+            def sample(self):
+                return [50, 1024]
+
+        job_backend = FakeJobBackend()
+        thread = MonitoringThread(job_backend, upload_interval=3600, gpu_backend=FakeDevices())
+        thread.watch_process_tree(FakeAccounting())
+        thread.monitor()
+        thread.flush()
+
+        lines = job_backend.git.streams['aetros/job/monitoring_process.csv'].content.strip().split("\n")
+        self.assertEqual(lines[0], '"second", "cpu", "rss"')
+        self.assertEqual(json.loads('[' + lines[1] + ']')[1:], [50, 1024])
+
+
+class TestCudaDevices(unittest.TestCase):
+
+    def test_nvml_handles_are_cached(self):
+        lookups = []
+        get_nvml_handle = aetros.cuda_gpu.get_nvml_handle
+        get_nvml_memory = aetros.cuda_gpu.get_nvml_memory
+        aetros.cuda_gpu.get_nvml_handle = lambda bus_id: lookups.append(bus_id) or bus_id
+        aetros.cuda_gpu.get_nvml_memory = lambda handle: (25, 100) if handle == '0000:02:00.0' else None
+
+        try:
+            devices = aetros.cuda_gpu.CudaDevices()
+            devices.devices = [{'device': 1, 'fullId': '0000:02:00.0'}]
+
+            self.assertEqual(devices.get_memory(1), (25, 100))
+            self.assertEqual(devices.get_memory(1), (25, 100))
+            self.assertIsNone(devices.get_memory(5))
+            self.assertEqual(lookups, ['0000:02:00.0'])
+        finally:
+            aetros.cuda_gpu.get_nvml_handle = get_nvml_handle
+            aetros.cuda_gpu.get_nvml_memory = get_nvml_memory
@@ -0,0 +1,102 @@
+import threading
+import time
+import unittest
+
+from aetros.utils.overhead import OverheadMeter, measure
+import aetros.utils.overhead
+
+
+class TestOverheadMeter(unittest.TestCase):
+
+    def setUp(self):
+        self.original = aetros.utils.overhead.meter
+        aetros.utils.overhead.meter = OverheadMeter()
+
+    def tearDown(self):
+        aetros.utils.overhead.meter = self.original
+
+    def test_nested(self):
+        @measure('inner')
+        def inner():
+            time.sleep(0.01)
+
+        @measure('outer')
+        def outer():
+            inner()
+            inner()
+
+        meter = aetros.utils.overhead.meter
+        outer()
+        self.assertEqual(meter.sections, {})
+
+        meter.start()
+        outer()
+
+        self.assertGreaterEqual(meter.sections['inner'], 0.02)
+        self.assertGreaterEqual(meter.sections['outer'], meter.sections['inner'])
+        self.assertEqual(meter.total, meter.sections['outer'])
+
+        # other threads are not counted
+        thread = threading.Thread(target=outer)
+        thread.start()
+        thread.join()
+        self.assertEqual(meter.total, meter.sections['outer'])
+
+    def test_budget(self):
+        @measure('slow')
+        def slow():
+            time.sleep(0.02)
+
+        meter = aetros.utils.overhead.meter
+        calls = []
+        meter.on_over_budget(lambda: calls.append(True))
+        meter.start()
+        meter.check_interval = 0.01
+
+        slow()
+        self.assertEqual(calls, [])
+
+        meter.set_budget(1)
+        slow()
+        self.assertEqual(calls, [True])
+        self.assertEqual(meter.get_report()['throttled'], 1)
+
+    def test_share_of_step_time(self):
+        @measure('channel')
+        def send():
+            time.sleep(0.01)
+
+        meter = aetros.utils.overhead.meter
+        meter.start()
+        send()
+        meter.add_step(0.1)
+
+        # 0.01s of 0.1s in steps, no matter how long the job runs already
+        time.sleep(0.05)
+        self.assertAlmostEqual(meter.get_percent(), meter.total / 0.1 * 100)
+        self.assertEqual(meter.get_report()['stepSeconds'], 0.1)
+
+    def test_listener_registered_once(self):
+        @measure('slow')
+        def slow():
+            time.sleep(0.02)
+
+        meter = aetros.utils.overhead.meter
+        calls = []
+
+        def listener():
+            calls.append(True)
+
+        meter.on_over_budget(listener)
+        meter.on_over_budget(listener)
+        meter.start()
+        meter.check_interval = 0.01
+        meter.set_budget(1)
+
+        slow()
+        self.assertEqual(calls, [True])
+
+        meter.remove_listener(listener)
+        slow()
+        self.assertEqual(calls, [True])
+        self.assertEqual(meter.get_report()['throttled'], 2)
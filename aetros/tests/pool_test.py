@@ -0,0 +1,71 @@
+import unittest
+from threading import Event
+
+from aetros.utils.pool import WorkerPool
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def submit_blocking(self, pool, release):
+        return pool.submit(lambda: None, lambda prepared: release.wait())
+
+    def test_drop(self):
+        pool = WorkerPool(policy='drop')
+        release = Event()
+        prepared = []
+        done = []
+
+        self.assertTrue(self.submit_blocking(pool, release))
+
+        # pool is busy, prepare is not called for dropped tasks
+        self.assertFalse(pool.submit(lambda: prepared.append(1), done.append))
+        self.assertEqual(prepared, [])
+        self.assertEqual(pool.dropped, 1)
+
+        release.set()
+        pool.wait()
+        self.assertTrue(pool.submit(lambda: 2, done.append))
+        pool.wait()
+        self.assertEqual(done, [2])
+
+    def test_defer(self):
+        pool = WorkerPool(policy='defer')
+        release = Event()
+        done = []
+
+        self.submit_blocking(pool, release)
+        self.assertTrue(pool.submit(lambda: 1, done.append))
+        self.assertTrue(pool.submit(lambda: 2, done.append))
+
+        release.set()
+        pool.wait()
+
+        # only the newest deferred task runs
+        self.assertEqual(done, [2])
+        self.assertEqual(pool.dropped, 1)
+
+    def test_failing_task(self):
+        class Logger:
+            messages = []
+
+            def warning(self, message):
+                self.messages.append(message)
+
+        pool = WorkerPool(logger=Logger())
+
+        def fail(prepared):
+            raise Exception('broken')
+
+        pool.submit(lambda: None, fail)
+        pool.wait()
+        self.assertEqual(Logger.messages, ['Background task failed: Exception: broken'])
+
+    def test_invalid_policy(self):
+        self.assertRaises(Exception, WorkerPool, policy='block')
+
+        pool = WorkerPool()
+        self.assertRaises(Exception, pool.set_policy, 'defered')
+        self.assertEqual(pool.policy, WorkerPool.DROP)
+
+        pool.set_policy('defer')
+        self.assertEqual(pool.policy, WorkerPool.DEFER)
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from aetros.utils.process import ProcessTreeAccounting
+
+
+def write_process(proc_path, pid, pgrp, ticks, io_read):
+    ensure = os.path.join(proc_path, str(pid))
+    if not os.path.isdir(ensure):
+        os.makedirs(ensure)
+
+    # pid (comm) state ppid pgrp session tty tpgid flags minflt cminflt majflt cmajflt utime stime ... threads ... rss
+    fields = ['S', '1', str(pgrp), '1', '0', '-1', '0', '0', '0', '0', '0', str(ticks), '0',
+              '0', '0', '20', '0', '3', '0', '100', '1000', '10']
+    with open(os.path.join(ensure, 'stat'), 'w') as f:
+        f.write(str(pid) + ' (python worker) ' + ' '.join(fields) + "\n")
+
+    with open(os.path.join(ensure, 'io'), 'w') as f:
+        f.write("rchar: 1\nread_bytes: %d\nwrite_bytes: 0\n" % (io_read,))
+
+    with open(os.path.join(ensure, 'status'), 'w') as f:
+        f.write("Name:\tpython\nvoluntary_ctxt_switches:\t5\nnonvoluntary_ctxt_switches:\t1\n")
+
+
+class TestProcessTreeAccounting(unittest.TestCase):
+
+    def test_process_group(self):
+        path = tempfile.mkdtemp()
+        try:
+            write_process(path, 10, 10, 0, 0)
+            write_process(path, 11, 10, 0, 0)
+            write_process(path, 12, 99, 0, 0)
+
+            accounting = ProcessTreeAccounting(pgid=10, proc_path=path)
+            accounting.clock_ticks = 100
+            accounting.page_size = 4096
+
+            self.assertIsNone(accounting.sample())
+
+            write_process(path, 10, 10, 100, 4096)
+            write_process(path, 12, 99, 500, 4096)
+            shutil.rmtree(os.path.join(path, '11'))
+            # new process of the group counts from zero
+            write_process(path, 13, 10, 50, 0)
+
+            accounting.last_time -= 1
+            cpu, rss, io_read, io_write, ctx_switches, threads = accounting.sample()
+
+            self.assertAlmostEqual(cpu, 150, delta=5)
+            self.assertAlmostEqual(io_read, 4096, delta=100)
+            self.assertEqual(rss, 2 * 10 * 4096)
+            self.assertEqual(threads, 6)
+            self.assertEqual(io_write, 0)
+            # only the new process adds context switches
+            self.assertAlmostEqual(ctx_switches, 6, delta=1)
+        finally:
+            shutil.rmtree(path)
+
+    @unittest.skipIf(not os.path.isdir('/proc'), 'requires /proc')
+    def test_own_process_group(self):
+        accounting = ProcessTreeAccounting(pgid=os.getpgrp())
+        accounting.sample()
+
+        end = time.time() + 0.2
+        while time.time() < end:
+            pass
+
+        values = accounting.sample()
+        self.assertGreater(values[0], 0)
+        self.assertGreater(values[1], 0)
+        self.assertGreaterEqual(values[5], 1)
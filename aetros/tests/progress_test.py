@@ -0,0 +1,69 @@
+import json
+import threading
+import time
+import unittest
+
+from aetros.tests.fakes import FakeJobBackend
+
+
+class TestProgress(unittest.TestCase):
+
+    def get_info(self, job_backend, id):
+        return json.loads(job_backend.git.stored['aetros/job/progress/' + id + '.json'])
+
+    def test_throttled(self):
+        job_backend = FakeJobBackend()
+        progress = job_backend.create_progress('download', 1000, store_interval=3600)
+        self.assertIs(job_backend.create_progress('download'), progress)
+
+        calls = job_backend.git.store_calls
+        for i in range(500):
+            progress.advance(1)
+
+        # only start() stores, the advances in between are combined
+        self.assertEqual(job_backend.git.store_calls, calls + 1)
+        self.assertEqual(self.get_info(job_backend, 'download')['step'], 0)
+
+        job_backend.flush_progresses()
+        self.assertEqual(self.get_info(job_backend, 'download')['step'], 500)
+
+        calls = job_backend.git.store_calls
+        job_backend.flush_progresses()
+        self.assertEqual(job_backend.git.store_calls, calls)
+
+        progress.advance(500)
+        info = self.get_info(job_backend, 'download')
+        self.assertEqual(info['step'], 1000)
+        self.assertNotEqual(info['stopped'], False)
+        self.assertEqual(info['eta'], 0)
+
+    def test_threads(self):
+        job_backend = FakeJobBackend()
+        progress = job_backend.create_progress('download', 15 * 200)
+
+        def work():
+            for i in range(200):
+                progress.advance(1)
+
+        threads = [threading.Thread(target=work) for i in range(15)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        info = self.get_info(job_backend, 'download')
+        self.assertEqual(info['step'], 15 * 200)
+        self.assertNotEqual(info['stopped'], False)
+
+    def test_eta_seeded_from_first_interval(self):
+        job_backend = FakeJobBackend()
+        progress = job_backend.create_progress('epochs', 10)
+
+        # starts the controller, there is no interval yet
+        progress.advance(1)
+        self.assertIsNone(progress.time_per_step)
+
+        time.sleep(0.05)
+        progress.advance(1)
+        self.assertGreaterEqual(progress.time_per_step, 0.04)
+        self.assertGreaterEqual(progress.eta, 8 * 0.04)
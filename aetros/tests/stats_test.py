@@ -0,0 +1,86 @@
+import unittest
+
+import numpy as np
+
+from aetros.utils.stats import ReservoirSample, ConfusionMatrix, StreamStats
+
+
+class TestReservoirSample(unittest.TestCase):
+
+    def test_percentiles(self):
+        sample = ReservoirSample(size=10)
+        self.assertEqual(sample.percentiles([50]), [None])
+
+        for i in range(5):
+            sample.add(i)
+
+        self.assertEqual(sample.percentiles([0, 50, 100]), [0, 2, 4])
+        self.assertEqual(sample.total, 10)
+
+    def test_constant_memory(self):
+        sample = ReservoirSample(size=500, seed=1)
+
+        for i in range(3):
+            sample.add(i)
+        self.assertEqual(sample.get_values().tolist(), [0, 1, 2])
+
+        for i in range(3, 100000):
+            sample.add(i)
+
+        values = sample.get_values()
+        self.assertEqual(sample.count, 100000)
+        self.assertEqual(len(values), 500)
+
+        # a subset of the input without duplicates, spread over the whole stream
+        self.assertEqual(len(np.unique(values)), 500)
+        self.assertTrue(np.all(values == np.round(values)))
+        self.assertTrue(np.all((values >= 0) & (values < 100000)))
+
+        counts, _ = np.histogram(values, bins=5, range=(0, 100000))
+        self.assertTrue(np.all(np.abs(counts - 100) < 35), counts)
+        self.assertAlmostEqual(sample.percentiles([50])[0], 50000, delta=7500)
+
+        sample.reset()
+        self.assertEqual(sample.percentiles([50]), [None])
+
+
+class TestConfusionMatrix(unittest.TestCase):
+
+    def test_add(self):
+        matrix = ConfusionMatrix(3)
+
+        # one-hot expected, probabilities predicted
+        matrix.add(np.eye(3)[[0, 1, 2, 2]], np.array([[0.9, 0.1, 0], [0.2, 0.7, 0.1], [0.1, 0.8, 0.1], [0, 0, 1]]))
+        # sparse labels
+        matrix.add(np.array([[0], [1]]), np.array([2, 1]))
+
+        self.assertEqual(matrix.samples, 6)
+        self.assertEqual(matrix.tolist(), [[1, 0, 1], [0, 2, 0], [0, 1, 1]])
+
+        matrix.reset()
+        self.assertEqual(matrix.tolist(), [[0, 0, 0]] * 3)
+
+    def test_length_mismatch(self):
+        self.assertRaises(Exception, ConfusionMatrix(2).add, np.array([0, 1]), np.array([1]))
+
+
+class TestStreamStats(unittest.TestCase):
+
+    def test_add(self):
+        stats = StreamStats(ema_alpha=0.5)
+        self.assertEqual(stats.count, 0)
+        self.assertIsNone(stats.mean)
+
+        for value in [4, 2, 6]:
+            stats.add(value)
+
+        self.assertEqual(stats.count, 3)
+        self.assertAlmostEqual(stats.mean, 4)
+        self.assertEqual(stats.min, 2)
+        self.assertEqual(stats.max, 6)
+        self.assertAlmostEqual(stats.ema, 4.5)
+        self.assertEqual(stats.percentiles([50]), [4])
+
+        stats.reset()
+        self.assertEqual(stats.count, 0)
+        self.assertEqual(stats.percentiles([50]), [None])
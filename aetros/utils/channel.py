@@ -0,0 +1,249 @@
+from __future__ import division
+from __future__ import absolute_import
+
+import json
+import os
+from collections import deque
+
+import numpy as np
+
+# All columns of a binary channel are stored as little-endian float64, one value per row.
+BINARY_DTYPE = '<f8'
+
+
+def get_binary_channel_header(columns):
+    """
+    Returns the header of a binary channel. Column 0 is always x, followed by one column per trace.
+
+    :param columns: list of column names, e.g. ['x', 'training', 'validation']
+    :return: dict
+    """
+    return {
+        'version': 1,
+        'dtype': BINARY_DTYPE,
+        'columns': columns,
+        'files': [str(i) + '.bin' for i in range(len(columns))]
+    }
+
+
+def rows_to_binary_columns(rows):
+    """
+    Converts rows of [x, y1, y2, ...] to a list of bytes, one per column, ready to be appended to the column files.
+    """
+    data = np.asarray(rows, dtype=BINARY_DTYPE)
+
+    return [np.ascontiguousarray(data[:, i]).tobytes() for i in range(data.shape[1])]
+
+
+def read_binary_channel(path):
+    """
+    Memory-maps all column files of a binary channel directory (the one containing header.json).
+
+    If a column file has been written only partially (e.g. a job crashed mid-write), all columns are cut to the
+    length of the shortest column.
+
+    :param path: str
+    :return: (header dict, list of np.ndarray)
+    """
+    with open(os.path.join(path, 'header.json'), 'r') as f:
+        header = json.loads(f.read())
+
+    columns = []
+    for file in header['files']:
+        full_path = os.path.join(path, file)
+        if not os.path.exists(full_path) or os.path.getsize(full_path) == 0:
+            # np.memmap can not map empty files
+            columns.append(np.zeros((0,), dtype=header['dtype']))
+        else:
+            columns.append(np.memmap(full_path, dtype=header['dtype'], mode='r'))
+
+    length = min([len(column) for column in columns]) if columns else 0
+
+    return header, [column[:length] for column in columns]
+
+
+def binary_channel_to_csv(path):
+    """
+    Returns the content of a binary channel directory in the same CSV format as a regular channel's data.csv.
+
+    :param path: str
+    :return: str
+    """
+    header, columns = read_binary_channel(path)
+
+    lines = [json.dumps(header['columns'])[1:-1]]
+    if columns:
+        for row in np.column_stack(columns).tolist():
+            lines.append(json.dumps(row)[1:-1])
+
+    return "\n".join(lines) + "\n"
+
+
+def lttb(data, threshold):
+    """
+    Downsamples data with Largest-Triangle-Three-Buckets to `threshold` points, keeping the visual shape of the curve.
+
+    :param data: np.ndarray of shape (n, 2) with x and y values
+    :param threshold: int, number of points to return
+    :return: np.ndarray of shape (threshold, 2)
+    """
+    data = np.asarray(data, dtype='float64')
+    length = len(data)
+
+    if threshold >= length or threshold < 3:
+        return data
+
+    sampled = np.empty((threshold, 2), dtype='float64')
+    sampled[0] = data[0]
+    sampled[-1] = data[-1]
+
+    # bucket borders for all points except first and last
+    borders = np.linspace(1, length - 1, threshold - 1).astype('int64')
+
+    a = data[0]
+    for i in range(threshold - 2):
+        bucket = data[borders[i]:max(borders[i + 1], borders[i] + 1)]
+
+        next_bucket = data[borders[i + 1]:max(borders[i + 2], borders[i + 1] + 1)] if i < threshold - 3 else data[-1:]
+        c = next_bucket.mean(axis=0)
+
+        areas = np.abs((a[0] - c[0]) * (bucket[:, 1] - a[1]) - (a[0] - bucket[:, 0]) * (c[1] - a[1]))
+        a = bucket[np.argmax(areas)]
+        sampled[i + 1] = a
+
+    return sampled
+
+
+class ChannelRollup:
+    """
+    Keeps multi-resolution rollups of a channel with a fixed number of points per level.
+
+    Level i contains buckets of factor ** (i + 1) raw points. Raw points are only added to level 0. Each time a level
+    completes a bucket, the reduced point is passed to the next level. Per raw point this is O(1) amortized,
+    independent of the job's length. Finished points are collected until pop_new_points(), so they can be appended
+    to a stream per level instead of rewriting whole levels.
+
+    Modes:
+        minmax: each point stores x (bucket mean) and min, max and mean per trace.
+        lttb: each point is the point of the bucket selected by Largest-Triangle-Three-Buckets, so it has the
+              same columns as the raw data. A bucket is selected once the following bucket is complete.
+    """
+
+    MINMAX = 'minmax'
+    LTTB = 'lttb'
+
+    def __init__(self, traces, mode='minmax', factor=10, max_points=1000):
+        """
+        :param traces: int : number of y values per point
+        :param mode: str : ChannelRollup.MINMAX or ChannelRollup.LTTB
+        :param factor: int : how many points of a level form one point of the next level
+        :param max_points: int : how many points a level keeps in memory at most (the newest ones)
+        """
+        if mode not in [ChannelRollup.MINMAX, ChannelRollup.LTTB]:
+            raise Exception('Rollup mode %s not supported. Use minmax or lttb.' % (str(mode),))
+
+        self.traces = traces
+        self.mode = mode
+        self.factor = factor
+        self.max_points = max_points
+        self.levels = []
+
+        # (level index, row) of points finished since the last pop_new_points()
+        self.new_points = []
+
+    def get_columns(self, names):
+        if self.mode == ChannelRollup.LTTB:
+            return ['x'] + names
+
+        columns = ['x']
+        for name in names:
+            columns += [name + ' min', name + ' max', name + ' mean']
+
+        return columns
+
+    def add_many(self, rows):
+        """
+        :param rows: list of [x, y1, y2, ...]
+        """
+        for row in rows:
+            if self.mode == ChannelRollup.MINMAX:
+                # a raw point is a bucket with min = max = mean
+                row = [row[0]] + [y for y in row[1:] for _ in range(3)]
+
+            self.push(0, row)
+
+    def push(self, index, row):
+        while True:
+            if index == len(self.levels):
+                self.levels.append({'pending': [], 'points': deque(maxlen=self.max_points), 'waiting': None, 'last': None})
+
+            level = self.levels[index]
+            level['pending'].append(row)
+
+            if len(level['pending']) < self.factor:
+                return
+
+            bucket = np.asarray(level['pending'], dtype='float64')
+            level['pending'] = []
+
+            row = self.reduce_lttb(level, bucket) if self.mode == ChannelRollup.LTTB else self.reduce_minmax(bucket)
+            if row is None:
+                return
+
+            level['points'].append(row)
+            self.new_points.append((index, row))
+            index += 1
+
+    def reduce_minmax(self, bucket):
+        means = bucket[:, 3::3]
+        valid = ~np.isnan(means)
+
+        row = np.empty((bucket.shape[1],), dtype='float64')
+        row[0] = bucket[:, 0].mean()
+        row[1::3] = np.fmin.reduce(bucket[:, 1::3], axis=0)
+        row[2::3] = np.fmax.reduce(bucket[:, 2::3], axis=0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            row[3::3] = np.where(valid, means, 0).sum(axis=0) / valid.sum(axis=0)
+
+        return row.tolist()
+
+    def reduce_lttb(self, level, bucket):
+        waiting = level['waiting']
+        level['waiting'] = bucket
+
+        if waiting is None:
+            return None
+
+        if level['last'] is None:
+            chosen = waiting[0]
+        else:
+            a = level['last']
+            c = bucket.mean(axis=0)
+            areas = np.abs((a[0] - c[0]) * (waiting[:, 1:] - a[1:]) - (a[0] - waiting[:, 0:1]) * (c[1:] - a[1:]))
+            chosen = waiting[np.argmax(np.nan_to_num(areas).sum(axis=1))]
+
+        level['last'] = chosen
+
+        return chosen.tolist()
+
+    def get_level_count(self):
+        """
+        :return: number of levels with at least one point. The last level in self.levels may only have pending points.
+        """
+        return len([level for level in self.levels if level['points']])
+
+    def get_level(self, index):
+        """
+        :return: list of rows of the given level, oldest first
+        """
+        return list(self.levels[index]['points'])
+
+    def pop_new_points(self):
+        """
+        :return: list of (level index, row) finished since the last call, in the order they were finished
+        """
+        points = self.new_points
+        self.new_points = []
+
+        return points
@@ -50,10 +50,12 @@ def upscale(image, ratio):
         raise ValueError('Ratio must be greater than 1 (ratio=%f)' % ratio)
     width = int(math.floor(image.shape[1] * ratio))
     height = int(math.floor(image.shape[0] * ratio))
-    channels = image.shape[2]
-    out = np.ndarray((height, width, channels), dtype=np.uint8)
-    for x, y in np.ndindex((width, height)):
-        out[y, x] = image[int(math.floor(y / ratio)), int(math.floor(x / ratio))]
+    # source row/column of each output pixel, same as floor(y / ratio) per pixel
+    rows = np.floor(np.arange(height) / ratio).astype(np.intp)
+    cols = np.floor(np.arange(width) / ratio).astype(np.intp)
+    out = image[rows[:, np.newaxis], cols[np.newaxis, :]]
+    if out.dtype != np.uint8:
+        out = out.astype(np.uint8)
     return out
 
 
@@ -341,30 +343,11 @@ def get_layer_vis_square(data,
 def get_image_tales(images, colormap='jet', min_img_dim=100, max_width=1000):
 
     padsize = 1
-    # convert to float since we're going to do some math
-    images = images.astype('float32')
-
-    images -= images.min()
-    if images.max() > 0:
-        images /= images.max()
-        images *= 255
+    images = normalize_to_uint8(images)
 
     if images.ndim == 3:
         # they're grayscale - convert to a colormap
-        redmap, greenmap, bluemap = get_color_map(colormap)
-
-        red = np.interp(images * (len(redmap) - 1) / 255.0, range(len(redmap)), redmap)
-        green = np.interp(images * (len(greenmap) - 1) / 255.0, range(len(greenmap)), greenmap)
-        blue = np.interp(images * (len(bluemap) - 1) / 255.0, range(len(bluemap)), bluemap)
-
-        # Slap the channels back together
-        images = np.concatenate(
-            (red[..., np.newaxis], green[..., np.newaxis], blue[..., np.newaxis]), axis=3)
-        images = np.minimum(images, 255)
-        images = np.maximum(images, 0)
-
-    # convert back to uint8
-    images = images.astype('uint8')
+        images = get_color_map_lut(colormap)[images]
 
     # Compute the output image matrix dimensions
     n = int(np.ceil(np.sqrt(images.shape[0])))
@@ -441,30 +424,16 @@ def vis_square(images,
     colormap -- a string representing one of the supported colormaps
     """
     assert 3 <= images.ndim <= 4, 'images.ndim must be 3 or 4'
-    # convert to float since we're going to do some math
-    images = images.astype('float32')
     if normalize:
-        images -= images.min()
-        if images.max() > 0:
-            images /= images.max()
-            images *= 255
+        images = normalize_to_uint8(images)
 
     if images.ndim == 3:
         # they're grayscale - convert to a colormap
-        redmap, greenmap, bluemap = get_color_map(colormap)
-
-        red = np.interp(images * (len(redmap) - 1) / 255.0, range(len(redmap)), redmap)
-        green = np.interp(images * (len(greenmap) - 1) / 255.0, range(len(greenmap)), greenmap)
-        blue = np.interp(images * (len(bluemap) - 1) / 255.0, range(len(bluemap)), bluemap)
-
-        # Slap the channels back together
-        images = np.concatenate(
-            (red[..., np.newaxis], green[..., np.newaxis], blue[..., np.newaxis]), axis=3)
-        images = np.minimum(images, 255)
-        images = np.maximum(images, 0)
-
-    # convert back to uint8
-    images = images.astype('uint8')
+        if images.dtype != np.uint8:
+            images = np.clip(images, 0, 255).astype('uint8')
+        images = get_color_map_lut(colormap)[images]
+    elif images.dtype != np.uint8:
+        images = images.astype('uint8')
 
     # Compute the output image matrix dimensions
     n = int(np.ceil(np.sqrt(images.shape[0])))
@@ -490,6 +459,58 @@ def vis_square(images,
     return tiles
 
 
+def normalize_to_uint8(images):
+    """
+    Scales (min, max) across all images out to (0, 255) and returns uint8 images.
+    uint8 input is scaled with integer math, without a float copy.
+    """
+    if images.dtype == np.uint8:
+        low = int(images.min())
+        span = int(images.max()) - low
+        if span == 0:
+            return np.zeros(images.shape, dtype=np.uint8)
+        if span == 255:
+            return images
+
+        # (255 * 255) fits into uint16
+        scaled = images.astype(np.uint16)
+        scaled -= low
+        scaled *= 255
+        scaled //= span
+        return scaled.astype(np.uint8)
+
+    # convert to float since we're going to do some math
+    images = images.astype('float32')
+    images -= images.min()
+    if images.max() > 0:
+        images /= images.max()
+        images *= 255
+
+    return images.astype('uint8')
+
+
+color_map_luts = {}
+
+
+def get_color_map_lut(name):
+    """
+    Returns the colormap as (256, 3) uint8 lookup table. Index it with uint8 images to get RGB images.
+    Arguments:
+    name -- the name of the colormap. If unrecognized, will default to 'jet'.
+    """
+    if name not in color_map_luts:
+        lut = np.empty((256, 3), dtype=np.uint8)
+        values = np.arange(256, dtype=np.float64)
+
+        for i, channel_map in enumerate(get_color_map(name)):
+            mapped = np.interp(values * (len(channel_map) - 1) / 255.0, range(len(channel_map)), channel_map)
+            lut[:, i] = np.clip(mapped, 0, 255).astype(np.uint8)
+
+        color_map_luts[name] = lut
+
+    return color_map_luts[name]
+
+
 def get_color_map(name):
     """
     Return a colormap as (redmap, greenmap, bluemap)
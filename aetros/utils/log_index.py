@@ -0,0 +1,136 @@
+from __future__ import division
+from __future__ import absolute_import
+
+import six
+
+
+class LogIndex:
+    """
+    Side index of a log stream: the byte offset of every `every`-th line and of all section lines (lines starting
+    with \\f, written by JobBackend.section()). Offsets are of the UTF-8 encoded log.
+
+    feed() is called with each chunk written to the log, chunks do not need to end at line boundaries.
+    """
+
+    # section titles longer than this are cut
+    max_title = 1024
+
+    def __init__(self, every=1000):
+        self.every = every
+        self.lines = 0
+        self.size = 0
+        self.offsets = [0]
+        self.sections = []
+
+        self.line_start = True
+        self.pending_section = None
+
+    def feed(self, data):
+        """
+        :param data: bytes
+        """
+        start = 0
+        length = len(data)
+
+        while start < length:
+            if self.line_start:
+                self.line_start = False
+                if data[start:start + 1] == six.b('\f'):
+                    self.pending_section = [self.lines, self.size + start, six.b('')]
+
+            end = data.find(six.b('\n'), start)
+            line_end = length if end == -1 else end
+
+            if self.pending_section is not None and len(self.pending_section[2]) < self.max_title:
+                self.pending_section[2] += data[start:line_end]
+
+            if end == -1:
+                break
+
+            if self.pending_section is not None:
+                self.add_section(*self.pending_section)
+                self.pending_section = None
+
+            self.lines += 1
+            self.line_start = True
+            start = end + 1
+
+            if self.lines % self.every == 0:
+                self.offsets.append(self.size + start)
+
+        self.size += length
+
+    def add_section(self, line, offset, content):
+        # \fTITLE\tSECONDS
+        title = content[1:].decode('utf-8', 'replace').split('\t')[0]
+        self.sections.append([line, offset, title])
+
+    def to_dict(self):
+        return {
+            'version': 1,
+            'every': self.every,
+            'lines': self.lines,
+            'size': self.size,
+            'offsets': self.offsets,
+            'sections': self.sections,
+        }
+
+    @staticmethod
+    def from_dict(data):
+        index = LogIndex(data['every'])
+        index.lines = data['lines']
+        index.size = data['size']
+        index.offsets = data['offsets']
+        index.sections = data['sections']
+
+        return index
+
+    def get_line_offset(self, buffer, line):
+        """
+        Returns the byte offset of the given line (0-based). Reads at most `every` lines of buffer.
+
+        :param buffer: mmap or bytes of the log
+        """
+        block = min(line // self.every, len(self.offsets) - 1)
+        offset = self.offsets[block]
+
+        for i in range(line - block * self.every):
+            end = buffer.find(six.b('\n'), offset)
+            if end == -1:
+                return len(buffer)
+            offset = end + 1
+
+        return offset
+
+    def get_section_range(self, title):
+        """
+        :return: (start, end) byte offsets of the last section with the given title, or None
+        """
+        for i in range(len(self.sections) - 1, -1, -1):
+            if self.sections[i][2] == title:
+                end = self.sections[i + 1][1] if i + 1 < len(self.sections) else self.size
+                return self.sections[i][1], end
+
+        return None
+
+
+def get_tail_offset(buffer, lines):
+    """
+    Returns the byte offset where the last `lines` lines of buffer start, by searching backwards from the end.
+    Reads only the tail, independent of the size of the log.
+
+    :param buffer: mmap or bytes
+    """
+    end = len(buffer)
+
+    # a trailing newline does not start another line
+    if end and buffer[end - 1:end] == six.b('\n'):
+        end -= 1
+
+    for i in range(lines):
+        position = buffer.rfind(six.b('\n'), 0, end)
+        if position == -1:
+            return 0
+        end = position
+
+    return end + 1
@@ -0,0 +1,144 @@
+from __future__ import division
+from __future__ import absolute_import
+
+import functools
+import time
+from threading import current_thread
+
+
+class OverheadMeter:
+    """
+    Measures the wall time spent in aetros code on the training thread (the thread that called start()).
+
+    Calls of functions decorated with @measure on other threads (monitoring, client, log readers) are not counted.
+    Nested measured calls (e.g. JobChannel.send inside a KerasCallback hook) count once in the total and
+    inclusive in their own section.
+
+    The overhead is reported as share of the step time, the time spent in training steps reported via add_step()
+    (e.g. by KerasCallback). As long as no step has been reported, e.g. in jobs without KerasCallback, the wall time
+    since start() is used instead.
+
+    With a budget (in percent), the overhead of each `check_interval` seconds is compared against the budget.
+    If it is exceeded, all on_over_budget callbacks are called, which should lower the telemetry frequency.
+    """
+
+    def __init__(self):
+        self.thread = None
+        self.started = None
+        self.depth = 0
+        self.total = 0.
+        self.step_total = 0.
+        self.sections = {}
+
+        self.budget = None
+        self.check_interval = 10
+        self.last_check = None
+        self.window_total = 0.
+        self.window_step = 0.
+        self.throttled = 0
+        self.listeners = []
+
+    def start(self):
+        self.thread = current_thread()
+        self.started = self.last_check = time.time()
+
+    def set_budget(self, percent):
+        """
+        :param percent: float|None : e.g. 1 for 1% of the step time
+        """
+        self.budget = percent
+
+    def on_over_budget(self, callback):
+        """
+        Registers callback once, registering the same callback again has no effect.
+        """
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def add_step(self, took):
+        """
+        :param took: float : seconds spent in a training step, including waiting for its input data
+        """
+        self.step_total += took
+        self.window_step += took
+
+    def add(self, name, took):
+        self.sections[name] = self.sections.get(name, 0) + took
+
+        if self.depth > 0:
+            return
+
+        self.total += took
+        self.window_total += took
+
+        if self.budget is None:
+            return
+
+        now = time.time()
+        if now - self.last_check < self.check_interval:
+            return
+
+        reference = self.window_step if self.step_total > 0 else now - self.last_check
+        if reference <= 0:
+            # no step since the last check, e.g. during validation
+            return
+
+        percent = self.window_total / reference * 100
+        self.last_check = now
+        self.window_total = 0.
+        self.window_step = 0.
+
+        if percent > self.budget:
+            self.throttled += 1
+            for callback in self.listeners:
+                callback()
+
+    def get_percent(self):
+        if self.step_total > 0:
+            return self.total / self.step_total * 100
+
+        if self.started is None or time.time() <= self.started:
+            return 0
+
+        return self.total / (time.time() - self.started) * 100
+
+    def get_report(self):
+        return {
+            'percent': self.get_percent(),
+            'seconds': self.total,
+            'stepSeconds': self.step_total,
+            'budget': self.budget,
+            'throttled': self.throttled,
+            'sections': self.sections,
+        }
+
+
+# one meter per process, since there is only one training thread
+meter = OverheadMeter()
+
+
+def measure(name):
+    """
+    Decorator that adds the wall time of each call on the training thread to the section `name` of the meter.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if meter.thread is not current_thread():
+                return fn(*args, **kwargs)
+
+            start = time.time()
+            meter.depth += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                meter.depth -= 1
+                meter.add(name, time.time() - start)
+
+        return wrapper
+
+    return decorator
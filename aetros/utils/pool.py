@@ -0,0 +1,124 @@
+from __future__ import absolute_import
+
+import sys
+from threading import Thread, Lock, Condition
+
+from six.moves import queue
+
+
+class WorkerPool:
+    """
+    Runs tasks in background threads with a bounded number of pending tasks (queued or running).
+
+    When the pool is full, the policy decides what happens with a new task:
+        drop: the new task is dropped.
+        defer: the new task waits in a single slot and runs as soon as a worker is free. A newer task replaces
+               an older one in this slot, the older one is dropped.
+
+    submit() takes a `prepare` function that runs on the calling thread (e.g. evaluating tensors, which needs the
+    training thread) and is only called when the task will not be dropped.
+    """
+
+    DROP = 'drop'
+    DEFER = 'defer'
+    POLICIES = [DROP, DEFER]
+
+    def __init__(self, workers=1, queue_size=0, policy='drop', logger=None):
+        """
+        :param workers: int
+        :param queue_size: int : number of tasks that can wait in addition to the running ones
+        :param policy: str : WorkerPool.DROP or WorkerPool.DEFER
+        """
+        self.set_policy(policy)
+
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.logger = logger
+
+        self.queue = queue.Queue()
+        self.lock = Lock()
+        self.idle = Condition(self.lock)
+        self.pending = 0
+        self.deferred = None
+        self.dropped = 0
+        self.threads = []
+
+    def set_policy(self, policy):
+        """
+        :param policy: str : WorkerPool.DROP or WorkerPool.DEFER
+        """
+        if policy not in WorkerPool.POLICIES:
+            raise Exception('WorkerPool policy %s not supported. Use drop or defer.' % (str(policy),))
+
+        self.policy = policy
+
+    def submit(self, prepare, task):
+        """
+        :param prepare: function without arguments, called on the calling thread. Its result is passed to task.
+        :param task: function with one argument, called in a worker thread
+        :return: bool : False if the task has been dropped
+        """
+        with self.lock:
+            if self.pending >= self.capacity and self.policy == WorkerPool.DROP:
+                self.dropped += 1
+                return False
+
+        item = (task, prepare())
+
+        with self.lock:
+            if not self.threads:
+                self.start()
+
+            if self.pending >= self.capacity:
+                if self.policy == WorkerPool.DROP:
+                    self.dropped += 1
+                    return False
+
+                if self.deferred is not None:
+                    self.dropped += 1
+
+                self.deferred = item
+                return True
+
+            self.pending += 1
+            self.queue.put(item)
+
+        return True
+
+    def start(self):
+        for i in range(self.workers):
+            thread = Thread(target=self.run)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def run(self):
+        while True:
+            task, prepared = self.queue.get()
+
+            try:
+                task(prepared)
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning('Background task failed: ' + str(type(e).__name__) + ': ' + str(e))
+                else:
+                    sys.__stderr__.write('Background task failed: ' + str(e) + "\n")
+            finally:
+                with self.lock:
+                    self.pending -= 1
+
+                    if self.deferred is not None:
+                        self.pending += 1
+                        self.queue.put(self.deferred)
+                        self.deferred = None
+
+                    if self.pending == 0:
+                        self.idle.notify_all()
+
+    def wait(self):
+        """
+        Blocks until all submitted (and deferred) tasks are done.
+        """
+        with self.lock:
+            while self.pending > 0 or self.deferred is not None:
+                self.idle.wait()
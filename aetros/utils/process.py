@@ -0,0 +1,258 @@
+from __future__ import division
+from __future__ import absolute_import
+
+import os
+import time
+
+
+class ProcessTreeAccounting:
+    """
+    Resource usage of all processes of one job, read from /proc and cgroup files.
+
+    The job's processes are either all processes of a process group (created with os.setsid in start_command)
+    or all processes of the cgroup of a Docker container. For a container, CPU time, memory and IO come from the
+    cgroup counters, which also include already exited processes.
+
+    Counters like CPU time, IO bytes and context switches are cumulative per process, so sample() reports the
+    difference to the previous sample per pid. A process that exits between two samples only loses its last
+    interval.
+
+    :param pgid: int : process group id
+    :param container_pid: callable returning the host pid of a process inside the container, or None as long as
+                          the container is not running yet
+    """
+
+    columns = ['cpu', 'rss', 'io_read', 'io_write', 'ctx_switches', 'threads']
+
+    def __init__(self, pgid=None, container_pid=None, proc_path='/proc'):
+        if pgid is None and container_pid is None:
+            raise Exception('Either pgid or container_pid is required.')
+
+        self.pgid = pgid
+        self.container_pid = container_pid
+        self.proc_path = proc_path
+        self.cgroup = None
+
+        self.clock_ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self.page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+        self.last = None
+        self.last_time = None
+
+    def read_file(self, path):
+        try:
+            with open(path, 'r') as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def get_pids(self):
+        if self.cgroup is not None:
+            path = self.cgroup_file('pids', 'cgroup.procs') or self.cgroup_file('cpuacct', 'cgroup.procs')
+            procs = self.read_file(path) if path else None
+            return [int(pid) for pid in procs.split()] if procs else []
+
+        pids = []
+        for name in os.listdir(self.proc_path):
+            if not name.isdigit():
+                continue
+
+            stat = self.read_stat(int(name))
+            if stat and stat['pgrp'] == self.pgid:
+                pids.append(int(name))
+
+        return pids
+
+    def read_stat(self, pid):
+        content = self.read_file(os.path.join(self.proc_path, str(pid), 'stat'))
+        if not content:
+            return None
+
+        # the process name in parentheses can contain spaces
+        fields = content[content.rfind(')') + 2:].split()
+
+        return {
+            'pgrp': int(fields[2]),
+            'cpu': (int(fields[11]) + int(fields[12])) / self.clock_ticks,
+            'threads': int(fields[17]),
+            'rss': int(fields[21]) * self.page_size,
+        }
+
+    def read_key_values(self, path, separator=':'):
+        content = self.read_file(path)
+        values = {}
+        if content:
+            for line in content.split("\n"):
+                if separator in line:
+                    key, value = line.split(separator, 1)
+                    values[key.strip()] = value.strip()
+
+        return values
+
+    def read_process(self, pid):
+        stat = self.read_stat(pid)
+        if stat is None:
+            return None
+
+        io = self.read_key_values(os.path.join(self.proc_path, str(pid), 'io'))
+        status = self.read_key_values(os.path.join(self.proc_path, str(pid), 'status'))
+
+        stat['io_read'] = int(io.get('read_bytes', 0))
+        stat['io_write'] = int(io.get('write_bytes', 0))
+        stat['ctx_switches'] = int(status.get('voluntary_ctxt_switches', 0)) \
+            + int(status.get('nonvoluntary_ctxt_switches', 0))
+
+        return stat
+
+    def resolve_cgroup(self):
+        """
+        Reads the cgroup paths of the container from /proc/<pid>/cgroup.
+        Returns a dict of controller => path, where '' is the unified hierarchy of cgroup v2.
+        """
+        pid = self.container_pid()
+        if not pid:
+            return None
+
+        content = self.read_file(os.path.join(self.proc_path, str(pid), 'cgroup'))
+        if not content:
+            return None
+
+        cgroup = {}
+        for line in content.strip().split("\n"):
+            _, controllers, path = line.split(':', 2)
+            for controller in controllers.split(','):
+                if controller:
+                    cgroup[controller] = os.path.join('/sys/fs/cgroup', controller) + path
+                else:
+                    cgroup[''] = '/sys/fs/cgroup' + path
+
+        return cgroup
+
+    def cgroup_file(self, controller, name):
+        if '' in self.cgroup and os.path.exists(os.path.join(self.cgroup[''], name)):
+            return os.path.join(self.cgroup[''], name)
+
+        if controller in self.cgroup:
+            return os.path.join(self.cgroup[controller], name)
+
+        return None
+
+    def read_cgroup(self):
+        """
+        Returns cumulative cpu time and IO of the cgroup and its current memory usage. Values that are not
+        available (e.g. a disabled controller) are missing from the result.
+        """
+        values = {}
+
+        if '' in self.cgroup:
+            cpu = self.read_key_values(os.path.join(self.cgroup[''], 'cpu.stat'), ' ')
+            if 'usage_usec' in cpu:
+                values['cpu'] = int(cpu['usage_usec']) / 1000000
+
+            memory = self.read_file(os.path.join(self.cgroup[''], 'memory.current'))
+            if memory:
+                values['rss'] = int(memory)
+
+            io = self.read_file(os.path.join(self.cgroup[''], 'io.stat'))
+            if io is not None:
+                values['io_read'] = values['io_write'] = 0
+                for field in io.split():
+                    if field.startswith('rbytes='):
+                        values['io_read'] += int(field[7:])
+                    elif field.startswith('wbytes='):
+                        values['io_write'] += int(field[7:])
+
+            return values
+
+        if 'cpuacct' in self.cgroup:
+            usage = self.read_file(os.path.join(self.cgroup['cpuacct'], 'cpuacct.usage'))
+            if usage:
+                values['cpu'] = int(usage) / 1000000000
+
+        if 'memory' in self.cgroup:
+            usage = self.read_file(os.path.join(self.cgroup['memory'], 'memory.usage_in_bytes'))
+            if usage:
+                values['rss'] = int(usage)
+
+        if 'blkio' in self.cgroup:
+            io = self.read_file(os.path.join(self.cgroup['blkio'], 'blkio.throttle.io_service_bytes'))
+            if io is not None:
+                values['io_read'] = values['io_write'] = 0
+                for line in io.split("\n"):
+                    fields = line.split()
+                    if len(fields) == 3 and fields[1] == 'Read':
+                        values['io_read'] += int(fields[2])
+                    elif len(fields) == 3 and fields[1] == 'Write':
+                        values['io_write'] += int(fields[2])
+
+        return values
+
+    def read(self):
+        """
+        :return: dict of pid => counters, with the cgroup counters under the key 'cgroup'
+        """
+        if self.container_pid is not None and self.cgroup is None:
+            self.cgroup = self.resolve_cgroup()
+            if self.cgroup is None:
+                return None
+
+        current = {}
+        for pid in self.get_pids():
+            process = self.read_process(pid)
+            if process is not None:
+                current[pid] = process
+
+        if self.cgroup is not None:
+            current['cgroup'] = self.read_cgroup()
+
+        return current
+
+    def sample(self):
+        """
+        :return: list of values for self.columns or None if no data is available yet.
+                 cpu is in percent of one core, io_read, io_write and ctx_switches are per second.
+        """
+        now = time.time()
+        current = self.read()
+        if current is None:
+            return None
+
+        last, last_time = self.last, self.last_time
+        self.last, self.last_time = current, now
+
+        if last is None or now <= last_time:
+            return None
+
+        deltas = {'cpu': 0, 'io_read': 0, 'io_write': 0, 'ctx_switches': 0}
+        rss = threads = 0
+
+        for pid, process in current.items():
+            if pid == 'cgroup':
+                continue
+
+            rss += process['rss']
+            threads += process['threads']
+
+            previous = last.get(pid)
+            for key in deltas:
+                # new processes count from zero
+                deltas[key] += max(0, process[key] - (previous[key] if previous else 0))
+
+        cgroup = current.get('cgroup')
+        if cgroup:
+            for key in ['cpu', 'io_read', 'io_write']:
+                if key in cgroup and key in last.get('cgroup', {}):
+                    deltas[key] = max(0, cgroup[key] - last['cgroup'][key])
+
+            rss = cgroup.get('rss', rss)
+
+        elapsed = now - last_time
+
+        return [
+            deltas['cpu'] / elapsed * 100,
+            rss,
+            deltas['io_read'] / elapsed,
+            deltas['io_write'] / elapsed,
+            deltas['ctx_switches'] / elapsed,
+            threads,
+        ]
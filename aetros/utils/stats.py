@@ -0,0 +1,127 @@
+from __future__ import division
+from __future__ import absolute_import
+
+import random
+
+import numpy as np
+
+
+class ReservoirSample:
+    """
+    Keeps a uniform random sample of at most `size` values of a stream (Algorithm R), so percentiles of an
+    arbitrarily long stream can be estimated in constant memory.
+    """
+
+    def __init__(self, size=1024, seed=None):
+        self.size = size
+        self.random = random.Random(seed)
+        self.values = np.empty((size,), dtype='float64')
+        self.count = 0
+        self.total = 0.
+
+    def add(self, value):
+        if self.count < self.size:
+            self.values[self.count] = value
+        else:
+            index = self.random.randint(0, self.count)
+            if index < self.size:
+                self.values[index] = value
+
+        self.count += 1
+        self.total += value
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.
+
+    def get_values(self):
+        """
+        :return: np.ndarray view of the sampled values, at most `size` of them
+        """
+        return self.values[:min(self.count, self.size)]
+
+    def percentiles(self, q):
+        """
+        :param q: list of percentiles between 0 and 100
+        :return: list of floats, or list of None if no value has been added
+        """
+        if self.count == 0:
+            return [None for _ in q]
+
+        return np.percentile(self.get_values(), q).tolist()
+
+
+class StreamStats:
+    """
+    Count, mean, min, max and exponential moving average of a stream in constant memory. Percentiles are estimated
+    from a ReservoirSample.
+    """
+
+    def __init__(self, ema_alpha=0.1, sample_size=1024, seed=None):
+        self.ema_alpha = ema_alpha
+        self.sample = ReservoirSample(sample_size, seed)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = None
+        self.min = None
+        self.max = None
+        self.ema = None
+        self.sample.reset()
+
+    def add(self, value):
+        self.count += 1
+
+        if self.count == 1:
+            self.mean = self.min = self.max = self.ema = value
+        else:
+            # incremental mean, no growing sum
+            self.mean += (value - self.mean) / self.count
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+            self.ema += self.ema_alpha * (value - self.ema)
+
+        self.sample.add(value)
+
+    def percentiles(self, q):
+        return self.sample.percentiles(q)
+
+
+class ConfusionMatrix:
+    """
+    Accumulates a confusion matrix batch by batch, rows are the expected classes, columns the predicted.
+    """
+
+    def __init__(self, classes):
+        self.classes = classes
+        self.counts = np.zeros((classes * classes,), dtype='int64')
+        self.samples = 0
+
+    @staticmethod
+    def to_classes(y):
+        """
+        :param y: one-hot/probabilities (n, classes) or class indices (n,) or (n, 1)
+        """
+        y = np.asarray(y)
+        if y.ndim > 1 and y.shape[-1] > 1:
+            return y.argmax(axis=-1).ravel()
+
+        return y.ravel().astype('int64')
+
+    def add(self, expected, predicted):
+        expected = self.to_classes(expected)
+        predicted = self.to_classes(predicted)
+
+        if len(expected) != len(predicted):
+            raise Exception('Got %d expected but %d predicted classes.' % (len(expected), len(predicted)))
+
+        self.counts += np.bincount(expected * self.classes + predicted, minlength=self.classes * self.classes)
+        self.samples += len(expected)
+
+    def reset(self):
+        self.counts[:] = 0
+        self.samples = 0
+
+    def tolist(self):
+        return self.counts.reshape((self.classes, self.classes)).tolist()